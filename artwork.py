@@ -0,0 +1,240 @@
+#!/usr/bin/python -tt
+"""
+MAME support module to read MAME artwork of a game from an unzipped artwork directory ({game}/) or directly from
+an artwork zip file ({game}.zip), in a bezel artwork directory:
+- Files are addressed by their filename (e.g. "default.lay", "bezel.png"), also if they are saved in a subdirectory of a zip file.
+- The central directory of a zip file is read once, when the artwork is opened. Files are read from the zip file in memory,
+  and only the files that are needed (e.g. the .lay file and the bezel .png file) are read.
+- An artwork index of all games in a list of bezel artwork directories is built with one directory scan per bezel artwork directory
+  (instead of one file system check per game and directory). If a game is present in more than one directory, the artwork in the
+  last directory is used. Within a directory, an unzipped artwork directory is used instead of a zip file.
+
+Usage:
+
+   artworkindex = artwork.scanartwork(MAMEbezeldirs)   # romname -> (MAMEbezeldir, 'dir' or 'zip')
+   artwork = artwork.openartwork(MAMEbezeldir, romname, kind) # None if the game has no (valid) artwork in MAMEbezeldir
+   layfile = artwork.open(layfilename)
+   artwork.copy(bezelfilename, destination)
+   fingerprint = artwork.fingerprint(bezelfilename, previousfingerprint) # Content hash of a file (see configsetup.fingerprint)
+   artwork.close()
+
+Author: Gordon Lim
+Last Edit: 18 Oct 2026
+"""
+
+import configsetup
+import hashlib
+import instrumentation
+import os
+import shutil
+import zipfile
+
+class ArtworkDirectory(object):
+
+    # Unzipped artwork: {MAMEbezeldir}/{game}/
+
+    kind = 'dir'
+
+    def __init__(self, path):
+
+        self.path = path
+
+    def names(self):
+
+        return sorted(os.listdir(self.path))
+
+    def location(self, name):
+
+        return os.path.join(self.path, name)
+
+    def size(self, name):
+
+        return os.path.getsize(self.location(name))
+
+    def open(self, name):
+
+        return open(self.location(name), 'rb')
+
+    def read(self, name):
+
+        artworkfile = self.open(name)
+        data = artworkfile.read()
+        artworkfile.close()
+
+        return data
+
+    def fingerprint(self, name, previousfingerprint = None):
+
+        # Size, mtime and content hash of a file (the content hash is reused if size and mtime have not changed):
+
+        return configsetup.fingerprint(self.location(name), previousfingerprint)
+
+    def copy(self, name, destination):
+
+        shutil.copyfile(self.location(name), destination)
+
+        return
+
+    def link(self, name, destination):
+
+        # Create symbolic link to the original file (raises OSError if destination exists already):
+
+        os.symlink(self.location(name), destination)
+
+        return
+
+    def close(self):
+
+        return
+
+class ArtworkZip(object):
+
+    # Zipped artwork: {MAMEbezeldir}/{game}.zip
+
+    kind = 'zip'
+
+    def __init__(self, path):
+
+        self.path = path
+        self.zipfile = zipfile.ZipFile(path, 'r') # Reads the central directory of the zip file
+        self.members = {}
+
+        for member in self.zipfile.infolist():
+            name = os.path.basename(member.filename)
+            if (name != '') and (name not in self.members):
+                self.members[name] = member
+
+    def names(self):
+
+        return sorted(self.members)
+
+    def location(self, name):
+
+        return self.path + "/" + self.members[name].filename
+
+    def size(self, name):
+
+        return self.members[name].file_size
+
+    def open(self, name):
+
+        return self.zipfile.open(self.members[name])
+
+    def read(self, name):
+
+        return self.zipfile.read(self.members[name])
+
+    def fingerprint(self, name, previousfingerprint = None):
+
+        # Size, CRC and content hash of a file (the content hash is reused if size and CRC in the central directory have not changed):
+
+        member = self.members[name]
+
+        if (previousfingerprint is not None and
+            previousfingerprint['size'] == member.file_size and previousfingerprint.get('crc') == member.CRC):
+            return previousfingerprint
+
+        sha1 = hashlib.sha1()
+        source = self.open(name)
+        while True:
+            block = source.read(1 << 16)
+            if not block:
+                break
+            sha1.update(block)
+        source.close()
+
+        instrumentation.bytesread(member.file_size)
+
+        return {'size': member.file_size, 'crc': member.CRC, 'sha1': sha1.hexdigest()}
+
+    def copy(self, name, destination):
+
+        # Extract a single file from the zip file, via a temporary file:
+
+        source = self.open(name)
+        destinationfile = open(destination + '.tmp', 'wb')
+        shutil.copyfileobj(source, destinationfile, 1 << 16)
+        destinationfile.close()
+        source.close()
+
+        os.rename(destination + '.tmp', destination)
+
+        return
+
+    def link(self, name, destination):
+
+        # Files in a zip file can not be linked, so the file is extracted instead (raises OSError if destination exists already):
+
+        if os.path.lexists(destination):
+            raise OSError("{} exists already".format(destination))
+
+        self.copy(name, destination)
+
+        return
+
+    def close(self):
+
+        self.zipfile.close()
+
+        return
+
+def openartwork(MAMEbezeldir, romname, kind = None):
+
+    # Return artwork of a game in a bezel artwork directory, or None. If kind ('dir' or 'zip', see scanartwork) is not given,
+    # the unzipped artwork directory is tried first, then the zip file:
+
+    if (kind == 'dir') or ((kind is None) and os.path.isdir(MAMEbezeldir + romname)):
+        return ArtworkDirectory(MAMEbezeldir + romname)
+
+    if (kind == 'zip') or ((kind is None) and os.path.isfile(MAMEbezeldir + romname + ".zip")):
+        try:
+            return ArtworkZip(MAMEbezeldir + romname + ".zip")
+        except (zipfile.BadZipfile, IOError):
+            return None # Not a valid zip file
+
+    return None
+
+def scandirectory(MAMEbezeldir):
+
+    # Return list of (name, isdirectory) of the entries in a directory, using os.scandir if available
+    # (the entry type is then returned by the directory scan itself, without a file system check per entry):
+
+    scandir = getattr(os, 'scandir', None)
+
+    if scandir is None:
+        try:
+            from scandir import scandir # Python 2: optional scandir package (pip install scandir)
+        except ImportError:
+            scandir = None
+
+    if scandir is not None:
+        return [(entry.name, entry.is_dir()) for entry in scandir(MAMEbezeldir)]
+
+    entries = []
+    for name in os.listdir(MAMEbezeldir):
+        if (name[-4:].lower() == '.zip'):
+            entries.append((name, False))
+        else:
+            entries.append((name, os.path.isdir(os.path.join(MAMEbezeldir, name))))
+
+    return entries
+
+def scanartwork(MAMEbezeldirs):
+
+    # Return artwork index (romname -> (MAMEbezeldir, 'dir' or 'zip')) of a list of bezel artwork directories,
+    # with one directory scan per bezel artwork directory (the last directory in the list wins):
+
+    artworkindex = {}
+
+    for MAMEbezeldir in MAMEbezeldirs:
+        zips = {}
+        for name, isdirectory in scandirectory(MAMEbezeldir):
+            if isdirectory:
+                artworkindex[name] = (MAMEbezeldir, 'dir')
+            elif (name[-4:] == '.zip'):
+                zips[name[:-4]] = (MAMEbezeldir, 'zip')
+        for romname, entry in zips.items():
+            if (artworkindex.get(romname) != (MAMEbezeldir, 'dir')): # Unzipped artwork directory wins in the same directory
+                artworkindex[romname] = entry
+
+    return artworkindex
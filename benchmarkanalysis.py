@@ -1,8 +1,9 @@
 #!/usr/bin/python -tt
 """
 MAME support program to analyze MAME emulation benchmark files of a single game or a list of games:
-- Average emulation speed and total emulation time are calculated by taking into account the benchmark from the last game and the previous benchmark.
-- The previous benchmark is updated and saved in a dedicated MAME benchmarks directory.
+- The benchmark from the last game is added to the benchmark history (benchmarkhistory.txt in a dedicated MAME benchmarks directory),
+  together with the time and the MAME version of the run ({game}_lastgame.version, saved by benchmarkgenerator.py and mame.bash). Running-average benchmark files of previous versions of this program ({game}_allgames.log) are imported.
+- Average emulation speed (weighted by time) and total emulation time are calculated from all benchmarks in the benchmark history.
 - The average emulation speed is converted into a 1-5 star rating.
 - Benchmark data are saved in a formatted ASCII file (AMbenchmarks.ini). This file can be used to display benchmark data in Attract-Mode.
 
@@ -15,23 +16,41 @@ Usage:
 starlevels = [75, 90, 95, 97.5]
 
 """
-3) To process a single game, type: 
+3) Optionally choose whether, in 'all' mode, clones in your Attract-Mode MAME romlist that have not been benchmarked inherit
+   the benchmark data (speed, star rating and time) of their parent game:
+"""
+
+inheritclonebenchmarks = False
+
+"""
+4) To process a single game, type: 
    ./benchmarkanalysis.py {game}
    where {game} is the romname of the game (e.g. pacman) 
 OR to process all games in your MAME benchmarks directory, type:
    ./benchmarkanalysis.py all
+   In 'all' mode all MAME benchmark files are read in one pass, and speeds and star ratings of all games are calculated
+   at once (using NumPy if it is installed).
 
 Author: Gordon Lim
-Last Edit: 1 Feb 2018 
+Last Edit: 18 Oct 2026 
 """
 
+import benchmarkhistory
+import bisect
 import configsetup
+import inistore
+import instrumentation
 import os
 import re
 import subprocess
 import sys
 
-regexsearchpattern = 'Average speed: (\d+)\.\d*% \((\d+) seconds\)'
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+regexsearchpattern = re.compile('Average speed: (\d+\.?\d*)% \((\d+) seconds\)')
 
 def getbenchmarkdata(MAMEbenchmarkfilename):
 
@@ -41,7 +60,7 @@ def getbenchmarkdata(MAMEbenchmarkfilename):
     line = MAMEbenchmarkfile.readline()
     MAMEbenchmarkfile.close()
     
-    matchobject = re.search(regexsearchpattern, line)
+    matchobject = regexsearchpattern.search(line)
     
     if not matchobject:
         print("------ regex search of MAME benchmark file failed - EXIT")
@@ -54,60 +73,136 @@ def getbenchmarkdata(MAMEbenchmarkfilename):
 
 def calculatestarrating(speed):
 
-    speed = float(speed)
-    stars = 0
-    
-    if (0 < speed < starlevels[0]):
-        stars = 1
-    elif (starlevels[0] < speed < starlevels[1]):
-        stars = 2
-    elif (starlevels[1] < speed < starlevels[2]):
-        stars = 3
-    elif (starlevels[2] < speed < starlevels[3]):
-        stars = 4
+    # 1 star below the first star level, 1 more star for every star level reached (i.e. speed >= level):
+
+    return 1 + bisect.bisect_right(starlevels, float(speed))
+
+def calculatestarratings(speeds):
+
+    # Star ratings of a list of speeds:
+
+    if numpy is not None:
+        return (1 + numpy.searchsorted(starlevels, numpy.asarray(speeds, dtype=float), side='right')).tolist()
+
+    return [calculatestarrating(speed) for speed in speeds]
+
+def calculateweightedspeeds(history, games):
+
+    # Average speed weighted by time, and total time, of all benchmarks of a list of games:
+
+    runs = [(i, run[0], run[1]) for i, game in enumerate(games) for run in history.runs.get(game, [])]
+
+    if numpy is not None:
+        if (len(runs) == 0):
+            return [0.0]*len(games), [0.0]*len(games)
+        index, speeds, times = [numpy.asarray(column) for column in zip(*runs)]
+        times_total  = numpy.bincount(index, weights=times,        minlength=len(games))
+        speedxtimes  = numpy.bincount(index, weights=speeds*times, minlength=len(games))
+        speeds_total = numpy.bincount(index, weights=speeds,       minlength=len(games))
+        counts       = numpy.bincount(index,                       minlength=len(games))
+        speeds_ave = numpy.where(times_total > 0, speedxtimes/numpy.maximum(times_total, 1e-300), speeds_total/numpy.maximum(counts, 1))
+        return speeds_ave.tolist(), times_total.tolist()
+
+    times_total  = [0.0]*len(games)
+    speedxtimes  = [0.0]*len(games)
+    speeds_total = [0.0]*len(games)
+    counts       = [0]*len(games)
+
+    for i, speed, time in runs:
+        times_total[i]  += time
+        speedxtimes[i]  += speed*time
+        speeds_total[i] += speed
+        counts[i]       += 1
+
+    speeds_ave = [speedxtimes[i]/times_total[i] if (times_total[i] > 0) else speeds_total[i]/max(counts[i], 1) for i in range(len(games))]
+
+    return speeds_ave, times_total
+
+def importallgameslogs(history, game = None):
+
+    # Import running-average benchmark files of previous program versions ({game}_allgames.log) into the benchmark history,
+    # as one run per game with the average speed and total time of all previous runs. If a game is given, only the file of
+    # that game is imported (one file check instead of a scan of the MAME benchmarks directory):
+
+    if game is None:
+        filenames = sorted(os.listdir(MAMEbenchmarkdir))
+    elif os.path.isfile(MAMEbenchmarkdir + game + "_allgames.log"):
+        filenames = [game + "_allgames.log"]
     else:
-        stars = 5
+        filenames = []
+
+    for filename in filenames:
+        if (filename[-13:] != "_allgames.log"):
+            continue
+
+        romname = filename[:-13]
+        
+        if romname in history:
+            print("--- {} not imported, benchmark history of {} exists already".format(filename, romname))
+            continue
+        
+        speed, time = getbenchmarkdata(MAMEbenchmarkdir + filename)
+        if (time == 0):
+            continue
+
+        history.append(romname, speed, time, 'unknown', os.path.getmtime(MAMEbenchmarkdir + filename))
+        os.remove(MAMEbenchmarkdir + filename)
         
-    return stars
+        print("--- {} imported into benchmark history".format(filename))
+
+    return
+
+def readlastgamerun(game):
+
+    # Return MAME version and time of the run of the last MAME benchmark file of a game, and remove the file.
+    # The version is read from {game}_lastgame.version. Without it, the current MAME version is used, unless MAME
+    # has been updated after the run (e.g. MAME benchmark files of previous versions of this program or mame.bash):
+
+    MAMEbenchmarkfilename_lastgame = MAMEbenchmarkdir + game + '_lastgame.log'
+    MAMEversionfilename_lastgame   = MAMEbenchmarkdir + game + '_lastgame.version'
 
-def createbenchmarkfile(game):
+    timestamp = os.path.getmtime(MAMEbenchmarkfilename_lastgame)
+
+    if os.path.isfile(MAMEversionfilename_lastgame):
+        version = benchmarkhistory.readversionfile(MAMEversionfilename_lastgame)
+        os.remove(MAMEversionfilename_lastgame)
+    elif (timestamp >= MAMEexecutabletime):
+        version = MAMEversion
+    else:
+        version = 'unknown'
+
+    os.remove(MAMEbenchmarkfilename_lastgame)
+
+    return version, timestamp
+
+def createbenchmarkfile(game, AMbenchmarks, history):
 
     print("--- Creating AM benchmark file for {}:".format(game))
 
-    # Get benchmark data from last MAME benchmark file:
+    # Add benchmark data from last MAME benchmark file to benchmark history:
 
-    speed_new = 0
-    time_new  = 0
-    
     MAMEbenchmarkfilename_lastgame = MAMEbenchmarkdir + game + '_lastgame.log'
     if os.path.isfile(MAMEbenchmarkfilename_lastgame):
         speed_new, time_new = getbenchmarkdata(MAMEbenchmarkfilename_lastgame)
-        subprocess.call(["rm", MAMEbenchmarkfilename_lastgame])
+        version, timestamp = readlastgamerun(game)
+        if (time_new > 0):
+            history.append(game, speed_new, time_new, version, timestamp)
 
-    # Get benchmark data from previous MAME benchmark file:
-        
-    speed_old = 0
-    time_old  = 0
-        
-    MAMEbenchmarkfilename_allgames = MAMEbenchmarkdir + game + '_allgames.log'
-    if os.path.isfile(MAMEbenchmarkfilename_allgames):
-        speed_old, time_old = getbenchmarkdata(MAMEbenchmarkfilename_allgames)
+    # Get statistics of all benchmarks of this game:
 
-    if ((time_old == 0) and (time_new == 0)):
+    statistics = history.statistics(game)
+
+    if statistics is None:
         print("------ MAME benchmark files do not exist - EXIT")
         return
         
-    # Calculate total time and average speed weigthed by time:
-
-    time_total = time_old + time_new
-    speed_ave  = speed_old*(time_old/time_total) + speed_new*(time_new/time_total)
+    # Average speed weigthed by time, and total time:
 
-    # Update previous MAME benchmark file:
+    speed_ave  = statistics['weightedmean']
+    time_total = statistics['time']
 
-    MAMEbenchmarkfile = open(MAMEbenchmarkfilename_allgames, "w")    
-    benchmarkline = "Average speed: {:.2f}% ({} seconds)".format(float(speed_ave), int(time_total))
-    MAMEbenchmarkfile.write(benchmarkline)
-    MAMEbenchmarkfile.close()
+    print("------ {} benchmark runs: median speed = {:.2f}%, 10-90% range = {:.2f}-{:.2f}%, variance = {:.2f}".format(
+        statistics['runs'], statistics['median'], statistics['p10'], statistics['p90'], statistics['variance']))
     
     # Calculate "star" rating:
 
@@ -115,46 +210,95 @@ def createbenchmarkfile(game):
 
     # Save benchmark data in AMbenchmarks.ini:
 
-    AMbenchmarkfilename = configsetup.AMsupportdir + "data/AMbenchmarks.ini"
-
-    AMbenchmarkfilename_exists = False    
-    if os.path.isfile(AMbenchmarkfilename):
-        AMbenchmarkfilename_exists = True
-        AMbenchmarkfile = open(AMbenchmarkfilename, 'r')
-        lines = []
-        while True:
-            line = AMbenchmarkfile.readline()
-            if not line:
-                break
-            if (line == "[{}]\n".format(game)):
-                dummy = AMbenchmarkfile.readline() # skip speed
-                dummy = AMbenchmarkfile.readline() # skip stars
-                dummy = AMbenchmarkfile.readline() # skip time
-            else:
-                lines.append(line)
-        AMbenchmarkfile.close()
-
-    AMbenchmarkfile = open(AMbenchmarkfilename, 'w')
-    if (AMbenchmarkfilename_exists):
-        for line in lines:
-            AMbenchmarkfile.write(line)
-    AMbenchmarkfile.write("[{}]\n".format(game))
-    AMbenchmarkfile.write("speed={:.2f}\n".format(round(speed_ave)))
-    AMbenchmarkfile.write("stars={}\n".format(stars))
-    AMbenchmarkfile.write("time={}\n".format(int(time_total)))
-    AMbenchmarkfile.close()  
+    AMbenchmarks.upsert(game, [('speed', "{:.2f}".format(round(speed_ave))),
+                               ('stars', stars),
+                               ('time',  int(time_total))])
             
     print("------ AM benchmark file for {} created => SUCCESS".format(game))
         
     return 0
 
+def readlastgamelogs(history):
+
+    # Add benchmark data from all last MAME benchmark files to benchmark history in one pass, return list of romnames:
+
+    games = []
+    runs = []
+
+    for filename in sorted(os.listdir(MAMEbenchmarkdir)): # For all last game files in MAME benchmark directory:
+        if (filename[-13:] != "_lastgame.log"):
+            continue
+
+        romname = filename[:-13]
+        games.append(romname)
+
+        speed, time = getbenchmarkdata(MAMEbenchmarkdir + filename)
+        version, timestamp = readlastgamerun(romname)
+        if (time > 0):
+            runs.append((romname, speed, time, version, timestamp))
+
+    history.extend(runs)
+
+    return games
+
+def createbenchmarkfiles(games, AMbenchmarks, history):
+
+    # Batch version of createbenchmarkfile() for a list of games:
+
+    games = [game for game in games if game in history]
+
+    speeds_ave, times_total = calculateweightedspeeds(history, games)
+    stars = calculatestarratings(speeds_ave)
+
+    for game, speed_ave, star, time_total in zip(games, speeds_ave, stars, times_total):
+        AMbenchmarks.upsert(game, [('speed', "{:.2f}".format(round(speed_ave))),
+                                   ('stars', star),
+                                   ('time',  int(time_total))])
+
+    print("--- AM benchmark files for {} games created => SUCCESS".format(len(games)))
+
+    return 0
+
+def inheritbenchmarks(AMbenchmarks, history):
+
+    # Clones in AM romlist without benchmark runs inherit the benchmark data of their parent game:
+
+    cloneindex = configsetup.CloneIndex(configsetup.read_romlist())
+
+    benchmarkedgames = set(game for game in history.games() if game in AMbenchmarks)
+
+    inherited = cloneindex.inherit(benchmarkedgames)
+
+    for clone, parent in inherited:
+        AMbenchmarks.upsert(clone, AMbenchmarks.get(parent))
+
+    print("--- AM benchmark data of parent games inherited by {} clones".format(len(inherited)))
+
+    return
+
 def main():
 
     # Setup configuration:
     
+    instrumentation.init('benchmarkanalysis')
+
     configsetup.init()
 
+    # Check input:
+
+    if (len(sys.argv) != 2):
+        print("Please provide a romname or 'all' as input argument")
+        return 1
+    
+    return analyze(sys.argv[1])
+
+def analyze(inputargument):
+
+    # Process a game (inputargument is its romname) or all games in MAME benchmarks directory (inputargument is 'all'):
+
     global MAMEbenchmarkdir
+    global MAMEversion
+    global MAMEexecutabletime
     
     MAMEbenchmarkdir = configsetup.MAMEconfigdir + "benchmarks/"
 
@@ -164,22 +308,38 @@ def main():
             print("ERROR: MAME benchmark directory does not exist  - EXIT")
             return 1
 
-    # Check input and process game(s):
+    # Process game(s):
 
-    if (len(sys.argv) != 2):
-        print("Please provide a romname or 'all' as input argument")
-        return 1
-    
-    inputargument = sys.argv[1]
+    MAMEversion = benchmarkhistory.getMAMEversion(configsetup.MAMEexecdir, MAMEbenchmarkdir + "mameversion.json")
+
+    MAMEexecutabletime = 0
+    if os.path.isfile(configsetup.MAMEexecdir + "mame64"):
+        MAMEexecutabletime = os.path.getmtime(configsetup.MAMEexecdir + "mame64")
+
+    with instrumentation.stage('read benchmark history'):
+        history = benchmarkhistory.BenchmarkHistory(MAMEbenchmarkdir + "benchmarkhistory.txt")
+        instrumentation.fileread(MAMEbenchmarkdir + "benchmarkhistory.txt")
+        if (inputargument == 'all'):
+            importallgameslogs(history)
+        else:
+            importallgameslogs(history, inputargument) # Import the old file of this game before its new run is added
+
+    AMbenchmarks = inistore.INIStore(configsetup.AMsupportdir + "data/AMbenchmarks.ini")
 
     if (inputargument == 'all'):
-        for filename in os.listdir(MAMEbenchmarkdir): # For all files in MAME benchmark directory:
-            if (filename[-13:] == "_allgames.log"):
-                romname = filename[:-13]
-                
-                createbenchmarkfile(romname)
+        games = set(history.games())
+        with instrumentation.stage('read last game benchmarks'):
+            games.update(readlastgamelogs(history))
+        with instrumentation.stage('calculate statistics'):
+            createbenchmarkfiles(sorted(games), AMbenchmarks, history)
+        if inheritclonebenchmarks:
+            with instrumentation.stage('inherit clone benchmarks'):
+                inheritbenchmarks(AMbenchmarks, history)
     else:
-        createbenchmarkfile(inputargument)
+        createbenchmarkfile(inputargument, AMbenchmarks, history)
+
+    with instrumentation.stage('write AMbenchmarks.ini'):
+        AMbenchmarks.flush() # Save AMbenchmarks.ini once for all games
 
     return 0
 
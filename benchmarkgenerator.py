@@ -2,7 +2,8 @@
 """
 MAME support program to generate emulation benchmarks of a single game or a list of games:
 - User is asked to enter a benchmark timeperiod (default is 60 secs)
-- Benchmarks are generated and saved in a dedicated MAME benchmarks directory.
+- Benchmarks are generated and saved in a dedicated MAME benchmarks directory, together with the MAME version ({game}_lastgame.version),
+  so that benchmarkanalysis.py files each run under the MAME version that produced it.
 
 Usage:
 
@@ -12,39 +13,300 @@ Usage:
    where {game} is the romname of the game (e.g. pacman) 
 OR to process all games in your Attract-Mode MAME romlist, type:
    ./benchmarkgenerator.py all
+OR to process all games marked for re-benchmarking by benchmarkregression.py (rebenchmark.txt in the MAME benchmarks directory), type:
+   ./benchmarkgenerator.py rebenchmark
+3) Optionally adjust the number of MAME benchmarks that run in parallel in 'all'/'rebenchmark' mode (0 = number of physical CPU cores).
+   Each MAME process is pinned to its own physical CPU core, so that parallel benchmarks do not disturb each other. Pinning is only
+   supported on Linux: On other systems (e.g. macOS) 0 runs all benchmarks one after another, and parallel benchmarks are not pinned.
+   Set benchmarkworkers to 1 to run all benchmarks one after another (e.g. if MAME games need more than one core):
+"""
+
+benchmarkworkers = 0
+
+"""
+4) Optionally adjust the maximum number of attempts for games whose MAME benchmark fails in 'all' mode (e.g. because MAME crashes):
+"""
+
+benchmarkattempts = 2
+
+"""
+5) Optionally adjust how many seconds MAME may run longer than the benchmark running time before it is killed (e.g. because the game hangs).
+   A killed benchmark counts as a failed attempt:
+"""
+
+benchmarktimeoutmargin = 60
+
+"""
+Note: 'all'/'rebenchmark' mode runs are resumable. The state of each game is saved in benchmarkqueue.json in the MAME benchmarks directory,
+together with the mode and the benchmark running time. An interrupted run continues where it stopped if it is started again in the same mode
+and with the same running time. Otherwise you are asked whether the unfinished queue may be discarded before a new queue is created.
 
 Author: Gordon Lim
-Last Edit: 1 Feb 2018 
+Last Edit: 18 Oct 2026 
 """
 
+import benchmarkhistory
 import configsetup
+import instrumentation
+import multiprocessing
 import os
 import subprocess
 import sys
+import threading
+import time
+
+def getsiblings(cpu):
+
+    # Return list of logical CPUs that share a physical core with cpu (SMT/hyper-threading siblings, Linux only):
+
+    siblingsfilename = "/sys/devices/system/cpu/cpu{}/topology/thread_siblings_list".format(cpu)
+
+    if not os.path.isfile(siblingsfilename):
+        return [cpu]
+
+    siblingsfile = open(siblingsfilename, 'r')
+    siblingslist = siblingsfile.read().strip()
+    siblingsfile.close()
+
+    siblings = []
+    for cpurange in siblingslist.split(','):
+        first, separator, last = cpurange.partition('-')
+        siblings += list(range(int(first), int(last or first) + 1))
+
+    return siblings
+
+def getcpus():
+
+    # Return list of CPU cores this program is allowed to run on, with one logical CPU per physical core
+    # (benchmarks pinned to SMT siblings would share a physical core):
+
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = list(range(multiprocessing.cpu_count()))
+
+    cores = []
+    siblings = set()
+    for cpu in cpus:
+        if cpu not in siblings:
+            cores.append(cpu)
+            siblings.update(getsiblings(cpu))
 
-def generatebenchmark(game, benchmarktimeperiod):
+    return cores
+
+def canpin():
+
+    # Return whether MAME processes can be pinned to a CPU core on this system (see pincommand):
+
+    return hasattr(os, 'sched_setaffinity') or os.path.isfile('/usr/bin/taskset')
+
+def pincommand(command, cpu):
+
+    # Return command and preexec function that pin the MAME process to a single CPU core
+    # (os.sched_setaffinity or taskset on Linux; on systems without CPU affinity support the process is not pinned):
+
+    if cpu is None:
+        return command, None
+    elif hasattr(os, 'sched_setaffinity'):
+        return command, lambda: os.sched_setaffinity(0, [cpu])
+    elif os.path.isfile('/usr/bin/taskset'):
+        return ["/usr/bin/taskset", "-c", str(cpu)] + command, None
+    else:
+        return command, None
+
+def callwithtimeout(command, timeout, **arguments):
+
+    # Run command like subprocess.call, but kill the process if it is still running after timeout seconds
+    # (subprocess.call has no timeout in Python 2). Return exit code and whether the process has been killed:
+
+    process = subprocess.Popen(command, **arguments)
+
+    killed = []
+
+    def kill():
+        killed.append(True)
+        try:
+            process.kill()
+        except OSError: # Process has just finished
+            pass
+
+    timer = threading.Timer(timeout, kill)
+    timer.daemon = True
+    timer.start()
+    try:
+        exitcode = process.wait()
+    finally:
+        timer.cancel()
+
+    return exitcode, (len(killed) > 0)
+
+def generatebenchmark(game, benchmarktimeperiod, cpu = None):
 
     print("--- Generate new MAME benchmark file for {}...".format(game))
 
     # Generate new MAME speed benchmark:
 
-    command = ["./mame64", "-str", benchmarktimeperiod, game]
+    command, preexec_fn = pincommand(["./mame64", "-str", benchmarktimeperiod, game], cpu)
+
+    timeout = int(benchmarktimeperiod) + benchmarktimeoutmargin
+
+    versionfile = open(MAMEbenchmarkdir + game + "_lastgame.version", "w")
+    versionfile.write(MAMEversion + "\n")
+    versionfile.close()
 
     benchmarkfile = open(MAMEbenchmarkdir + game + "_lastgame.log", "w")
-    subprocess.call(command, cwd = configsetup.MAMEexecdir, stdout = benchmarkfile)
+    with instrumentation.stage(game, 'game'):
+        with instrumentation.stage('mame64', 'subprocess'):
+            exitcode, killed = callwithtimeout(command, timeout, cwd = configsetup.MAMEexecdir, stdout = benchmarkfile, preexec_fn = preexec_fn)
     benchmarkfile.close()
+
+    if killed:
+        print("------ MAME did not finish within {} secs while generating benchmark file for {} => MAME killed!".format(timeout, game))
+        exitcode = exitcode or 1
+    elif (exitcode == 0):
+        print("------ New MAME benchmark file for {} generated!".format(game))
+    else:
+        print("------ MAME exited with exit code {} while generating benchmark file for {}!".format(exitcode, game))
+        
+    return exitcode
+
+class BenchmarkQueue(object):
+
+    # Persistent queue of benchmark jobs (saved in the MAME benchmarks directory after every change), so that an
+    # interrupted 'all' or 'rebenchmark' run can be resumed. The queue is only resumed in the same mode and with the same
+    # benchmark running time. Job states: 'pending', 'running', 'done' or 'failed'.
     
-    print("------ New MAME benchmark file for {} generated!".format(game))
+    def __init__(self, filename):
+
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.mode = None
+        self.benchmarktimeperiod = None
+        self.jobs = []
+
+        savedqueue = configsetup.readjson(filename, ['benchmarktimeperiod', 'jobs'])
+        if savedqueue is not None:
+            self.mode = savedqueue.get('mode') # None for queues saved by previous versions of this program
+            self.benchmarktimeperiod = savedqueue['benchmarktimeperiod']
+            self.jobs = savedqueue['jobs']
+
+        # Jobs that were running when the previous run was interrupted count as failed attempts (e.g. if the game took down the run),
+        # so that they are only started again if they have not reached the maximum number of attempts:
         
-    return 0
+        for job in self.jobs:
+            if (job['state'] == 'running'):
+                job['state'] = 'failed'
+
+    def create(self, games, benchmarktimeperiod, mode):
+
+        self.mode = mode
+        self.benchmarktimeperiod = benchmarktimeperiod
+        self.jobs = [{'game': game, 'state': 'pending', 'attempts': 0, 'exitcode': None, 'duration': None} for game in games]
+        self.save()
+
+        return
+
+    def save(self):
+
+        configsetup.writejson(self.filename, {'mode': self.mode, 'benchmarktimeperiod': self.benchmarktimeperiod, 'jobs': self.jobs})
+
+        return
+
+    def unfinished(self):
+
+        return [job for job in self.jobs if (job['state'] == 'pending') or
+                                            ((job['state'] == 'failed') and (job['attempts'] < benchmarkattempts))]
+
+    def count(self, state):
+
+        return len([job for job in self.jobs if (job['state'] == state)])
+
+    def nextjob(self):
+
+        # Return next pending job, or next failed job that has not reached the maximum number of attempts yet:
+
+        self.lock.acquire()
+        try:
+            unfinishedjobs = self.unfinished()
+            if (len(unfinishedjobs) == 0):
+                return None
+            job = unfinishedjobs[0]
+            job['state'] = 'running'
+            job['attempts'] += 1
+            self.save()
+        finally:
+            self.lock.release()
+
+        return job
+
+    def finishjob(self, job, exitcode, duration):
+
+        self.lock.acquire()
+        try:
+            job['state'] = 'done' if (exitcode == 0) else 'failed'
+            job['exitcode'] = exitcode
+            job['duration'] = round(duration, 1)
+            self.save()
+        finally:
+            self.lock.release()
+
+        return
+
+def benchmarkworker(benchmarkqueue, cpu):
+
+    # Run jobs from benchmark queue until the queue is finished:
+
+    while True:
+        job = benchmarkqueue.nextjob()
+        if job is None:
+            break
+        starttime = time.time()
+        exitcode = generatebenchmark(job['game'], benchmarkqueue.benchmarktimeperiod, cpu)
+        benchmarkqueue.finishjob(job, exitcode, time.time() - starttime)
+
+    return
+
+def runbenchmarkqueue(benchmarkqueue, cpus):
+
+    # Run benchmarks of several games in parallel, one worker per entry of cpus, each MAME process pinned to that CPU core
+    # (None = not pinned):
+    
+    workers = []
+    for cpu in cpus:
+        worker = threading.Thread(target = benchmarkworker, args = (benchmarkqueue, cpu))
+        worker.daemon = True
+        worker.start()
+        workers.append(worker)
+
+    for worker in workers:
+        while worker.is_alive(): # Join with timeout to keep Ctrl-C working
+            worker.join(1)
+
+    return
+
+def readrebenchmarklist(filename):
+
+    # Read list of games marked for re-benchmarking by benchmarkregression.py:
+
+    if not os.path.isfile(filename):
+        return []
+
+    rebenchmarkfile = open(filename, 'r')
+    games = [line.strip() for line in rebenchmarkfile if (line.strip() != '')]
+    rebenchmarkfile.close()
+
+    return games
 
 def main():
 
     # Setup configuration:
     
+    instrumentation.init('benchmarkgenerator')
+
     configsetup.init()
 
     global MAMEbenchmarkdir
+    global MAMEversion
     
     MAMEbenchmarkdir = configsetup.MAMEconfigdir + "benchmarks/"
 
@@ -53,33 +315,89 @@ def main():
         if not os.path.isdir(MAMEbenchmarkdir):
             print("ERROR: MAME benchmark directory does not exist  - EXIT")
             return 1
+
+    MAMEversion = benchmarkhistory.getMAMEversion(configsetup.MAMEexecdir, MAMEbenchmarkdir + "mameversion.json")
     
     # Check input and process game(s):
     
     if (len(sys.argv) != 2):
-        print("Please provide a romname or 'all' as input argument")
+        print("Please provide a romname, 'all' or 'rebenchmark' as input argument")
         return 1
 
     inputargument = sys.argv[1]
 
-    benchmarktimeperiod = raw_input('Enter benchmark running time in seconds (default: 60 secs) and press return/enter: ') or '60'
-    
-    if (inputargument == 'all'):
+    if inputargument in ['all', 'rebenchmark']:
 
-        # Transform AM romlist into list of games:
+        # Resume unfinished benchmark queue of the same mode and with the same benchmark running time, or create new benchmark queue
+        # with each game in AM romlist (or in rebenchmark list):
 
-        games, header = configsetup.create_list_of_games_from_romlist()
+        benchmarkqueue = BenchmarkQueue(MAMEbenchmarkdir + "benchmarkqueue.json")
+
+        resume = False
+        
+        if (len(benchmarkqueue.unfinished()) > 0) and (benchmarkqueue.mode == inputargument):
+            print("Unfinished '{}' benchmark queue found: {} out of {} games done (benchmark running time: {} secs)".format(
+                benchmarkqueue.mode, benchmarkqueue.count('done'), len(benchmarkqueue.jobs), benchmarkqueue.benchmarktimeperiod))
+            benchmarktimeperiod = raw_input('Enter benchmark running time in seconds (default: {} secs, which resumes the unfinished queue) and press return/enter: '.format(
+                benchmarkqueue.benchmarktimeperiod)) or benchmarkqueue.benchmarktimeperiod
+            resume = (benchmarktimeperiod == benchmarkqueue.benchmarktimeperiod)
+        else:
+            benchmarktimeperiod = raw_input('Enter benchmark running time in seconds (default: 60 secs) and press return/enter: ') or '60'
+
+        if not benchmarktimeperiod.isdigit():
+            print("Next time please enter the benchmark running time as a whole number of seconds")
+            return 1
+
+        if resume:
+            print("Resuming benchmark queue...")
+        else:
+            if (len(benchmarkqueue.unfinished()) > 0):
+                discard = raw_input("Discard unfinished {}benchmark queue ({} out of {} games done, benchmark running time: {} secs) and start a new queue? Press \"y\" or \"n\" followed by return/enter: ".format(
+                    "'{}' ".format(benchmarkqueue.mode) if benchmarkqueue.mode else '', benchmarkqueue.count('done'), len(benchmarkqueue.jobs), benchmarkqueue.benchmarktimeperiod))
+                if (discard != 'y'):
+                    print("Unfinished benchmark queue kept - EXIT")
+                    return 1
+            if (inputargument == 'rebenchmark'):
+                benchmarkqueue.create(readrebenchmarklist(MAMEbenchmarkdir + "rebenchmark.txt"), benchmarktimeperiod, inputargument)
+            else:
+                with instrumentation.stage('read romlist'):
+                    benchmarkqueue.create([game.Name for game in configsetup.read_romlist()], benchmarktimeperiod, inputargument)
     
-        if (len(games) == 0):
-            print("AM romlist is empty - EXIT")
+        if (len(benchmarkqueue.jobs) == 0):
+            print("List of games is empty - EXIT")
             return 1
 
-        # Create MAME benchmark file for each game:
-        
-        for game in games:
-            generatebenchmark(game[0], benchmarktimeperiod)
+        # Create MAME benchmark file for each game in benchmark queue:
+
+        if (benchmarkworkers > 0):
+            numberofworkers = benchmarkworkers
+        elif canpin():
+            numberofworkers = len(getcpus())
+        else:
+            print("WARNING: MAME processes cannot be pinned to CPU cores on this system => benchmarks run one after another")
+            numberofworkers = 1
+
+        if (numberofworkers > 1) and canpin():
+            cpus = getcpus()[:numberofworkers]
+        else:
+            cpus = [None] * numberofworkers
+
+        if (len(cpus) > 1) and (cpus[0] is not None):
+            print("Running {} MAME benchmarks in parallel, each pinned to its own CPU core...".format(len(cpus)))
+        elif (len(cpus) > 1):
+            print("WARNING: Running {} MAME benchmarks in parallel, but MAME processes cannot be pinned to CPU cores on this system...".format(len(cpus)))
+
+        runbenchmarkqueue(benchmarkqueue, cpus)
+
+        print("==> Total # of games = {}".format(len(benchmarkqueue.jobs)))
+        print("--> # of games with benchmark = {}".format(benchmarkqueue.count('done')))
+        print("--> # of games without benchmark after {} attempts = {}".format(benchmarkattempts, benchmarkqueue.count('failed')))
                         
     else:
+        benchmarktimeperiod = raw_input('Enter benchmark running time in seconds (default: 60 secs) and press return/enter: ') or '60'
+        if not benchmarktimeperiod.isdigit():
+            print("Next time please enter the benchmark running time as a whole number of seconds")
+            return 1
         generatebenchmark(inputargument, benchmarktimeperiod)
 
     return 0
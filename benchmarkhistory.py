@@ -0,0 +1,260 @@
+#!/usr/bin/python -tt
+"""
+MAME support module to save and analyze the history of MAME emulation benchmarks:
+- Every benchmark run is appended as one line to a single ASCII file (benchmarkhistory.txt in the MAME benchmarks directory):
+  romname;speed;duration;timestamp;MAME version
+- Per game (and optionally per MAME version) statistics are calculated from all runs: number of runs, total time,
+  time-weighted mean speed, mean, median, 10th/90th percentile and variance of the speed.
+- Speeds of two sets of runs (e.g. two MAME versions) can be compared with Welch's t-test.
+
+Usage:
+
+   history = benchmarkhistory.BenchmarkHistory(filename)
+   history.append(romname, speed, duration, version, timestamp)
+   statistics = history.statistics(romname)
+
+Author: Gordon Lim
+Last Edit: 18 Oct 2026
+"""
+
+import configsetup
+import math
+import os
+import subprocess
+import time
+
+class BenchmarkHistory(object):
+
+    def __init__(self, filename):
+
+        self.filename = filename
+        self.runs = {} # romname -> list of (speed, duration, timestamp, version)
+
+        if os.path.isfile(filename):
+            self.read()
+
+    def read(self):
+
+        historyfile = open(self.filename, 'r')
+
+        for line in historyfile:
+            fields = line.rstrip('\r\n').split(';')
+            if (len(fields) != 5) or (line[0:1] == '#'):
+                continue
+            try:
+                run = (float(fields[1]), float(fields[2]), float(fields[3]), fields[4])
+            except ValueError:
+                continue
+            self.runs.setdefault(fields[0], []).append(run)
+
+        historyfile.close()
+
+        return
+
+    def __contains__(self, romname):
+
+        return romname in self.runs
+
+    def games(self):
+
+        return sorted(self.runs)
+
+    def versions(self, romname):
+
+        return sorted(set(run[3] for run in self.runs.get(romname, [])))
+
+    def append(self, romname, speed, duration, version, timestamp = None):
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        run = (float(speed), float(duration), float(timestamp), version)
+
+        historyfile = open(self.filename, 'a')
+        historyfile.write("{};{:.2f};{:.0f};{:.0f};{}\n".format(romname, run[0], run[1], run[2], run[3]))
+        historyfile.close()
+
+        self.runs.setdefault(romname, []).append(run)
+
+        return
+
+    def extend(self, runs):
+
+        # Append list of (romname, speed, duration, version, timestamp) runs, writing the history file once:
+
+        if (len(runs) == 0):
+            return
+
+        historyfile = open(self.filename, 'a')
+        for romname, speed, duration, version, timestamp in runs:
+            run = (float(speed), float(duration), float(timestamp), version)
+            historyfile.write("{};{:.2f};{:.0f};{:.0f};{}\n".format(romname, run[0], run[1], run[2], run[3]))
+            self.runs.setdefault(romname, []).append(run)
+        historyfile.close()
+
+        return
+
+    def speeds(self, romname, version = None):
+
+        return [run[0] for run in self.runs.get(romname, []) if (version is None) or (run[3] == version)]
+
+    def statistics(self, romname, version = None):
+
+        # Return dictionary with statistics of all runs of a game (or None if there are no runs):
+
+        runs = [run for run in self.runs.get(romname, []) if (version is None) or (run[3] == version)]
+
+        if (len(runs) == 0):
+            return None
+
+        speeds = sorted(run[0] for run in runs)
+        time_total = sum(run[1] for run in runs)
+
+        mean = sum(speeds)/len(speeds)
+
+        if (time_total > 0):
+            weightedmean = sum(run[0]*run[1] for run in runs)/time_total
+        else:
+            weightedmean = mean
+
+        variance = 0.0
+        if (len(speeds) > 1):
+            variance = sum((speed - mean)**2 for speed in speeds)/(len(speeds) - 1)
+
+        return {'runs'        : len(runs),
+                'time'        : time_total,
+                'weightedmean': weightedmean,
+                'mean'        : mean,
+                'median'      : percentile(speeds, 50),
+                'p10'         : percentile(speeds, 10),
+                'p90'         : percentile(speeds, 90),
+                'variance'    : variance}
+
+def percentile(sortedvalues, p):
+
+    # Percentile of sorted values, with linear interpolation between the closest ranks:
+
+    position = (len(sortedvalues) - 1)*p/100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sortedvalues) - 1)
+
+    return sortedvalues[lower] + (sortedvalues[upper] - sortedvalues[lower])*(position - lower)
+
+def welchttest(speeds1, speeds2):
+
+    # Welch's t-test of the hypothesis that the mean of speeds2 is lower than the mean of speeds1.
+    # Return t-statistic, degrees of freedom and one-sided p-value (or None if there are less than 2 runs per set):
+
+    n1 = len(speeds1)
+    n2 = len(speeds2)
+
+    if (n1 < 2) or (n2 < 2):
+        return None
+
+    mean1 = sum(speeds1)/float(n1)
+    mean2 = sum(speeds2)/float(n2)
+
+    vn1 = sum((speed - mean1)**2 for speed in speeds1)/(n1 - 1)/n1
+    vn2 = sum((speed - mean2)**2 for speed in speeds2)/(n2 - 1)/n2
+
+    if (vn1 + vn2 == 0): # All runs of both sets have identical speeds
+        if (mean2 < mean1):
+            return float('inf'), float(n1 + n2 - 2), 0.0
+        return 0.0, float(n1 + n2 - 2), 1.0
+
+    t  = (mean1 - mean2)/math.sqrt(vn1 + vn2)
+    df = (vn1 + vn2)**2/(vn1**2/(n1 - 1) + vn2**2/(n2 - 1))
+
+    ptwosided = incompletebeta(df/2, 0.5, df/(df + t**2))
+
+    if (t > 0):
+        return t, df, ptwosided/2
+    else:
+        return t, df, 1 - ptwosided/2
+
+def incompletebeta(a, b, x):
+
+    # Regularized incomplete beta function I_x(a, b), evaluated with a continued fraction:
+
+    if (x <= 0):
+        return 0.0
+    if (x >= 1):
+        return 1.0
+
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a*math.log(x) + b*math.log(1 - x))
+
+    if (x < (a + 1)/(a + b + 2)):
+        return front*betacontinuedfraction(a, b, x)/a
+    else:
+        return 1 - front*betacontinuedfraction(b, a, 1 - x)/b
+
+def betacontinuedfraction(a, b, x, maxiterations = 200, epsilon = 3e-14):
+
+    tiny = 1e-300
+
+    c = 1.0
+    d = 1 - (a + b)*x/(a + 1)
+    if (abs(d) < tiny):
+        d = tiny
+    d = 1/d
+    result = d
+
+    for m in range(1, maxiterations + 1):
+        for numerator in (m*(b - m)*x/((a + 2*m - 1)*(a + 2*m)), -(a + m)*(a + b + m)*x/((a + 2*m)*(a + 2*m + 1))):
+            d = 1 + numerator*d
+            if (abs(d) < tiny):
+                d = tiny
+            c = 1 + numerator/c
+            if (abs(c) < tiny):
+                c = tiny
+            d = 1/d
+            result *= d*c
+        if (abs(d*c - 1) < epsilon):
+            break
+
+    return result
+
+def readversionfile(versionfilename):
+
+    # Return MAME version saved with a MAME benchmark file ({game}_lastgame.version, the output of "./mame64 -version"):
+
+    versionfile = open(versionfilename, 'r')
+    fields = versionfile.read().split()
+    versionfile.close()
+
+    if (len(fields) == 0):
+        return 'unknown'
+
+    return fields[0]
+
+def getMAMEversion(MAMEexecdir, cachefilename):
+
+    # Return MAME version from "./mame64 -version" (e.g. "0.193"). The version is cached in cachefilename,
+    # keyed on size and mtime of the MAME executable, so MAME is only started again after a MAME upgrade:
+
+    MAMEexecutable = MAMEexecdir + "mame64"
+
+    if not os.path.isfile(MAMEexecutable):
+        return 'unknown'
+
+    stat = os.stat(MAMEexecutable)
+
+    cache = configsetup.readjson(cachefilename, ['size', 'mtime', 'version'])
+
+    if (cache is not None) and (cache['size'] == stat.st_size) and (cache['mtime'] == stat.st_mtime):
+        return cache['version']
+
+    try:
+        output = subprocess.check_output(["./mame64", "-version"], cwd = MAMEexecdir)
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+    fields = output.decode('utf-8', 'replace').split()
+
+    version = 'unknown'
+    if (len(fields) > 0):
+        version = fields[0]
+
+    configsetup.writejson(cachefilename, {'size': stat.st_size, 'mtime': stat.st_mtime, 'version': version})
+
+    return version
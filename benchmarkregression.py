@@ -0,0 +1,184 @@
+#!/usr/bin/python -tt
+"""
+MAME support program to detect emulation speed regressions between two MAME versions:
+- Benchmark runs are taken from the benchmark history (benchmarkhistory.txt in the MAME benchmarks directory), in which every run
+  is tagged with the MAME version that generated it (see benchmarkanalysis.py).
+- For each game with benchmark runs of both MAME versions, the speeds of both versions are compared with Welch's t-test,
+  so that a drop in speed is only reported if it is both larger than a threshold and statistically significant.
+- Games whose star rating changed between both MAME versions are saved in rebenchmark.txt in the MAME benchmarks directory.
+  These games can be benchmarked again with "./benchmarkgenerator.py rebenchmark".
+- The regression report is printed and saved in regressionreport.txt in the MAME benchmarks directory.
+
+Usage:
+
+1) Change configsetup.py according to your system setup.
+2) Optionally adjust the minimum drop in speed (in % of the speed of the old MAME version) to be reported as a regression:
+"""
+
+regressionthreshold = 5.0
+
+"""
+3) Optionally adjust the significance level of the t-test (a regression needs at least 2 runs per MAME version):
+"""
+
+significancelevel = 0.05
+
+"""
+4) To compare the two most recent MAME versions in the benchmark history, type:
+   ./benchmarkregression.py
+OR to compare two specific MAME versions, type:
+   ./benchmarkregression.py {oldversion} {newversion}
+   where {oldversion} and {newversion} are MAME versions (e.g. 0.192 0.193)
+
+Author: Gordon Lim
+Last Edit: 18 Oct 2026
+"""
+
+import benchmarkanalysis
+import benchmarkhistory
+import configsetup
+import os
+import sys
+
+def versionkey(version):
+
+    # Sort MAME versions numerically (e.g. 0.99 < 0.100):
+
+    key = []
+    for field in version.split('.'):
+        try:
+            key.append(int(field))
+        except ValueError:
+            key.append(-1)
+
+    return key
+
+def comparegame(history, game, oldversion, newversion):
+
+    # Return dictionary with comparison of both MAME versions of a game (or None if either version has no runs):
+
+    oldstatistics = history.statistics(game, oldversion)
+    newstatistics = history.statistics(game, newversion)
+
+    if (oldstatistics is None) or (newstatistics is None):
+        return None
+
+    oldspeed = oldstatistics['mean']
+    newspeed = newstatistics['mean']
+
+    drop = 0.0
+    if (oldspeed > 0):
+        drop = 100*(oldspeed - newspeed)/oldspeed
+
+    ttest = benchmarkhistory.welchttest(history.speeds(game, oldversion), history.speeds(game, newversion))
+
+    pvalue = None
+    if ttest is not None:
+        pvalue = ttest[2]
+
+    oldstars = benchmarkanalysis.calculatestarrating(oldstatistics['weightedmean'])
+    newstars = benchmarkanalysis.calculatestarrating(newstatistics['weightedmean'])
+
+    return {'game'      : game,
+            'oldruns'   : oldstatistics['runs'],
+            'newruns'   : newstatistics['runs'],
+            'oldspeed'  : oldspeed,
+            'newspeed'  : newspeed,
+            'drop'      : drop,
+            'pvalue'    : pvalue,
+            'regression': (drop > regressionthreshold) and (pvalue is not None) and (pvalue < significancelevel),
+            'oldstars'  : oldstars,
+            'newstars'  : newstars}
+
+def createreport(comparisons, oldversion, newversion):
+
+    # Return report as list of lines:
+
+    regressions  = [comparison for comparison in comparisons if comparison['regression']]
+    untested     = [comparison for comparison in comparisons if (comparison['pvalue'] is None) and (comparison['drop'] > regressionthreshold)]
+    starchanges  = [comparison for comparison in comparisons if (comparison['oldstars'] != comparison['newstars'])]
+
+    lines = []
+    lines.append("MAME {} -> {}: {} games compared (threshold = {}%, significance level = {})".format(
+        oldversion, newversion, len(comparisons), regressionthreshold, significancelevel))
+
+    lines.append("")
+    lines.append("Regressions ({} games):".format(len(regressions)))
+    for comparison in sorted(regressions, key = lambda comparison: -comparison['drop']):
+        lines.append("  {:<16} {:6.2f}% -> {:6.2f}% ({:+.2f}%, p = {:.4f}, runs = {}/{})".format(
+            comparison['game'], comparison['oldspeed'], comparison['newspeed'], -comparison['drop'], comparison['pvalue'],
+            comparison['oldruns'], comparison['newruns']))
+
+    lines.append("")
+    lines.append("Possible regressions, not tested because of less than 2 runs per MAME version ({} games):".format(len(untested)))
+    for comparison in sorted(untested, key = lambda comparison: -comparison['drop']):
+        lines.append("  {:<16} {:6.2f}% -> {:6.2f}% ({:+.2f}%, runs = {}/{})".format(
+            comparison['game'], comparison['oldspeed'], comparison['newspeed'], -comparison['drop'],
+            comparison['oldruns'], comparison['newruns']))
+
+    lines.append("")
+    lines.append("Star rating changes, marked for re-benchmarking ({} games):".format(len(starchanges)))
+    for comparison in starchanges:
+        lines.append("  {:<16} {} -> {} stars".format(comparison['game'], comparison['oldstars'], comparison['newstars']))
+
+    return lines
+
+def main():
+
+    # Setup configuration:
+
+    configsetup.init()
+
+    MAMEbenchmarkdir = configsetup.MAMEconfigdir + "benchmarks/"
+
+    history = benchmarkhistory.BenchmarkHistory(MAMEbenchmarkdir + "benchmarkhistory.txt")
+
+    # Check input:
+
+    versions = set()
+    for game in history.games():
+        versions.update(history.versions(game))
+    versions.discard('unknown')
+    versions = sorted(versions, key = versionkey)
+
+    if (len(sys.argv) == 3):
+        oldversion, newversion = sys.argv[1], sys.argv[2]
+    elif (len(sys.argv) == 1) and (len(versions) >= 2):
+        oldversion, newversion = versions[-2], versions[-1]
+    else:
+        print("Please provide two MAME versions as input arguments (MAME versions in benchmark history: {})".format(', '.join(versions) or 'none'))
+        return 1
+
+    # Compare MAME versions for each game:
+
+    comparisons = []
+    for game in history.games():
+        comparison = comparegame(history, game, oldversion, newversion)
+        if comparison is not None:
+            comparisons.append(comparison)
+
+    if (len(comparisons) == 0):
+        print("No games with benchmarks of both MAME {} and MAME {} - EXIT".format(oldversion, newversion))
+        return 1
+
+    # Save report and list of games to be benchmarked again:
+
+    lines = createreport(comparisons, oldversion, newversion)
+
+    for line in lines:
+        print(line)
+
+    reportfile = open(MAMEbenchmarkdir + "regressionreport.txt", 'w')
+    reportfile.write('\n'.join(lines) + '\n')
+    reportfile.close()
+
+    rebenchmarkfile = open(MAMEbenchmarkdir + "rebenchmark.txt", 'w')
+    for comparison in comparisons:
+        if (comparison['oldstars'] != comparison['newstars']):
+            rebenchmarkfile.write(comparison['game'] + '\n')
+    rebenchmarkfile.close()
+
+    return 0
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,13 @@
 """
 MAME support program to analyze MAME bezel artwork:
 - Analysis is based on the standard .lay file structure as defined here: http://wiki.mamedev.org/index.php/LAY_File_Basics_-_Part_I
+  Each .lay file is parsed into a layout model (see layparser.py), in which the bezel view, bezel element, bezel .png file
+  and screen/bezel dimensions are looked up.
 - User chooses whether to create a low resolution version of each bezel (since bezel files usually are high resolution and therefore can 
   be slow to render in Attract-Mode), or create symbolic links to the original bezel files.
+  Low resolution versions are created in-process with Pillow if it is installed (pip install Pillow), or with Sips otherwise (see imageresize.py).
+  Low resolution versions are cached in the bezelcache/ subdirectory of the AM bezels directory, so that each original bezel is only
+  resized once (see bezelcache.py). AM bezels that share an original bezel (e.g. generic bezels) are hard links to the same cached file.
 - Low-resolution bezels / symlinks are saved in a dedicated Attract-Mode bezels directory.
 - Bezel data are reformatted and saved in a formatted ASCII file (AMbezels.ini). This file can be used to display bezels in Attract-Mode.
 
@@ -17,29 +22,452 @@ myAMbezeldir = "${HOME}/Games/Arcade Art/bezel/AMbezels/" # Directory where AM b
 
 """
 3) Provide data/bezeldirectories.txt file with a list of directories which contain bezel artwork.
-4) Make sure {game}.zip files are unzipped. This can be accomplished by using unziplist.sh: For each directory in your list, 
-   copy unziplist.sh to the directory, cd to the directory and type: ./bash unziplist.sh 
-   (Note: unzipping bezel artwork costs hardly any extra diskspace)
+4) Bezel artwork is read directly from the {game}.zip files in these directories (only the .lay file and the bezel .png file are read).
+   Unzipped artwork directories ({game}/) are supported as well, and are used instead of {game}.zip if both exist.
+   Artwork can be unzipped by using unziplist.sh: For each directory in your list, copy unziplist.sh to the directory,
+   cd to the directory and type: ./bash unziplist.sh 
 5) Provide optional data/bezelexceptions.txt file for games which should be excluded from this analysis.
-6) In a terminal, type: ./bezelanalysis.py
+6) Optionally choose whether clones without bezel artwork inherit the bezel of their parent game:
+"""
+
+inheritclonebezels = True
+
+"""
+7) Optionally adjust the number of worker threads per analysis stage (0 = number of CPU cores):
+"""
+
+bezelworkers = 0
+
+"""
+   Games are analyzed in a pipeline (discover artwork -> parse .lay file -> select bezel -> create low-resolution bezel or symlink),
+   in which each stage has its own worker threads (see pipeline.py). Results are printed and saved in romlist order.
+   Reading artwork and creating low-resolution bezels scale with the number of CPU cores, parsing .lay files (Python code) does not.
+8) In a terminal, type: ./bezelanalysis.py
 
 Author: Gordon Lim
-Last Edit: 7 Feb 2018 
+Last Edit: 18 Oct 2026 
 """
 
+import artwork
+import bezelcache
 import configsetup
 import fnmatch
+import hashlib
+import imageresize
+import instrumentation
+import json
+import layparser
+import multiprocessing
 import os
+import pipeline
 import re
 import subprocess
 import sys
 
+# Queries to find the bezel view and bezel element in the layout model: (view name pattern, bezel element name patterns).
+# The first view of which the name matches a view name pattern and that contains a matching bezel element is used,
+# where the element name patterns of each query are tried in order:
+
+bezelelement_patterns1 = ['[Bb]ez.+', '[Oo]uter.*', '[Ii]nner.*', 'sac.*', '.+[Bb]ez.+', '.+[Oo]uter.*', '.+[Ii]nner.*']
+bezelelement_patterns2 = ['[Cc]oc.+', '.+[Cc]oc.+', '[Bb]ez.+', '.+[Bb]ez.+']
+
+bezelviewqueries = [('.*[Uu]p.+',  bezelelement_patterns1),  # Upright views
+                    ('Marquee.*',  bezelelement_patterns1),
+                    ('.*[Cc]oc.+', bezelelement_patterns2)]  # Cocktail views
+
+genericbezelfilenames = ["taito_f3_bezel.png", "bally_sente_bezel_sac1.png", "bally_sente_bezel_sac1_deluxe.png", "sac1_deluxe_bezel.png",
+                         "bm_1_vert.png", "bm_2_vert.png", "bm_1_horiz.png", "bm_2_horiz.png"]
+
+genericbezelprefixes = ["rockola_bezel_", "deco_bezel", "generic_bezel"]
+
+# Version of the bezel analysis (increase to invalidate the cached analysis results, see bezelcache.py):
+
+analysisversion = 1
+
+dimensionnames = ['x_screen', 'y_screen', 'w_screen', 'h_screen', 'x_bezel', 'y_bezel', 'w_bezel', 'h_bezel',
+                  'x_bezeltotal', 'y_bezeltotal', 'w_bezeltotal', 'h_bezeltotal']
+
+def isgenericbezel(bezelfilename):
+
+    if bezelfilename in genericbezelfilenames:
+        return True
+
+    for prefix in genericbezelprefixes:
+        if (bezelfilename[:len(prefix)] == prefix):
+            return True
+
+    return False
+
+class BezelJob(object):
+
+    # Bezel analysis of a single game, passed through the stages of the analysis pipeline
+    # (output is buffered per game and printed in romlist order):
+
+    def __init__(self, game):
+
+        self.romname       = game.Name
+        self.lines         = ["--- Analyzing bezels for {}...".format(game.Name)]
+        self.exitcode      = None # EXIT code of a game without bezel (None if the bezel analysis succeeded)
+        self.MAMEbezeldir  = None
+        self.kind          = None # 'dir' or 'zip'
+        self.artworkpath   = None
+        self.artwork       = None
+        self.analysisstart = None # Index of the first line of analysis output (saved in the analysis cache)
+        self.cached        = None # 'stamp' or 'hash' if the cached analysis result is used
+        self.layfilename   = None
+        self.sha1          = None # Content hash of .lay file
+        self.layout        = None
+        self.bezelfilename = None
+        self.dimensions    = None # Screen, bezel and total bezel dimensions (x, y, width, height) in .lay file units
+        self.bezel         = None # Bezel data saved in AMbezels.ini
+
+    def log(self, line):
+
+        self.lines.append(line)
+
+        return
+
+    def openartwork(self):
+
+        # Open artwork directory or artwork zip file (if it is not open yet), return None if the artwork is not valid:
+
+        if self.artwork is None:
+            with instrumentation.stage('open artwork'):
+                self.artwork = artwork.openartwork(self.MAMEbezeldir, self.romname, self.kind)
+
+        return self.artwork
+
+    def result(self):
+
+        # Analysis result, as saved in the analysis cache:
+
+        return {'exitcode'     : self.exitcode,
+                'lines'        : self.lines[self.analysisstart:],
+                'bezelfilename': self.bezelfilename,
+                'dimensions'   : self.dimensions}
+
+    def useresult(self, result, cached):
+
+        self.lines.extend(result['lines'])
+        self.exitcode      = result['exitcode']
+        self.bezelfilename = result['bezelfilename']
+        self.dimensions    = result['dimensions']
+        self.cached        = cached
+        self.layout        = None
+
+        if self.exitcode is not None:
+            self.close()
+
+        return self
+
+    def exit(self, exitcode, line):
+
+        self.lines.append(line)
+        self.exitcode = exitcode
+        self.close()
+
+        return self
+
+    def close(self):
+
+        if self.artwork is not None:
+            self.artwork.close()
+            self.artwork = None
+
+        self.layout = None
+
+        return
+
+def discoverartwork(job, excludedgames, artworkindex, analysiscache):
+
+    # Pipeline stage 1: Check whether game is excluded, and use the cached analysis result if the artwork has not changed
+    # or open its artwork directory or artwork zip file otherwise:
+
+    romname = job.romname
+
+    # Skip excluded games:
+
+    if romname in excludedgames:
+        return job.exit(0, "------ included in list of excluded games - EXIT0")
+    else:
+        job.log("------ {} is not included in list of excluded games...".format(romname))
+
+    # Skip games without artwork:
+
+    if romname not in artworkindex:
+        return job.exit(1, "------ no artwork - EXIT1")
+
+    MAMEbezeldir, kind = artworkindex[romname]
+
+    job.log("------ {} exists...".format(MAMEbezeldir + romname))
+
+    job.MAMEbezeldir = MAMEbezeldir
+    job.kind = kind
+    job.artworkpath = MAMEbezeldir + romname + ('.zip' if (kind == 'zip') else '')
+    job.analysisstart = len(job.lines)
+
+    with instrumentation.stage('lookup analysis cache'):
+        result = analysiscache.lookup(romname, job.artworkpath, kind)
+
+    if result is not None:
+        return job.useresult(result, 'stamp')
+
+    if job.openartwork() is None:
+        return job.exit(1, "------ artwork is not a valid zip file - EXIT1")
+
+    return job
+
+def parselayout(job, analysiscache):
+
+    # Pipeline stage 2: Find and parse .lay file (there should be only one), unless the analysis result of a .lay file
+    # with the same content hash is cached:
+
+    if (job.exitcode is not None) or (job.cached is not None):
+        return job
+
+    layfilename = ''
+    for entry in job.artwork.names():
+        if fnmatch.fnmatch(entry, "*.lay"):
+            layfilename = entry
+
+    if (layfilename == ''):
+        return job.exit(2, "------ artwork does not contain a .lay file - EXIT2")
+
+    with instrumentation.stage('read .lay file'):
+        laydata = job.artwork.read(layfilename)
+        instrumentation.bytesread(len(laydata))
+
+    job.layfilename = layfilename
+    job.sha1 = hashlib.sha1(laydata).hexdigest()
+
+    result = analysiscache.lookuphash(job.romname, job.artworkpath, job.kind, layfilename, job.sha1)
+
+    if result is not None:
+        return job.useresult(result, 'hash')
+
+    with instrumentation.stage('parse .lay file'):
+        job.layout = layparser.parse(laydata)
+
+    if job.layout.error is not None:
+        job.log("------ .lay file is not well-formed ({}), using the layout up to the error...".format(job.layout.error))
+
+    return job
+
+def selectbezel(job, excludegenericbezels, analysiscache):
+
+    # Pipeline stage 3: Find bezel data in layout model, and save the analysis result in the analysis cache:
+
+    if (job.exitcode is None) and (job.layout is not None):
+        analyzelayout(job, excludegenericbezels)
+
+    if (job.analysisstart is not None) and (job.cached != 'stamp'):
+        analysiscache.store(job.romname, job.artworkpath, job.kind, job.layfilename, job.sha1, job.result())
+
+    return job
+
+def analyzelayout(job, excludegenericbezels):
+
+    # Find bezel data in layout model:
+
+    layout = job.layout
+
+    with instrumentation.stage('select bezel'):
+
+        # 1) Check for bezel tag in "Artwork type:" line:
+
+        if re.search('[Bb]ezel', layout.artworktype):
+            job.log("------ .lay file contains a bezel tag...")
+        else:
+            return job.exit(2, "------ .lay file does not contain a bezel tag - EXIT2")
+
+        # 2) Find view and bezel element:
+
+        for viewpattern, bezelelementpatterns in bezelviewqueries:
+            view, bezel = layout.findview(viewpattern, bezelelementpatterns)
+            if view is not None:
+                job.log("------ .lay file contains view name '{}' and bezel element '{}' ...".format(view.name, bezel.element))
+                break
+
+        if view is None:
+            return job.exit(3, "------ .lay file does not contain a valid view name and bezel element - EXIT3")
+
+        if ((excludegenericbezels == 'y') and (bezel.element[0:3] == 'sac')):
+            return job.exit(5, "------ png file is a generic bezel - EXIT5")
+
+        # 3) Find .png filename of bezel element:
+
+        bezelfilename = layout.imagefile(bezel.element)
+
+        if bezelfilename is not None:
+            job.log("------ bezel .png file found ({})...".format(bezelfilename))
+        else:
+            return job.exit(4, "------ .lay file does not contain a .png filename for bezel element - EXIT4")
+
+        # Exclude generic bezels:
+
+        if ((excludegenericbezels == 'y') and isgenericbezel(bezelfilename)):
+            return job.exit(5, "------ png file is a generic bezel - EXIT5")
+
+        # 4) Get screen dimensions:
+
+        screens = [screen for screen in view.screens if screen is not None]
+
+        if (len(screens) > 0):
+            job.log("------ artwork contains screen dimensions...")
+        else:
+            return job.exit(6, "------ .lay file does not contain screen dimensions - EXIT6")
+
+        # 5) Get bezel dimensions:
+
+        if bezel.bounds is not None:
+            job.log("------ artwork contains bezel dimensions...")
+        else:
+            return job.exit(7, "------ .lay file does not contain bezel dimensions - EXIT7")
+
+        # 6) Get total bezel dimensions (if available):
+
+        bezeltotal = bezel.bounds
+
+        if view.bounds is not None:
+            job.log("------ artwork contains total bezel dimensions...")
+            bezeltotal = view.bounds
+
+    job.bezelfilename = bezelfilename
+    job.dimensions = [screens[0].x, screens[0].y, screens[0].width, screens[0].height,
+                      bezel.bounds.x, bezel.bounds.y, bezel.bounds.width, bezel.bounds.height,
+                      bezeltotal.x, bezeltotal.y, bezeltotal.width, bezeltotal.height]
+    job.layout = None
+
+    job.log("------ bezel filename = {}".format(bezelfilename))
+    for name, dimension in zip(dimensionnames, job.dimensions):
+        job.log("------ {} = {}".format(name, dimension))
+
+    return job
+
+def createbezel(job, AMbezeldir, rescale, AMbezelresolution, cache):
+
+    # Pipeline stage 4: Create low-resolution version of bezel or symbolic link to bezel:
+
+    if job.exitcode is not None:
+        return job
+
+    romname = job.romname
+    bezelfilename = job.bezelfilename
+    dimensions = job.dimensions
+
+    destination = AMbezeldir + romname + '.png'
+
+    if (rescale != "y") and os.path.lexists(destination): # Artwork does not have to be opened
+        gameartwork = None
+    else:
+        gameartwork = job.openartwork()
+        if gameartwork is None:
+            return job.exit(1, "------ artwork is not a valid zip file - EXIT1")
+
+    if (rescale == "y"):
+
+        # Create ${AMbezeldir}/{romname}.png as hard link to the low-resolution version of the .png file in the bezel cache
+        # (the .png file is only read and resized if it is not in the cache yet):
+
+        oldpixelwidth, oldpixelheight, newpixelwidth, newpixelheight, cached = cache.createbezel(gameartwork, bezelfilename, AMbezelresolution, destination)
+
+        oldpixelwidth  = float(oldpixelwidth)
+        oldpixelheight = float(oldpixelheight)
+        newpixelwidth  = float(newpixelwidth)
+        newpixelheight = float(newpixelheight)
+
+        # Rescale saved bezel data:
+
+        pixelscalefactor = 1
+        if (oldpixelwidth > oldpixelheight):
+            pixelscalefactor = newpixelwidth/oldpixelwidth
+        else:
+            pixelscalefactor = newpixelheight/oldpixelheight
+
+        dimensions = [dimension*pixelscalefactor for dimension in dimensions]
+
+        job.log("------ old .png pixel width  = {}".format(oldpixelwidth))
+        job.log("------ old .png pixel height = {}".format(oldpixelheight))
+        job.log("------ new .png pixel width  = {}".format(newpixelwidth))
+        job.log("------ new .png pixel height = {}".format(newpixelheight))
+        job.log("------ .png pixelscalefactor = {}".format(pixelscalefactor))
+
+        if cached:
+            job.log("------ low-resolution version of {}.png taken from bezel cache...".format(romname))
+        else:
+            job.log("------ low-resolution version of {}.png created...".format(romname))
+
+    else: # Create symlink to bezel file (or extract bezel file from artwork zip file):
+
+        try:
+            if gameartwork is None:
+                raise OSError("{} exists already".format(destination))
+            with instrumentation.stage('link bezel'):
+                gameartwork.link(bezelfilename, destination)
+        except OSError:
+            job.log("------ {}.png exists already".format(romname))
+        else:
+            if (gameartwork.kind == 'dir'):
+                job.log("------ symlink to {}.png created...".format(romname))
+            else:
+                job.log("------ {}.png extracted from {}...".format(romname, gameartwork.path))
+
+    job.close()
+
+    # Save bezel data:
+
+    job.bezel = [romname, bezelfilename] + [int(round(dimension)) for dimension in dimensions]
+
+    job.log("------ bezel data saved - SUCCESS")
+
+    return job
+
 def main():
 
     # Setup configuration:
     
+    instrumentation.init('bezelanalysis')
+
     configsetup.init()
+
+    # Get user input:
+
+    clearAMbezels = raw_input('Remove all .png files in the AM bezel directory? Press "y" or "n" followed by return/enter: ')
+
+    if not ((clearAMbezels == 'y') or (clearAMbezels == 'n')):
+        print("Next time please type 'y' or 'n'")
+        return 1
+
+    rescale = raw_input('Create low-resolution bezels? Press "y" or "n" followed by return/enter: ')
+
+    if not ((rescale == 'y') or (rescale == 'n')):
+        print("Next time please type 'y' or 'n'")
+        return 1
+
+    AMbezelresolution = 0
     
+    if (rescale == 'y') and (imageresize.method is not None):
+        
+        AMbezelresolution = raw_input('Enter maximum AM bezel resolution for width or height - whichever is largest - in number of pixels (default: 800 pixels) and press return/enter: ') or '800'
+
+        if ((int(AMbezelresolution) < 0) or (int(AMbezelresolution) > 2000)):
+            check = raw_input('AM bezel resolution is set to {}. Are you sure? Press "n" followed by return/enter if you want to quit: '.format(AMbezelresolution))
+            if (check == 'n'):
+                return 1
+
+    excludegenericbezels = raw_input('Exclude generic bezels? Press "y" or "n" followed by return/enter: ')
+
+    if not ((excludegenericbezels == 'y') or (excludegenericbezels == 'n')):
+        print("Next time please type 'y' or 'n'")
+        return 1
+
+    return analyze(clearAMbezels, rescale, AMbezelresolution, excludegenericbezels)
+
+def analyze(clearAMbezels, rescale, AMbezelresolution, excludegenericbezels):
+
+    # Analyze bezel artwork of all games in AM romlist. clearAMbezels, rescale and excludegenericbezels are 'y' or 'n',
+    # AMbezelresolution is the maximum resolution of low-resolution bezels (if rescale is 'y'):
+
     # Check directories:
 
     bezeldirectoriesfilename = configsetup.AMsupportdir + 'data/bezeldirectories.txt'
@@ -75,401 +503,92 @@ def main():
         else:
             print("AM bezels will be saved in {}...".format(AMbezeldir))
             
-    # Get user input:
-
-    clearAMbezels = raw_input('Remove all .png files in the AM bezel directory? Press "y" or "n" followed by return/enter: ')
-
-    if not ((clearAMbezels == 'y') or (clearAMbezels == 'n')):
-        print("Next time please type 'y' or 'n'")
-        return 1
-
     if (clearAMbezels == 'y'):
         subprocess.call('rm *.png', cwd = AMbezeldir, shell = True)
-        
-    rescale = raw_input('Create low-resolution bezels? Press "y" or "n" followed by return/enter: ')
 
-    if not ((rescale == 'y') or (rescale == 'n')):
-        print("Next time please type 'y' or 'n'")
-        return 1
-
-    if not os.path.isfile('/usr/bin/sips'): # If Sips does not exist:
-        print("Sips is not installed on this system => Symbolic links to the original bezel images will be created instead...")
+    if (rescale == 'y') and (imageresize.method is None): # If neither Pillow nor Sips exists:
+        print("Neither Pillow nor Sips is installed on this system => Symbolic links to the original bezel images will be created instead...")
         rescale = 'n'
-        
-    AMbezelresolution = 0
-    
-    if (rescale == 'y'):
-        
-        AMbezelresolution = raw_input('Enter maximum AM bezel resolution for width or height - whichever is largest - in number of pixels (default: 800 pixels) and press return/enter: ') or '800'
-
-        if ((int(AMbezelresolution) < 0) or (int(AMbezelresolution) > 2000)):
-            check = raw_input('AM bezel resolution is set to {}. Are you sure? Press "n" followed by return/enter if you want to quit: '.format(AMbezelresolution))
-            if (check == 'n'):
-                return 1
-
-    excludegenericbezels = raw_input('Exclude generic bezels? Press "y" or "n" followed by return/enter: ')
-
-    if not ((excludegenericbezels == 'y') or (excludegenericbezels == 'n')):
-        print("Next time please type 'y' or 'n'")
-        return 1
             
-    # Transform AM romlist into list of games:
-
-    games, header = configsetup.create_list_of_games_from_romlist()
-
-    if (len(games) == 0):
-        print("AM romlist is empty - EXIT")
-        return 1
-
-    # Construct list of games with artwork:
+    # Construct set of games in AM romlist with artwork, using an artwork index (romname -> (bezel art directory, 'dir' or 'zip'))
+    # built with one scan per bezel art directory:
     
-    gameswithartwork = []
-    artdirdict = {}
+    numberofgames = 0
+    gameswithartwork = set()
+    cloneindex = configsetup.CloneIndex()
     
-    for game in games:
-        for MAMEbezeldir in MAMEbezeldirs:
-            if os.path.isdir(MAMEbezeldir + game[0]):
-                gameswithartwork.append(game[0])
-                artdirdict[game[0]] = MAMEbezeldir # Does this overwrite?
+    with instrumentation.stage('find artwork'):
+        artworkindex = artwork.scanartwork(MAMEbezeldirs)
+        for game in configsetup.read_romlist():
+            numberofgames += 1
+            cloneindex.add(game)
+            if game.Name in artworkindex:
+                gameswithartwork.add(game.Name)
+
+    if (numberofgames == 0):
+        print("AM romlist is empty - EXIT")
+        return 1
 
     if (len(gameswithartwork) == 0):
-        print("There are no unzipped bezel artwork directories for games in {} - EXIT".format(MAMEbezeldirs))
+        print("There is no bezel artwork for games in {} - EXIT".format(MAMEbezeldirs))
         return 1
     
-    # Construct list of excluded games:
+    # Construct set of excluded games:
     
     bezelexceptionsfilename = configsetup.AMsupportdir + 'data/bezelexceptions.txt'
 
-    excludedgames = []
+    excludedgames = set()
 
     if (os.path.isfile(bezelexceptionsfilename)):
         bezelexceptionsfile = open(bezelexceptionsfilename, 'r')
         for line in bezelexceptionsfile.readlines():
             excludedgame = line.rstrip('\n')
-            excludedgames.append(excludedgame)
+            excludedgames.add(excludedgame)
         bezelexceptionsfile.close()
     else:
         print("{} does not exist".format(bezelexceptionsfilename))
 
-    # Analyze games:
+    # Analyze games in a pipeline (discover artwork -> parse .lay file -> select bezel -> create low-resolution bezel or symlink),
+    # and collect the results in romlist order:
 
     count = 0
 
-    gameswithoutbezel = []
     bezels = []
 
     counts = [0, 0, 0, 0, 0, 0, 0, 0]
 
-    for game in games:
-
-        romname = game[0]
-
-        print("--- Analyzing bezels for {}...".format(romname))
-        
-        # Skip excluded games:
-        
-        if romname in excludedgames:
-            print("------ included in list of excluded games - EXIT0")
-            gameswithoutbezel.append(game)
-            counts[0] += 1
-            continue
-        else:
-            print("------ {} is not included in list of excluded games...".format(romname))            
-    
-        # Skip games without artwork:
-        
-        if romname not in gameswithartwork:
-            print("------ no artwork - EXIT1")
-            gameswithoutbezel.append(game)
-            counts[1] += 1
-            continue
-        else:
-            print("------ {} exists...".format(artdirdict[romname] + romname))
-
-        # Find and read .lay file (there should be only one):
-
-        listOfFiles = os.listdir(artdirdict[romname] + romname)
-        
-        layfilename = ''
-        for entry in listOfFiles:  
-            if fnmatch.fnmatch(entry, "*.lay"):
-                layfilename = entry
-        
-        layfile = open(artdirdict[romname] + romname + "/" + layfilename, 'r')
-        laytextstring = layfile.read()
-        layfile.close()
-
-        # Use regular expression searches to find bezel data in .lay file: 
-
-        # 1) Search for bezel tag in "Artwork type:" line:
-        
-        matchobject = re.search('Artwork type:.*[Bb]ezel', laytextstring)
-
-        if matchobject:
-            print("------ regex search found a bezel tag in .lay file...")
-        else:
-            print("------ regex search did not find a bezel tag in .lay file - EXIT2")
-            gameswithoutbezel.append(game)
-            counts[2] += 1
-            continue
-
-        # 2) Search for view name and bezel element name:
-
-        bezelelement_patterns1 = ['[Bb]ez.+','[Oo]uter.*','[Ii]nner.*', 'sac.*', \
-                                  '.+[Bb]ez.+','.+[Oo]uter.*','.+[Ii]nner.*']
-        
-        bezelelement_patterns2 = ['[Cc]oc.+', '.+[Cc]oc.+', '[Bb]ez.+', '.+[Bb]ez.+']
-
-        bezelelementfound = False
-        
-        for bezelelement_pattern in bezelelement_patterns1:
-            regexquery = '<view name=\"(.*[Uu]p.+)\">\s*\n(?:.+\n)*?\s+<bezel element=\"(' + bezelelement_pattern + ')\"'
-            matchobject = re.search(regexquery, laytextstring)
-            if matchobject:
-                print("------ .lay file contains view name '{}' and bezel element '{}' ...".format(matchobject.group(1), matchobject.group(2)))
-                bezelelementfound = True
-                break
-
-        if (bezelelementfound and (excludegenericbezels == 'y') and (matchobject.group(2)[0:3] == 'sac')):
-            print("------ png file is a generic bezel - EXIT5")
-            gameswithoutbezel.append(game)
-            counts[5] += 1
-            continue
-
-        if not bezelelementfound:
-            for bezelelement_pattern in bezelelement_patterns1:                
-                regexquery = '<view name=\"(Marquee.*)\">\s*\n(?:.+\n)*?\s+<bezel element=\"(' + bezelelement_pattern + ')\"'
-                matchobject = re.search(regexquery, laytextstring)
-                if matchobject:
-                    print("------ .lay file contains view name '{}' and bezel element '{}' ...".format(matchobject.group(1), matchobject.group(2)))
-                    bezelelementfound = True
-                    break
-                
-        if not bezelelementfound:
-            for bezelelement_pattern in bezelelement_patterns2:                
-                regexquery = '<view name=\"(.*[Cc]oc.+)\">\s*\n(?:.+\n)*?\s+<bezel element=\"(' + bezelelement_pattern + ')\"'
-                matchobject = re.search(regexquery, laytextstring)
-                if matchobject:
-                    print("------ .lay file contains view name '{}' and bezel element '{}' ...".format(matchobject.group(1), matchobject.group(2)))
-                    bezelelementfound = True
-                    break
-        
-        if not bezelelementfound:
-            print("------ regex search did not find a view name and bezel element in .lay file - EXIT3")
-            gameswithoutbezel.append(game)
-            counts[3] += 1
-            continue
-        
-        viewname     = matchobject.group(1)
-        bezelelement = matchobject.group(2)
-        
-        # 3) Search for .png filename:
-
-        regexquery = '<element name=\"' + bezelelement + '\"\s*>\s*\n\s+<image file=\"([\w-]+\.png)\"'
-        
-        matchobject = re.search(regexquery, laytextstring)
-
-        if matchobject:
-            print("------ bezel .png file found ({})...".format(matchobject.group(1)))
-        else:
-            print("------ bezel regex search did not find a .png filename in .lay file - EXIT4")
-            gameswithoutbezel.append(game)
-            counts[4] += 1
-            continue
+    cache = None
+    if (rescale == 'y'):
+        cache = bezelcache.BezelCache(AMbezeldir)
 
-        bezelfilename = matchobject.group(1)
+    analysissettings = {'excludegenericbezels': excludegenericbezels,
+                        'rules': hashlib.sha1(json.dumps([analysisversion, bezelviewqueries, genericbezelfilenames, genericbezelprefixes,
+                                                          layparser.itemtags]).encode('utf-8')).hexdigest()}
 
-        # Exclude generic bezels:
+    analysiscache = bezelcache.AnalysisCache(AMbezeldir, analysissettings)
 
-        if (excludegenericbezels == 'y'):
-            if (bezelfilename == "taito_f3_bezel.png" or
-                bezelfilename == "bally_sente_bezel_sac1.png" or
-                bezelfilename == "bally_sente_bezel_sac1_deluxe.png" or
-                bezelfilename == "sac1_deluxe_bezel.png" or
-                bezelfilename == "bm_1_vert.png" or
-                bezelfilename == "bm_2_vert.png" or
-                bezelfilename == "bm_1_horiz.png" or
-                bezelfilename == "bm_2_horiz.png" or
-                bezelfilename[:14] == "rockola_bezel_" or
-                bezelfilename[:10] == "deco_bezel" or 
-                bezelfilename[:13] == "generic_bezel"):
-                
-                print("------ png file is a generic bezel - EXIT5")
-                gameswithoutbezel.append(game)
-                counts[5] += 1
-                continue
-
-        # 4) Search for screen dimensions:
-            
-        regexquery = '<view name=\"' + viewname + '\">\s*\n(?:.+\n)*?\s+<screen index=\"\d+\">\s*\n\s+<bounds x=\"([-.\d]+)\" y=\"([-.\d]+)\" width=\"([.\d]+)\" height=\"([.\d]+)\"'
-        
-        matchobject = re.search(regexquery, laytextstring)
+    stages = [lambda job: discoverartwork(job, excludedgames, artworkindex, analysiscache),
+              lambda job: parselayout(job, analysiscache),
+              lambda job: selectbezel(job, excludegenericbezels, analysiscache),
+              lambda job: createbezel(job, AMbezeldir, rescale, AMbezelresolution, cache)]
 
-        if matchobject:
-            print("------ artwork contains screen dimensions...")
-        else:
-            print("------ bezel dimension regex search found nothing in .lay file - EXIT6")
-            gameswithoutbezel.append(game)
-            counts[6] += 1
-            continue
+    numberofworkers = bezelworkers or multiprocessing.cpu_count()
 
-        x_screen = float(matchobject.group(1))
-        y_screen = float(matchobject.group(2))
-        w_screen = float(matchobject.group(3))
-        h_screen = float(matchobject.group(4))
+    for job in pipeline.run((BezelJob(game) for game in configsetup.read_romlist()), stages, numberofworkers):
 
-        # 5) Search for bezel dimensions:
-            
-        regexquery = '<view name=\"' + viewname + '\">\s*\n(?:.+\n)*?\s+<bezel element=\"' + bezelelement + '\"\s*>\s*\n\s+<bounds x=\"([-.\d]+)\" y=\"([-.\d]+)\" width=\"([.\d]+)\" height=\"([.\d]+)\"'
-        
-        matchobject = re.search(regexquery, laytextstring)
+        for line in job.lines:
+            print(line)
 
-        if matchobject:
-            print("------ artwork contains bezel dimensions...")
+        if job.exitcode is None:
+            bezels.append(job.bezel)
+            count += 1
         else:
-            print("------ bezel dimension regex search found nothing in .lay file - EXIT7")
-            gameswithoutbezel.append(game)
-            counts[7] += 1
-            continue
+            counts[job.exitcode] += 1
 
-        x_bezel = float(matchobject.group(1))
-        y_bezel = float(matchobject.group(2))
-        w_bezel = float(matchobject.group(3))
-        h_bezel = float(matchobject.group(4))
-
-        # 6) Search for total bezel dimensions (if available):
-        
-        x_bezeltotal = x_bezel
-        y_bezeltotal = y_bezel
-        w_bezeltotal = w_bezel
-        h_bezeltotal = h_bezel
-
-        regexquery = '<view name=\"' + viewname + '\">\s*\n\s+<bounds x=\"([-.\d]+)\" y=\"([-.\d]+)\" width=\"([.\d]+)\" height=\"([.\d]+)\"'
-
-        matchobject = re.search(regexquery, laytextstring)
-
-        if matchobject:
-            print("------ artwork contains total bezel dimensions...")
-            x_bezeltotal = float(matchobject.group(1))
-            y_bezeltotal = float(matchobject.group(2))
-            w_bezeltotal = float(matchobject.group(3))
-            h_bezeltotal = float(matchobject.group(4))
-            #counts[8] += 1
-
-        print("------ bezel filename = {}".format(bezelfilename))
-        print("------ x_screen = {}".format(x_screen))
-        print("------ y_screen = {}".format(y_screen))
-        print("------ w_screen = {}".format(w_screen))
-        print("------ h_screen = {}".format(h_screen))
-        print("------ x_bezel = {}".format(x_bezel))
-        print("------ y_bezel = {}".format(y_bezel))
-        print("------ w_bezel = {}".format(w_bezel))
-        print("------ h_bezel = {}".format(h_bezel))
-        print("------ x_bezeltotal = {}".format(x_bezeltotal))
-        print("------ y_bezeltotal = {}".format(y_bezeltotal))
-        print("------ w_bezeltotal = {}".format(w_bezeltotal))
-        print("------ h_bezeltotal = {}".format(h_bezeltotal))
-            
-        # Create low-resolution version of bezel or symbolic link to bezel:
-        
-        if (rescale == "y"):
-        
-            # Copy .png file to ${AMbezeldir}, rename the file and change the resolution:
-        
-            oldpngfile = artdirdict[romname] + romname + "/" + bezelfilename
-            newpngfile = AMbezeldir + romname + ".png"
-            
-            subprocess.call(["cp", oldpngfile, newpngfile])
-        
-            # Get original image pixel height:
-            
-            tmpfilename = configsetup.AMsupportdir + 'tmp.txt'
-            
-            tmpfile = open(tmpfilename, 'w')
-            subprocess.call(["sips", "-g", "pixelWidth", "-g", "pixelHeight", newpngfile], stdout = tmpfile)    # Use SIPS
-            #subprocess.call("identify " + romname + ".png", cwd = AMbezeldir, stdout = tmpfile, shell = True)  # Use ImageMagick (Does not work when called from within python on OSX, DYLD libraries are not loaded when called from within python, something to do with Mac's System Integrity Protection...)
-            tmpfile = open(tmpfilename, 'r')
-            tmpstring = tmpfile.read()
-            matchobject = re.search("pixelWidth:\s*([.\d]+)\s*\n\s*pixelHeight:\s*([.\d]+)", tmpstring) # Use SIPS
-            #matchobject = re.search("PNG ([.\d]+)x([.\d]+) ", tmpstring)   # Use ImageMagick
-            oldpixelwidth  = float(matchobject.group(1))
-            oldpixelheight = float(matchobject.group(2))
-            
-            # Change image resolution:
-            
-            FNULL = open(os.devnull, 'w')
-            subprocess.call(["sips", "-Z", AMbezelresolution, newpngfile], stdout = FNULL)                                 # Use SIPS
-            #subprocess.call(["convert", "-resize", AMbezelresolution + "x" + AMbezelresolution, newpngfile, newpngfile])  # Use ImageMagick (Does not work when called from within python on OSX, DYLD libraries are not loaded when called from within python, something to do with Mac's System Integrity Protection...)
-            
-            # Get low-res image pixel height:
-            
-            tmpfile = open(tmpfilename, 'w')
-            subprocess.call(["sips", "-g", "pixelWidth", "-g", "pixelHeight", newpngfile], stdout = tmpfile) # Use SIPS
-            #subprocess.call(["identify", newpngfile], stdout = tmpfile)                                     # Use ImageMagick (Does not work when called from within python on OSX, DYLD libraries are not loaded when called from within python, something to do with Mac's System Integrity Protection...)
-            tmpfile = open(tmpfilename, 'r')
-            tmpstring = tmpfile.read()
-            tmpfile.close()
-            matchobject = re.search("pixelWidth:\s*([.\d]+)\s*\n\s*pixelHeight:\s*([.\d]+)", tmpstring) # Use SIPS
-            #matchobject = re.search("PNG ([.\d]+)x([.\d]+) ", tmpstring)   # Use ImageMagick
-            newpixelwidth  = float(matchobject.group(1))
-            newpixelheight = float(matchobject.group(2))
-            subprocess.call(["rm", tmpfilename])
-
-            # Rescale saved bezel data:
-
-            pixelscalefactor = 1
-            if (oldpixelwidth > oldpixelheight):
-                pixelscalefactor = newpixelwidth/oldpixelwidth
-            else:
-                pixelscalefactor = newpixelheight/oldpixelheight
-            
-            x_screen     *= pixelscalefactor
-            y_screen     *= pixelscalefactor
-            w_screen     *= pixelscalefactor
-            h_screen     *= pixelscalefactor
-
-            x_bezel      *= pixelscalefactor
-            y_bezel      *= pixelscalefactor
-            w_bezel      *= pixelscalefactor
-            h_bezel      *= pixelscalefactor
-
-            x_bezeltotal *= pixelscalefactor
-            y_bezeltotal *= pixelscalefactor
-            w_bezeltotal *= pixelscalefactor
-            h_bezeltotal *= pixelscalefactor
-
-            print("------ old .png pixel width  = {}".format(oldpixelwidth))
-            print("------ old .png pixel height = {}".format(oldpixelheight))
-            print("------ new .png pixel width  = {}".format(newpixelwidth))
-            print("------ new .png pixel height = {}".format(newpixelheight))
-            print("------ .png pixelscalefactor = {}".format(pixelscalefactor))
-            
-            print("------ low-resolution version of {}.png created...".format(romname))
-            
-        else: # Create symlink to bezel file:
-
-            source      = artdirdict[romname] + romname + "/" + bezelfilename
-            destination = AMbezeldir + romname + '.png' 
-            
-            try:
-                os.symlink(source, destination)
-            except OSError:
-                print("------ symlink to {}.png exists already".format(romname))
-            else:
-                print("------ symlink to {}.png created...".format(romname))
-
-        # Save bezel data to bezels list:
-
-        bezel = [romname, bezelfilename,                                 \
-                 int(round(x_screen)),     int(round(y_screen)),     int(round(w_screen)),     int(round(h_screen)),     \
-                 int(round(x_bezel)),      int(round(y_bezel)),      int(round(w_bezel)),      int(round(h_bezel)),      \
-                 int(round(x_bezeltotal)), int(round(y_bezeltotal)), int(round(w_bezeltotal)), int(round(h_bezeltotal))]
-        bezels.append(bezel)
-        
-        print("------ bezel data saved - SUCCESS".format(romname))
-        count += 1
-
-        #dummy = raw_input("press return/enter")
+    with instrumentation.stage('write bezel cache'):
+        analysiscache.flush()
+        if cache is not None:
+            cache.flush()
 
     print("==> 'EXIT0' indicates excluded game")
     print("--> 'EXIT1' indicates game without artwork")
@@ -485,31 +604,32 @@ def main():
     for i in range(0, len(counts)):
         print("--> # of exit code '{}' games = {}".format(i, counts[i]))
         
-    # Clone handling - Loop over games without artwork:
-    
-    for gamewithoutbezel in gameswithoutbezel:
-
-        # Check if game is a clone:
+    # Clone handling - Clones without bezel inherit the bezel of their parent game (one pass over the clone index):
 
-        original = gamewithoutbezel[3]
+    if inheritclonebezels:
 
-        if (original == ''): # game is not a clone
-            continue
+        bezelsbygame = dict((bezel[0], bezel) for bezel in bezels)
 
-        # Loop over bezels to check if the original game has a bezel:
-
-        for bezel in bezels:
-            
-            if (original == bezel[0]): # gamewithoutbezel has no bezel but is a clone of a game that does have a bezel 
-                outputclone = bezel[:] # copy
-                outputclone[0] = gamewithoutbezel[0]
-                bezels.append(outputclone)
-                count += 1
+        for clone, parent in cloneindex.inherit(bezelsbygame):
+            outputclone = bezelsbygame[parent][:] # copy
+            outputclone[0] = clone
+            bezels.append(outputclone)
+            count += 1
 
     # Save bezel data in AMbezels.ini:
 
     AMbezelfilename = configsetup.AMsupportdir + "data/AMbezels.ini"
         
+    with instrumentation.stage('write AMbezels.ini'):
+        writebezelfile(AMbezelfilename, bezels)
+    
+    print("=> {} out of {} games have artwork".format(len(gameswithartwork), numberofgames))
+    print("=> {} out of {} games have bezel artwork".format(count, len(gameswithartwork)))
+        
+    return 0
+
+def writebezelfile(AMbezelfilename, bezels):
+
     AMbezelfile = open(AMbezelfilename, 'w')
     for bezel in bezels:
         AMbezelfile.write("[{}]\n".format(bezel[0]))
@@ -527,11 +647,10 @@ def main():
         AMbezelfile.write("bezeltotal_width={}\n".format(bezel[12]))
         AMbezelfile.write("bezeltotal_height={}\n".format(bezel[13]))
     AMbezelfile.close()
-    
-    print("=> {} out of {} games have artwork".format(len(gameswithartwork), len(games)))
-    print("=> {} out of {} games have bezel artwork".format(count, len(gameswithartwork)))
-        
-    return 0
+
+    instrumentation.filewritten(AMbezelfilename)
+
+    return
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,248 @@
+#!/usr/bin/python -tt
+"""
+MAME support module to cache the bezel analysis results and the low-resolution versions of bezels (see bezelanalysis.py):
+- The analysis result of each game is cached (bezelcache/analysis.json), so that .lay files are only read and analyzed again
+  if the artwork or the analysis settings have changed (see AnalysisCache). Results of games that are not analyzed in a run are kept.
+- Low-resolution bezels are cached in the bezelcache/ subdirectory of the AM bezels directory. Each cached image is keyed by the content hash
+  of the original bezel .png file and the AM bezel resolution ({sha1}_{resolution}.png), so that an original bezel is only
+  resized once, also if it is shared by several games (e.g. generic bezels) or if bezelanalysis.py is run again.
+- The pixel dimensions of the original and of the resized bezel, and the content hashes of the original bezel files, are saved
+  in a manifest (bezelcache/bezelcache.json). A content hash is only calculated again if the size and mtime (or the CRC of
+  a zip file member) of the original bezel file have changed.
+- AM bezels ({romname}.png) are created as hard links to the cached image, so games that share an original bezel share one file.
+  If hard links are not supported by the file system, the cached image is copied instead.
+- Cached images (and the fingerprints of original bezel files) that have not been used for cacheretentiondays days are removed when
+  the manifest is saved. Images of other resolutions, or of artwork that is not found in a run (e.g. an unmounted directory), are kept.
+  The whole cache is removed with: ./updateall.py --clear-caches
+
+Usage:
+
+   cache = bezelcache.BezelCache(AMbezeldir)
+   oldwidth, oldheight, newwidth, newheight, cached = cache.createbezel(artwork, bezelfilename, AMbezelresolution, destination)
+   cache.flush()
+
+   analysiscache = bezelcache.AnalysisCache(AMbezeldir, settings)
+   result = analysiscache.lookup(romname, artworkpath, kind) # None if the artwork has changed
+   analysiscache.store(romname, artworkpath, kind, layfilename, sha1, result)
+   analysiscache.flush()
+
+Author: Gordon Lim
+Last Edit: 18 Oct 2026
+"""
+
+import configsetup
+import imageresize
+import instrumentation
+import os
+import shutil
+import threading
+import time
+
+cacheretentiondays = 90 # Cached images and fingerprints that have not been used for this number of days are removed
+
+class BezelCache(object):
+
+    def __init__(self, AMbezeldir):
+
+        self.cachedir = AMbezeldir + "bezelcache/"
+        self.manifestfilename = self.cachedir + "bezelcache.json"
+        self.lock = threading.Lock()
+        self.keylocks = {}   # One lock per cached image, so that a shared bezel is resized only once by parallel workers
+        self.sources = {}    # Original bezel file location -> fingerprint
+        self.images = {}     # Cached image key -> [old width, old height, new width, new height]
+        self.lastused = {'sources': {}, 'images': {}} # Location or key -> time of last use
+
+        if not os.path.isdir(self.cachedir):
+            os.makedirs(self.cachedir)
+
+        manifest = configsetup.readjson(self.manifestfilename, ['sources', 'images'])
+        if manifest is not None:
+            self.sources = manifest['sources']
+            self.images = manifest['images']
+            self.lastused = manifest.get('lastused', self.lastused)
+
+    def keylock(self, key):
+
+        with self.lock:
+            return self.keylocks.setdefault(key, threading.Lock())
+
+    def createbezel(self, gameartwork, bezelfilename, resolution, destination):
+
+        # Create destination as low-resolution version of a bezel in a game's artwork (from the cache if possible),
+        # return (original width, original height, new width, new height, True if the cached image was used):
+
+        location = gameartwork.location(bezelfilename)
+
+        with instrumentation.stage('hash bezel'):
+            with self.lock:
+                previousfingerprint = self.sources.get(location)
+            fingerprint = gameartwork.fingerprint(bezelfilename, previousfingerprint)
+
+        key = "{}_{}".format(fingerprint['sha1'], int(resolution))
+        cachedfilename = self.cachedir + key + ".png"
+
+        with self.keylock(key):
+            with self.lock:
+                dimensions = self.images.get(key)
+            cached = (dimensions is not None) and os.path.isfile(cachedfilename)
+            if not cached:
+                with instrumentation.stage('resize bezel'):
+                    bezelfile = gameartwork.open(bezelfilename)
+                    dimensions = list(imageresize.resize(bezelfile, cachedfilename, resolution))
+                    bezelfile.close()
+                    instrumentation.bytesread(gameartwork.size(bezelfilename))
+                    instrumentation.filewritten(cachedfilename)
+
+        with self.lock:
+            self.sources[location] = fingerprint
+            self.images[key] = dimensions
+            self.lastused['sources'][location] = time.time()
+            self.lastused['images'][key] = time.time()
+
+        with instrumentation.stage('link bezel'):
+            linkfile(cachedfilename, destination)
+
+        return dimensions[0], dimensions[1], dimensions[2], dimensions[3], cached
+
+    def flush(self):
+
+        # Remove cached images and fingerprints that have not been used for cacheretentiondays days
+        # (entries of previous versions of this program without time of last use count as used now), and save manifest:
+
+        expirytime = time.time() - cacheretentiondays*86400
+
+        for kind, entries in [('sources', self.sources), ('images', self.images)]:
+            lastused = self.lastused.setdefault(kind, {})
+            for key in list(entries):
+                if (lastused.setdefault(key, time.time()) < expirytime):
+                    del entries[key]
+            for key in list(lastused):
+                if key not in entries:
+                    del lastused[key]
+
+        for filename in os.listdir(self.cachedir): # Also removes images without manifest entry (e.g. of an interrupted run)
+            if (filename[-4:] == '.png') and (filename[:-4] not in self.images):
+                os.remove(self.cachedir + filename)
+
+        configsetup.writejson(self.manifestfilename, {'sources': self.sources, 'images': self.images, 'lastused': self.lastused})
+
+        return
+
+def nativestrings(value):
+
+    # JSON strings are unicode in Python 2: convert them to UTF-8 encoded str, like the strings of a game that is analyzed again:
+
+    if isinstance(value, list):
+        return [nativestrings(item) for item in value]
+    elif isinstance(value, dict):
+        return dict((nativestrings(key), nativestrings(item)) for key, item in value.items())
+    elif (str is bytes) and isinstance(value, type(u'')):
+        return value.encode('utf-8')
+    else:
+        return value
+
+def linkfile(source, destination):
+
+    # Create (or replace) destination as hard link to source (or as copy, if hard links are not supported):
+
+    if os.path.lexists(destination + '.tmp'):
+        os.remove(destination + '.tmp')
+
+    try:
+        os.link(source, destination + '.tmp')
+    except (OSError, AttributeError):
+        shutil.copyfile(source, destination + '.tmp')
+
+    os.rename(destination + '.tmp', destination)
+
+    return
+
+class AnalysisCache(object):
+
+    # Cache of the bezel analysis result of each game (EXIT code, analysis output, bezel .png filename and dimensions),
+    # saved in bezelcache/analysis.json. A cached result is used if the analysis settings are the same and the artwork has not
+    # changed: the size and mtime of the artwork zip file, or the mtime of the artwork directory and the size and mtime of its
+    # .lay file, are the same. If they have changed, but the content hash of the .lay file is the same, the cached result is used as well.
+
+    def __init__(self, AMbezeldir, settings):
+
+        self.cachedir = AMbezeldir + "bezelcache/"
+        self.filename = self.cachedir + "analysis.json"
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.entries = {}     # Romname -> cache entry
+
+        if not os.path.isdir(self.cachedir):
+            os.makedirs(self.cachedir)
+
+        cache = configsetup.readjson(self.filename, ['settings', 'games'])
+        if (cache is not None) and (cache['settings'] == settings): # Results of other analysis settings are not used
+            self.entries = cache['games']
+
+    def stamp(self, path, kind, layfilename):
+
+        # Return size and mtime of artwork zip file, or mtime of artwork directory and size and mtime of its .lay file
+        # (None if the artwork does not exist anymore):
+
+        try:
+            if (kind == 'zip'):
+                stat = os.stat(path)
+                return [stat.st_size, stat.st_mtime]
+            stat = os.stat(path)
+            stamp = [stat.st_mtime]
+            if layfilename is not None:
+                stat = os.stat(os.path.join(path, layfilename))
+                stamp += [stat.st_size, stat.st_mtime]
+            return stamp
+        except OSError:
+            return None
+
+    def lookup(self, romname, path, kind):
+
+        # Return cached result of a game if its artwork has not changed (or None):
+
+        with self.lock:
+            entry = self.entries.get(romname)
+
+        if (entry is None) or (entry['artwork'] != [path, kind]):
+            return None
+
+        if (self.stamp(path, kind, entry['layfilename']) != entry['stamp']):
+            return None
+
+        return nativestrings(entry['result'])
+
+    def lookuphash(self, romname, path, kind, layfilename, sha1):
+
+        # Return cached result of a game if its .lay file has the same content hash (or None):
+
+        with self.lock:
+            entry = self.entries.get(romname)
+
+        if (entry is None) or (entry['artwork'] != [path, kind]) or (entry['layfilename'] != layfilename) or (entry['sha1'] != sha1):
+            return None
+
+        return nativestrings(entry['result'])
+
+    def store(self, romname, path, kind, layfilename, sha1, result):
+
+        entry = {'artwork'    : [path, kind],
+                 'stamp'      : self.stamp(path, kind, layfilename),
+                 'layfilename': layfilename,
+                 'sha1'       : sha1,
+                 'result'     : result}
+
+        with self.lock:
+            self.entries[romname] = entry # Replaces the stale entry of a game with changed artwork
+
+        return
+
+    def flush(self):
+
+        # Save results of all games: the results of this run, merged with the results of games that were not analyzed in this run
+        # (e.g. games that are not in the romlist, or whose artwork directory is not mounted), which are checked again when they are looked up.
+        # Results of other analysis settings were not loaded, and are dropped:
+
+        configsetup.writejson(self.filename, {'settings': self.settings, 'games': self.entries})
+
+        return
@@ -13,11 +13,16 @@ myAMexecdir     = "${HOME}/Games/attract/"                   # Directory contain
 
 """
 Author: Gordon Lim
-Last Edit: 1 Feb 2018 
+Last Edit: 18 Oct 2026 
 """
 
+import hashlib
+import instrumentation
+import json
 import os
 
+sharedromlist = None # Parsed AM romlist shared in memory (see share_romlist)
+
 def init():
 
     global AMsupportdir    
@@ -54,17 +59,245 @@ def init():
 
     return 0
 
-def create_list_of_games_from_romlist():
+# Attract-Mode romlist fields (see header of romlists/mame.txt):
+
+romlistfields = ['Name', 'Title', 'Emulator', 'CloneOf', 'Year', 'Manufacturer', 'Category', 'Players', 'Rotation',
+                 'Control', 'Status', 'DisplayCount', 'DisplayType', 'AltRomname', 'AltTitle', 'Extra', 'Buttons']
+
+class RomlistGame(object):
+
+    # Compact romlist entry with one attribute per romlist field, e.g. game.Name, game.CloneOf, game.AltTitle
+    # (fields appended by newer Attract-Mode versions are kept as is in game.Otherfields):
     
-    filename = AMconfigdir + 'romlists/mame.txt'
+    __slots__ = romlistfields + ['Otherfields']
+
+    def __init__(self, line):
+        fields = line.rstrip('\r\n').split(";")
+        fields += [''] * (len(romlistfields) - len(fields))
+        for field, value in zip(romlistfields, fields):
+            setattr(self, field, value)
+        self.Otherfields = fields[len(romlistfields):]
+
+    def line(self):
+        fields = [getattr(self, field) for field in romlistfields] + self.Otherfields
+        return ";".join(fields) + '\n'
+
+def read_romlist_header(filename = None):
+
+    if filename is None:
+        filename = AMconfigdir + 'romlists/mame.txt'
+        
     file = open(filename, 'r')
     header = file.readline() # first line
+    file.close()
+
+    return header
+
+def read_romlist(filename = None):
+
+    # Iterator over the RomlistGames of a romlist. The AM romlist is parsed line by line, so that it is never held in memory
+    # as a whole, unless it has been parsed once and shared in memory with share_romlist() (see updateall.py):
+
+    if (filename is None) and (sharedromlist is not None):
+        return iter(sharedromlist)
+
+    return parse_romlist(filename)
+
+def parse_romlist(filename = None):
+
+    # Generator yielding one RomlistGame per romlist line:
     
-    games = []
-    for line in file.readlines():
-        game = [field for field in line.rstrip('\n').split(";")]
-        games.append(game)
+    if filename is None:
+        filename = AMconfigdir + 'romlists/mame.txt'
+        
+    file = open(filename, 'r')
+    file.readline() # skip header
+    
+    for line in file:
+        yield RomlistGame(line)
         
     file.close()
 
+    instrumentation.fileread(filename)
+
+def share_romlist():
+
+    # Parse the AM romlist once and keep it in memory, so that every following read_romlist() of the AM romlist
+    # (in any thread) returns the parsed games instead of parsing the romlist again:
+
+    global sharedromlist
+
+    sharedromlist = list(parse_romlist())
+
+    return sharedromlist
+
+def unshare_romlist():
+
+    global sharedromlist
+
+    sharedromlist = None
+
+    return
+
+class RomlistWriter(object):
+
+    # Buffered romlist writer. The romlist is written to a temporary file which replaces the
+    # romlist on close(), so a romlist can be read with read_romlist() while it is being rewritten:
+    
+    def __init__(self, filename, header):
+        self.filename = filename
+        self.file = open(filename + '.tmp', 'w', 1 << 16)
+        self.file.write(header)
+
+    def write(self, game):
+        self.file.write(game.line())
+
+    def close(self):
+        self.file.close()
+        os.rename(self.filename + '.tmp', self.filename)
+        instrumentation.filewritten(self.filename)
+
+    def discard(self):
+        self.file.close()
+        os.remove(self.filename + '.tmp')
+
+class CloneIndex(object):
+
+    # Index of the clones in the AM romlist (clone -> parent, from the CloneOf field), built in one pass over the romlist,
+    # so that clones can inherit data (e.g. bezels, controls) of their parent game in one linear pass:
+
+    def __init__(self, games = None):
+
+        self.games   = [] # Romnames in romlist order
+        self.parents = {} # Clone -> parent
+
+        if games is not None:
+            for game in games:
+                self.add(game)
+
+    def add(self, game):
+
+        self.games.append(game.Name)
+
+        if (game.CloneOf != ''):
+            self.parents[game.Name] = game.CloneOf
+
+        return
+
+    def parent(self, romname):
+
+        return self.parents.get(romname, '')
+
+    def inherit(self, gameswithdata):
+
+        # Return list of (clone, parent) in romlist order for clones without data of which the parent has data
+        # (gameswithdata is a set, dictionary or INIStore of romnames). If the parent is a clone without data as well,
+        # the data is inherited from the first game with data up the CloneOf chain:
+
+        inherited = []
+
+        for romname in self.games:
+            if (romname in gameswithdata) or (romname not in self.parents):
+                continue
+            parent = self.parents[romname]
+            visited = set([romname])
+            while (parent not in gameswithdata) and (parent in self.parents) and (parent not in visited):
+                visited.add(parent)
+                parent = self.parents[parent]
+            if parent in gameswithdata:
+                inherited.append((romname, parent))
+
+        return inherited
+
+def create_list_of_games_from_romlist():
+
+    filename = AMconfigdir + 'romlists/mame.txt'
+
+    games  = list(read_romlist(filename))
+    header = read_romlist_header(filename)
+
     return games, header
+
+def create_set_of_games_from_ini(filename):
+
+    # Index the [romname] section headers of an AM*.ini file once, so that
+    # checking if a game is present in the file is a set lookup:
+    
+    games = set()
+
+    if not os.path.isfile(filename):
+        return games
+    
+    file = open(filename, 'r')
+    for line in file:
+        line = line.rstrip('\r\n')
+        if (line[0:1] == '[') and (line[-1:] == ']'):
+            games.add(line[1:-1])
+    file.close()
+
+    instrumentation.fileread(filename)
+
+    return games
+
+def fingerprint(filename, previousfingerprint = None):
+
+    # Return size, mtime and content hash of a file (None if the file does not exist).
+    # The content hash of a previous fingerprint is reused if size and mtime have not changed:
+    
+    if not os.path.isfile(filename):
+        return None
+
+    stat = os.stat(filename)
+
+    if (previousfingerprint is not None and
+        previousfingerprint['size'] == stat.st_size and previousfingerprint['mtime'] == stat.st_mtime):
+        return previousfingerprint
+
+    sha1 = hashlib.sha1()
+    file = open(filename, 'rb')
+    while True:
+        block = file.read(1 << 16)
+        if not block:
+            break
+        sha1.update(block)
+    file.close()
+
+    instrumentation.bytesread(stat.st_size)
+
+    return {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha1': sha1.hexdigest()}
+
+def readjson(filename, keys = ()):
+
+    # Return data of a json file saved by writejson (e.g. a cache or manifest), or None if the file does not exist.
+    # If the file is corrupt, or if the data are not a dictionary with all keys, None is returned as well and the file is recreated by the caller:
+
+    if not os.path.isfile(filename):
+        return None
+
+    jsonfile = open(filename, 'r')
+    try:
+        data = json.load(jsonfile)
+    except ValueError:
+        data = None
+    jsonfile.close()
+
+    if not (isinstance(data, dict) and all((key in data) for key in keys)):
+        print("{} is corrupt and will be recreated".format(filename))
+        return None
+
+    instrumentation.fileread(filename)
+
+    return data
+
+def writejson(filename, data):
+
+    # Save data in a json file via a temporary file, so that an interrupted write never leaves a truncated file:
+
+    jsonfile = open(filename + '.tmp', 'w')
+    json.dump(data, jsonfile)
+    jsonfile.close()
+    os.rename(filename + '.tmp', filename)
+
+    instrumentation.filewritten(filename)
+
+    return
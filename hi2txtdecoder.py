@@ -0,0 +1,253 @@
+#!/usr/bin/python -tt
+"""
+MAME support module to decode binary hiscore data (nvram/{game}/ or hi/{game}.hi) in Python, using the
+{game}.xml hiscore descriptors of hi2txt (see http://greatstone.free.fr/hi2txt/), without running hi2txt.jar:
+- The output is the same RANK|SCORE|NAME table that hi2txt.jar returns with "-keep-field RANK -keep-field SCORE -keep-field NAME".
+- Only descriptors with common field encodings are decoded. For any other descriptor UnsupportedDescriptor is raised,
+  and the caller should fall back to hi2txt.jar.
+
+Supported descriptors:
+
+- One <structure> element (with a "file" attribute naming the file in nvram/{game}/, if the hiscores are saved in nvram),
+  containing <elt> elements and/or one level of <loop count=".."> elements containing <elt> elements.
+- <elt> elements with "id" (optional, elements without id are skipped), "size" (in bytes), "decoder" and "charset" attributes.
+- Decoders (case-insensitive): BCD, LITTLE_ENDIAN and BIG_ENDIAN (unsigned integers), ASCII and CHAR (characters,
+  optionally translated with a <charset> table of <char src=".." dst=".."/> elements).
+- One <output> element with one <table> element containing <field id=".." src=".."/> elements, where "src" refers to an
+  <elt> id or to the "index" attribute of the loop (hiscore rank, starting at 1).
+
+Author: Gordon Lim
+Last Edit: 18 Oct 2026
+"""
+
+import os
+import xml.etree.ElementTree as ElementTree
+
+keepfields = ['RANK', 'SCORE', 'NAME']
+
+ignoredtags = ['date', 'author', 'comment', 'comments', 'description']
+
+decoders = {'bcd'                   : 'bcd',
+            'unsigned_bcd'          : 'bcd',
+            'little_endian'         : 'little_endian',
+            'unsigned_little_endian': 'little_endian',
+            'big_endian'            : 'big_endian',
+            'unsigned_big_endian'   : 'big_endian',
+            'ascii'                 : 'char',
+            'char'                  : 'char'}
+
+class UnsupportedDescriptor(Exception):
+    pass
+
+def checkattributes(element, allowedattributes):
+
+    for attribute in element.attrib:
+        if attribute not in allowedattributes:
+            raise UnsupportedDescriptor("unsupported attribute '{}' in <{}>".format(attribute, element.tag))
+
+    return
+
+def parseinteger(string):
+
+    try:
+        return int(string, 0)
+    except (TypeError, ValueError):
+        raise UnsupportedDescriptor("invalid number '{}'".format(string))
+
+def parsecharset(element):
+
+    checkattributes(element, ['id'])
+
+    charset = {}
+
+    for char in element:
+        if (char.tag != 'char'):
+            raise UnsupportedDescriptor("unsupported element <{}> in <charset>".format(char.tag))
+        checkattributes(char, ['src', 'dst'])
+        charset[parseinteger(char.get('src'))] = char.get('dst', '')
+
+    return charset
+
+def parseelt(element, charsets):
+
+    checkattributes(element, ['id', 'size', 'decoder', 'charset'])
+
+    size = parseinteger(element.get('size', '1'))
+
+    if (size <= 0):
+        raise UnsupportedDescriptor("invalid size in <elt>")
+
+    decoder = None
+
+    if element.get('id') is not None:
+        decoder = decoders.get(element.get('decoder', 'ascii').lower())
+        if decoder is None:
+            raise UnsupportedDescriptor("unsupported decoder '{}'".format(element.get('decoder')))
+
+    charset = None
+
+    if element.get('charset') is not None:
+        if (decoder != 'char') or (element.get('charset') not in charsets):
+            raise UnsupportedDescriptor("unsupported charset '{}'".format(element.get('charset')))
+        charset = charsets[element.get('charset')]
+
+    return {'id': element.get('id'), 'size': size, 'decoder': decoder, 'charset': charset}
+
+def parsedescriptor(descriptor):
+
+    # Parse hi2txt {game}.xml text into a list of blocks (plain <elt> elements or <loop> elements)
+    # and a list of output table fields:
+
+    try:
+        root = ElementTree.fromstring(descriptor)
+    except ElementTree.ParseError as error:
+        raise UnsupportedDescriptor("invalid xml ({})".format(error))
+
+    if (root.tag != 'hi2txt'):
+        raise UnsupportedDescriptor("root element is not <hi2txt>")
+
+    charsets = {}
+    structures = []
+    outputs = []
+
+    for element in root:
+        if element.tag in ignoredtags:
+            continue
+        elif (element.tag == 'charset'):
+            charsets[element.get('id')] = parsecharset(element)
+        elif (element.tag == 'structure'):
+            structures.append(element)
+        elif (element.tag == 'output'):
+            outputs.append(element)
+        else:
+            raise UnsupportedDescriptor("unsupported element <{}>".format(element.tag))
+
+    if (len(structures) != 1) or (len(outputs) != 1):
+        raise UnsupportedDescriptor("descriptor does not have exactly one <structure> and one <output>")
+
+    # Structure:
+
+    structure = structures[0]
+    checkattributes(structure, ['file'])
+
+    blocks = []
+
+    for element in structure:
+        if (element.tag == 'elt'):
+            blocks.append({'count': 0, 'index': None, 'elts': [parseelt(element, charsets)]})
+        elif (element.tag == 'loop'):
+            checkattributes(element, ['count', 'index'])
+            elts = []
+            for subelement in element:
+                if (subelement.tag != 'elt'):
+                    raise UnsupportedDescriptor("unsupported element <{}> in <loop>".format(subelement.tag))
+                elts.append(parseelt(subelement, charsets))
+            blocks.append({'count': parseinteger(element.get('count')), 'index': element.get('index', 'rank'), 'elts': elts})
+        else:
+            raise UnsupportedDescriptor("unsupported element <{}> in <structure>".format(element.tag))
+
+    # Output table:
+
+    output = outputs[0]
+    checkattributes(output, ['id'])
+
+    if (len(output) != 1) or (output[0].tag != 'table'):
+        raise UnsupportedDescriptor("<output> does not contain exactly one <table>")
+
+    fields = []
+
+    for field in output[0]:
+        if (field.tag != 'field'):
+            raise UnsupportedDescriptor("unsupported element <{}> in <table>".format(field.tag))
+        checkattributes(field, ['id', 'src'])
+        fields.append((field.get('id'), field.get('src')))
+
+    return structure.get('file'), blocks, fields
+
+def decodevalue(elt, data):
+
+    values = bytearray(data)
+
+    if (elt['decoder'] == 'bcd'):
+        digits = ''
+        for value in values:
+            if ((value >> 4) > 9) or ((value & 0x0F) > 9):
+                raise UnsupportedDescriptor("invalid BCD data")
+            digits += "{}{}".format(value >> 4, value & 0x0F)
+        return str(int(digits))
+    elif (elt['decoder'] == 'little_endian'):
+        return str(sum(value << (8*i) for i, value in enumerate(values)))
+    elif (elt['decoder'] == 'big_endian'):
+        return str(sum(value << (8*i) for i, value in enumerate(reversed(values))))
+    else:
+        if elt['charset'] is not None:
+            characters = [elt['charset'].get(value, '?') for value in values]
+        else:
+            characters = [chr(value) for value in values if (value != 0)]
+        return ''.join(characters)
+
+def decode(descriptor, MAMEbinaryhiscorefile):
+
+    # Return the hiscore table of a binary hiscore file as a list of rows, with the RANK|SCORE|NAME header as first row:
+
+    filename, blocks, fields = parsedescriptor(descriptor)
+
+    # Read binary hiscore data:
+
+    if os.path.isdir(MAMEbinaryhiscorefile):
+        if filename is None:
+            raise UnsupportedDescriptor("<structure> does not define a nvram file")
+        MAMEbinaryhiscorefile = os.path.join(MAMEbinaryhiscorefile, filename)
+    elif filename is not None:
+        raise UnsupportedDescriptor("<structure> defines a nvram file, but hiscores are saved in a .hi file")
+
+    if not os.path.isfile(MAMEbinaryhiscorefile):
+        raise UnsupportedDescriptor("{} does not exist".format(MAMEbinaryhiscorefile))
+
+    binaryfile = open(MAMEbinaryhiscorefile, 'rb')
+    data = binaryfile.read()
+    binaryfile.close()
+
+    # Decode structure (plain elements are shared by all rows, loop elements give one value per row):
+
+    position = 0
+    shared = {}
+    rows = []
+
+    for block in blocks:
+        for i in range(max(block['count'], 1)):
+            values = {}
+            for elt in block['elts']:
+                if (position + elt['size'] > len(data)):
+                    raise UnsupportedDescriptor("binary hiscore data is shorter than described")
+                if elt['id'] is not None:
+                    values[elt['id']] = decodevalue(elt, data[position:position + elt['size']])
+                position += elt['size']
+            if (block['count'] == 0):
+                shared.update(values)
+            else:
+                values[block['index']] = str(i + 1)
+                if (len(rows) <= i):
+                    rows.append({})
+                rows[i].update(values)
+
+    if (len(rows) == 0):
+        raise UnsupportedDescriptor("<structure> does not contain a <loop>")
+
+    # Create output table with kept fields only:
+
+    outputfields = [(fieldid, src) for fieldid, src in fields if fieldid in keepfields]
+
+    table = [[fieldid for fieldid, src in outputfields]]
+
+    for row in rows:
+        values = dict(shared)
+        values.update(row)
+        line = []
+        for fieldid, src in outputfields:
+            if src not in values:
+                raise UnsupportedDescriptor("unknown field source '{}'".format(src))
+            line.append(values[src])
+        table.append(line)
+
+    return table
@@ -1,64 +1,180 @@
 #!/usr/bin/python -tt
 """
 MAME support program to analyze hiscores of a single game or a list of games:
-- Binary hiscore data is readout and converted into ASCII code using the hi2txt Java archive.
+- Binary hiscore data is readout and converted into ASCII code using the hi2txt game descriptors. Common descriptors are decoded
+  in Python (see hi2txtdecoder.py), the hi2txt Java archive is used for all other descriptors.
 - The hi2txt output is saved in a dedicated MAME hiscores directory.
+- The hi2txt output is also saved in a manifest (hiscores_manifest.json in the MAME hiscores directory), together with content hashes
+  of the binary hiscore data, hiscore.dat and the hi2txt descriptor. In 'all' mode, hiscores are only decoded again if one of these has changed.
 - The top hiscore of each game is reformatted and saved in a formatted ASCII file (AMhiscores.ini). This file can be used to display the top hiscores in Attract-Mode.
 
 Requirements:
 
 - The latest hi2txt.jar and hi2txt.zip (see http://greatstone.free.fr/hi2txt/)
 - The latest hiscore.dat (see http://highscore.mameworld.info/)
-- Java (to run hi2txt.jar, see https://www.java.com)
+- Java (to run hi2txt.jar for descriptors that are not supported by hi2txtdecoder.py, see https://www.java.com)
 
 Usage:
 
 1) Change configsetup.py according to your system setup.
 2) Create a ${MAMEconfigdir}/hi2txt/ directory and put hi2txt.jar and hi2txt.zip in this directory.
-3) Unzip hi2txt.zip here and rename the unzipped directory "hi2txt_zip_contents".
-4) Make sure hiscore.dat is located in your ${MAMEconfigdir}/dats/ directory.
-5) To process a single game, type: 
+   (hi2txt.zip does not have to be unzipped: The hi2txt descriptors are read from hi2txt.zip directly)
+3) Make sure hiscore.dat is located in your ${MAMEconfigdir}/dats/ directory.
+4) To process a single game, type: 
    ./hiscoreanalysis.py {game}
    where {game} is the romname of the game (e.g. pacman) 
 OR to process all games in your Attract-Mode MAME romlist, type:
    ./hiscoreanalysis.py all
+5) Optionally adjust the number of games for which hiscores are decoded in parallel in 'all' mode (0 = number of CPU cores):
+"""
+
+hi2txtworkers = 0
 
+"""
 Author: Gordon Lim
-Last Edit: 1 Feb 2018 
+Last Edit: 18 Oct 2026 
 """
 
 import configsetup
+import hashlib
+import hi2txtdecoder
+import inistore
+import instrumentation
+import multiprocessing
 import os
+import pipeline
 import sys
 import subprocess
+import threading
+import zipfile
 
-def createhiscorefile(game):
+def scanplayedgames():
 
-    print("--- Creating AM hiscore file for {}:".format(game))
-    
-    # Check if unzipped hi2txt.zip contains game.xml file:
-    
-    if not os.path.isfile(hi2txtzipdir + game + ".xml"):
-        print("------ hi2txt.zip does not contain {}.xml => the hiscores of this game have not been identified or decoded yet => EXIT1".format(game))
-        return 1
+    # Return dictionary of games that have been played (romname -> nvram/game/ or hi/game.hi in MAME directory),
+    # using one directory scan of nvram/ and hi/:
+
+    playedgames = {}
+
+    if os.path.isdir(configsetup.MAMEconfigdir + 'hi/'):
+        for filename in os.listdir(configsetup.MAMEconfigdir + 'hi/'):
+            if (filename[-3:] == '.hi'):
+                playedgames[filename[:-3]] = configsetup.MAMEconfigdir + 'hi/' + filename
+
+    if os.path.isdir(configsetup.MAMEconfigdir + 'nvram/'):
+        for filename in os.listdir(configsetup.MAMEconfigdir + 'nvram/'):
+            playedgames[filename] = configsetup.MAMEconfigdir + 'nvram/' + filename
+
+    return playedgames
+
+def findplayedgame(game):
+
+    # Return dictionary like scanplayedgames for a single game, looking up nvram/game/ and hi/game.hi only:
+
+    playedgames = {}
+
+    for filename in [configsetup.MAMEconfigdir + 'hi/' + game + '.hi', configsetup.MAMEconfigdir + 'nvram/' + game]:
+        if os.path.exists(filename):
+            playedgames[game] = filename
+
+    return playedgames
+
+def fingerprintsource(MAMEbinaryhiscorefile, previousfingerprints):
+
+    # Return content hash of nvram/game/ or hi/game.hi, and the fingerprints of the file(s) used to calculate it
+    # (files with unchanged size and mtime are not read again, see configsetup.fingerprint):
+
+    if os.path.isdir(MAMEbinaryhiscorefile):
+        filenames = sorted(os.listdir(MAMEbinaryhiscorefile))
+        filepaths = [os.path.join(MAMEbinaryhiscorefile, filename) for filename in filenames]
     else:
-        print("------ hi2txt.zip contains {}.xml...".format(game))
+        filenames = [os.path.basename(MAMEbinaryhiscorefile)]
+        filepaths = [MAMEbinaryhiscorefile]
 
-    # Check if nvram/game/ or hi/game.hi exists in MAME directory:
+    fingerprints = {}
+    sha1 = hashlib.sha1()
+
+    for filename, filepath in zip(filenames, filepaths):
+        fingerprints[filename] = configsetup.fingerprint(filepath, previousfingerprints.get(filename))
+        if fingerprints[filename] is not None:
+            sha1.update((filename + ':' + fingerprints[filename]['sha1'] + ';').encode('utf-8'))
+
+    return sha1.hexdigest(), fingerprints
+
+def readhi2txtindex():
+
+    # Return dictionary of games with a hi2txt descriptor (romname -> {game}.xml member of hi2txt.zip).
+    # The index is built once per hi2txt.zip and cached in hi2txt_zip_index.json, keyed on the mtime and size of hi2txt.zip:
+
+    if not os.path.isfile(hi2txtzip): # Use unzipped hi2txt.zip instead:
+        return dict((filename[:-4], filename) for filename in os.listdir(hi2txtzipdir) if (filename[-4:] == '.xml'))
+
+    stat = os.stat(hi2txtzip)
 
-    MAMEbinaryhiscorefile = configsetup.MAMEconfigdir
+    index = configsetup.readjson(hi2txtzipindex, ['mtime', 'size', 'members'])
+
+    if (index is not None) and (index['mtime'] == stat.st_mtime) and (index['size'] == stat.st_size):
+        return index['members']
+
+    print("Indexing {}...".format(hi2txtzip))
     
-    if os.path.isdir(MAMEbinaryhiscorefile + 'nvram/' + game):
-        MAMEbinaryhiscorefile += 'nvram/' + game
-        print("------ nvram/{}/ exists...".format(game))
-    elif os.path.isfile(MAMEbinaryhiscorefile + 'hi/' + game + '.hi'):
-        MAMEbinaryhiscorefile += 'hi/' + game + '.hi'
-        print("------ hi/{}.hi exists...".format(game))
-    else:
-        print("------ nvram/{0} nor hi/{0}.hi exists => this game has not been played yet => EXIT2".format(game))
-        return 2
+    members = {}
+
+    zipfile_hi2txt = zipfile.ZipFile(hi2txtzip, 'r')
+    for member in zipfile_hi2txt.namelist():
+        if (member[-4:] == '.xml'):
+            members[os.path.basename(member)[:-4]] = member
+    zipfile_hi2txt.close()
+
+    configsetup.writejson(hi2txtzipindex, {'mtime': stat.st_mtime, 'size': stat.st_size, 'members': members})
 
-    # Run Java on hi2txt.jar and save output in MAME hiscores directory:
+    return members
+
+def findhi2txtgame(game):
+
+    # Return dictionary like readhi2txtindex for a single game, without reading or building the index of all games
+    # (hi2txt.zip is opened here, as it is needed to read the descriptor anyway):
+
+    global hi2txtzipfile
+
+    if not os.path.isfile(hi2txtzip):
+        if os.path.isfile(hi2txtzipdir + game + '.xml'):
+            return {game: game + '.xml'}
+        return {}
+
+    hi2txtzipfile = zipfile.ZipFile(hi2txtzip, 'r')
+    for member in hi2txtzipfile.namelist():
+        if (os.path.basename(member) == game + '.xml'):
+            return {game: member}
+
+    return {}
+
+def readdescriptor(game):
+
+    # Read {game}.xml from hi2txt.zip without unzipping (or from the unzipped hi2txt.zip):
+
+    global hi2txtzipfile
+
+    if not os.path.isfile(hi2txtzip):
+        descriptorfile = open(hi2txtzipdir + hi2txtgames[game], "rb")
+        descriptor = descriptorfile.read()
+        descriptorfile.close()
+        return descriptor
+
+    # hi2txt.zip is opened once and shared by all workers:
+    
+    hi2txtziplock.acquire()
+    try:
+        if hi2txtzipfile is None:
+            hi2txtzipfile = zipfile.ZipFile(hi2txtzip, 'r')
+        descriptor = hi2txtzipfile.read(hi2txtgames[game])
+    finally:
+        hi2txtziplock.release()
+
+    return descriptor
+
+def runhi2txtjar(game, MAMEbinaryhiscorefile):
+    
+    # Run Java on hi2txt.jar and return output as hiscore table:
 
     MAMEhiscorefilename = MAMEhiscoredir + game + ".txt"
     MAMEhiscorefile = open(MAMEhiscorefilename, 'w')
@@ -68,19 +184,121 @@ def createhiscorefile(game):
                "-keep-field", 'SCORE',
                "-keep-field", 'NAME'] 
 
-    subprocess.call(command, stdout=MAMEhiscorefile)
+    with instrumentation.stage('hi2txt.jar', 'subprocess'):
+        subprocess.call(command, stdout=MAMEhiscorefile)
+    MAMEhiscorefile.close()
+
+    MAMEhiscorefile = open(MAMEhiscorefilename, 'r')
+    table = [line.rstrip('\n').split('|') for line in MAMEhiscorefile]
     MAMEhiscorefile.close()
 
-    # Read temporary txt file containing hi2txt output and check hiscore table structure:
+    return table
+
+def gethiscoretable(game, MAMEbinaryhiscorefile):
+
+    # Return hiscore table of a game and how it was obtained:
+    # - from the manifest, if the binary hiscore data, hiscore.dat and the hi2txt descriptor have not changed since the last run
+    # - decoded in Python (hi2txtdecoder)
+    # - decoded by hi2txt.jar, if the hi2txt descriptor is not supported by hi2txtdecoder
+    
+    descriptor = readdescriptor(game)
+
+    previousentry = manifest.get(game, {})
+    
+    sourcehash, sourcefingerprints = fingerprintsource(MAMEbinaryhiscorefile, previousentry.get('files', {}))
+    descriptorhash = hashlib.sha1(descriptor).hexdigest()
+
+    MAMEhiscorefilename = MAMEhiscoredir + game + ".txt"
+
+    if ((previousentry.get('source') == sourcehash) and
+        (previousentry.get('hiscoredat') == hiscoredathash) and
+        (previousentry.get('descriptor') == descriptorhash)):
+        table = previousentry['table']
+        method = 'cache'
+    else:
+        try:
+            with instrumentation.stage('hi2txtdecoder'):
+                table = hi2txtdecoder.decode(descriptor, MAMEbinaryhiscorefile)
+            method = 'hi2txtdecoder'
+        except hi2txtdecoder.UnsupportedDescriptor:
+            table = runhi2txtjar(game, MAMEbinaryhiscorefile)
+            method = 'hi2txt.jar'
+
+    # Save hiscore table in MAME hiscores directory:
+    
+    if (method != 'hi2txt.jar') and ((method != 'cache') or not os.path.isfile(MAMEhiscorefilename)):
+        MAMEhiscorefile = open(MAMEhiscorefilename, 'w')
+        for row in table:
+            MAMEhiscorefile.write("|".join(row) + "\n")
+        MAMEhiscorefile.close()
+
+    # Update manifest (games are processed by different workers, so every game updates its own entry only):
+    
+    manifest[game] = {'source'    : sourcehash,
+                      'files'     : sourcefingerprints,
+                      'hiscoredat': hiscoredathash,
+                      'descriptor': descriptorhash,
+                      'table'     : table}
+        
+    return table, method
+
+def converthiscores(game):
+
+    # Worker function for 'all' mode: Get hiscore table of a hi2txt-compatible game that has been played
+    # (nothing is printed here, the hiscore table is analyzed in romlist order by createhiscorefile):
+    
+    if (game in hi2txtgames) and (game in playedgames):
+        with instrumentation.stage(game, 'game'):
+            return game, gethiscoretable(game, playedgames[game])
+
+    return game, None
+
+def createhiscorefile(game, AMhiscores, hiscoretable = None):
+
+    print("--- Creating AM hiscore file for {}:".format(game))
+    
+    # Check if hi2txt.zip contains game.xml file:
+    
+    if game not in hi2txtgames:
+        print("------ hi2txt.zip does not contain {}.xml => the hiscores of this game have not been identified or decoded yet => EXIT1".format(game))
+        return 1
+    else:
+        print("------ hi2txt.zip contains {}.xml...".format(game))
 
-    MAMEhiscorefile = open(MAMEhiscorefilename, "r")    
-    firstline = MAMEhiscorefile.readline()
-    hiscoretablefields = firstline.rstrip('\n').split('|')
+    # Check if nvram/game/ or hi/game.hi exists in MAME directory:
+
+    if game not in playedgames:
+        print("------ nvram/{0} nor hi/{0}.hi exists => this game has not been played yet => EXIT2".format(game))
+        return 2
+    elif (playedgames[game][-3:] != '.hi'):
+        print("------ nvram/{}/ exists...".format(game))
+    else:
+        print("------ hi/{}.hi exists...".format(game))
+
+    # Get hiscore table (unless this has been done already by converthiscores):
+
+    if hiscoretable is None:
+        with instrumentation.stage(game, 'game'):
+            hiscoretable = gethiscoretable(game, playedgames[game])
+
+    table, method = hiscoretable
+
+    if (method == 'cache'):
+        print("------ binary hiscore data has not changed since last run => hiscores taken from manifest...")
+    elif (method == 'hi2txtdecoder'):
+        print("------ hiscores decoded by hi2txtdecoder...")
+    else:
+        print("------ hi2txt descriptor not supported by hi2txtdecoder => hiscores decoded by hi2txt.jar...")
 
-    if (len(firstline) == 0):
+    # Check hiscore table structure:
+
+    if (len(table) == 0):
         print("------ hi2txt.jar output w.r.t. {} is empty => this game has been played but no hiscore has been saved in nvram or hi yet => EXIT3".format(game))
         return 3
-    elif (len(hiscoretablefields) < 2):
+
+    hiscoretablefields = table[0]
+
+    if (len(hiscoretablefields) < 2):
         print("------ Incompatible hiscore table format => EXIT4".format(game))
         return 4
     elif ((hiscoretablefields[0] != "RANK") and (hiscoretablefields[1] != "SCORE")):
@@ -90,44 +308,18 @@ def createhiscorefile(game):
     # Create hiscore list:
     
     scores = []
-    for line in MAMEhiscorefile.readlines():
-        score = [field for field in line.rstrip('\n').split('|')]
+    for row in table[1:]:
+        score = list(row)
         if (len(score) < 2): # remove anomalous entries
             continue
         if (len(score) == 2): # add empty name for games like pacman, invaders, etc.
             score.append("   ")
         scores.append(score[0:3])
-    
-    MAMEhiscorefile.close()
 
     # Save top hiscore in AMhiscores.ini:
 
-    AMhiscorefilename = configsetup.AMsupportdir + "data/AMhiscores.ini"
-
-    AMhiscorefilename_exists = False
-    if os.path.isfile(AMhiscorefilename):
-        AMhiscorefilename_exists = True
-        AMhiscorefile = open(AMhiscorefilename, 'r')
-        lines = []
-        while True:
-            line = AMhiscorefile.readline()
-            if not line:
-                break
-            if (line == "[{}]\n".format(game)):
-                dummy = AMhiscorefile.readline() # skip score
-                dummy = AMhiscorefile.readline() # skip name
-            else:
-                lines.append(line)
-        AMhiscorefile.close()
-        
-    AMhiscorefile = open(AMhiscorefilename, 'w')
-    if AMhiscorefilename_exists:
-        for line in lines:
-            AMhiscorefile.write(line)
-    AMhiscorefile.write("[{}]\n".format(game))
-    AMhiscorefile.write("score={}\n".format(scores[0][1]))
-    AMhiscorefile.write("name={}\n".format(scores[0][2]))
-    AMhiscorefile.close()
+    AMhiscores.upsert(game, [('score', scores[0][1]),
+                             ('name',  scores[0][2])])
    
     print("------ AM hiscore file for {} created => SUCCESS".format(game))
         
@@ -137,24 +329,60 @@ def main():
 
     # Setup configuration:
     
+    instrumentation.init('hiscoreanalysis')
+
     configsetup.init()
 
+    # Check input:
+
+    clearasciihiscores = raw_input('Remove all ASCII hiscore files? (this will NOT delete binary hiscore data created by MAME in the nvram and hi directories) Press "y" or "n" followed by return/enter: ')
+
+    if not ((clearasciihiscores == 'y') or (clearasciihiscores == 'n')):
+        print("Next time please type 'y' or 'n'")
+        return 1
+
+    if (len(sys.argv) != 2):
+        print("Please provide a romname or 'all' as input argument")
+        return 1
+       
+    return analyze(sys.argv[1], clearasciihiscores)
+
+def analyze(inputargument, clearasciihiscores = 'n'):
+
+    # Process a game (inputargument is its romname) or all games in AM romlist (inputargument is 'all'),
+    # clearasciihiscores is 'y' to remove all ASCII hiscore files first:
+
     global hi2txtdir
+    global hi2txtzip
     global hi2txtzipdir
+    global hi2txtzipindex
+    global hi2txtzipfile
+    global hi2txtziplock
+    global hi2txtgames
     global hiscoredat
     global MAMEhiscoredir
+    global MAMEhiscoremanifest
+    global hiscoredathash
+    global playedgames
+    global manifest
     
     hi2txtdir      = configsetup.MAMEconfigdir + "hi2txt/"
+    hi2txtzip      = hi2txtdir                 + "hi2txt.zip"
     hi2txtzipdir   = hi2txtdir                 + "hi2txt_zip_contents/"
+    hi2txtzipindex = hi2txtdir                 + "hi2txt_zip_index.json"
     hiscoredat     = configsetup.MAMEconfigdir + "dats/hiscore.dat"
     MAMEhiscoredir = configsetup.MAMEconfigdir + "hiscores/"
 
+    MAMEhiscoremanifest = MAMEhiscoredir + "hiscores_manifest.json"
+
+    AMhiscorefilename = configsetup.AMsupportdir + "data/AMhiscores.ini"
+
     if not os.path.isdir(hi2txtdir):
         print("MAME hi2txt directory does not exist - EXIT")
         return 1
 
-    if not os.path.isdir(hi2txtzipdir):
-        print("MAME hi2txt_zip_contents directory does not exist - EXIT")
+    if not (os.path.isfile(hi2txtzip) or os.path.isdir(hi2txtzipdir)):
+        print("MAME hi2txt.zip does not exist - EXIT")
         return 1
 
     if not os.path.isfile(hiscoredat):
@@ -167,40 +395,51 @@ def main():
             print("ERROR: AM hiscores directory does not exist - EXIT")
             return 1
     
-    # Check input and process game(s):
-
-    clearasciihiscores = raw_input('Remove all ASCII hiscore files? (this will NOT delete binary hiscore data created by MAME in the nvram and hi directories) Press "y" or "n" followed by return/enter: ')
-
-    if not ((clearasciihiscores == 'y') or (clearasciihiscores == 'n')):
-        print("Next time please type 'y' or 'n'")
-        return 1
-
     if (clearasciihiscores == 'y'):
         subprocess.call('rm *.txt', cwd = MAMEhiscoredir, shell = True)
+        if os.path.isfile(MAMEhiscoremanifest):
+            os.remove(MAMEhiscoremanifest)
 
-    if (len(sys.argv) != 2):
-        print("Please provide a romname or 'all' as input argument")
-        return 1
-       
-    inputargument = sys.argv[1]
+    hi2txtzipfile = None
+    hi2txtziplock = threading.Lock()
 
     if (inputargument == 'all'):
 
-        # Transform AM romlist into list of games:
+        # Find played games, and read hiscore tables of previous run:
 
-        games, header = configsetup.create_list_of_games_from_romlist()
-        
-        if (len(games) == 0):
-            print("AM romlist is empty - EXIT")
-            return 1
+        with instrumentation.stage('read hi2txt index'):
+            hi2txtgames = readhi2txtindex()
+
+        with instrumentation.stage('scan played games'):
+            playedgames = scanplayedgames()
 
-        # Create hiscore file for each game:
+        with instrumentation.stage('read manifest'):
+            manifest = configsetup.readjson(MAMEhiscoremanifest) or {}
+            # The fingerprint of hiscore.dat is saved in the manifest as well, so that hiscore.dat is only hashed again if its size or mtime changed
+            # ('hiscore.dat' is not a valid romname):
+            manifest['hiscore.dat'] = configsetup.fingerprint(hiscoredat, manifest.get('hiscore.dat'))
+            hiscoredathash = manifest['hiscore.dat']['sha1']
+
+        # Create hiscore file for each game in AM romlist:
 
         counts = [0, 0, 0, 0, 0, 0]
 
-        for game in games:
-            returncode = createhiscorefile(game[0])
+        AMhiscores = inistore.INIStore(AMhiscorefilename)
+
+        # Get hiscore tables for several games in parallel, and analyze the results in romlist order:
+
+        numberofworkers = hi2txtworkers or multiprocessing.cpu_count()
+        
+        for game, hiscoretable in pipeline.run((game.Name for game in configsetup.read_romlist()), [converthiscores], numberofworkers):
+            returncode = createhiscorefile(game, AMhiscores, hiscoretable)
             counts[returncode] += 1
+
+        with instrumentation.stage('write AMhiscores.ini'):
+            AMhiscores.flush() # Save AMhiscores.ini once for all games
+
+        if (sum(counts) == 0):
+            print("AM romlist is empty - EXIT")
+            return 1
             
         print("==> Return code '0' indicates a succesfully processed game")
         print("--> Return code '1' indicates a hi2txt-incompatible game")
@@ -212,9 +451,27 @@ def main():
         print("==> Total # of games = {}".format(sum(counts)))
         for i in range(0, len(counts)):
             print("--> # of return code '{}' games = {}".format(i, counts[i]))
+
+        with instrumentation.stage('write manifest'):
+            configsetup.writejson(MAMEhiscoremanifest, manifest)
             
     else:
-        createhiscorefile(inputargument)
+
+        # A single game is analyzed after playing it (see mame.bash), so only the files of this game are looked up.
+        # Its binary hiscore data has changed anyway, so the manifest of all games is not read or written
+        # (the next 'all' run decodes the hiscores of this game again):
+
+        hi2txtgames = findhi2txtgame(inputargument)
+        playedgames = findplayedgame(inputargument)
+        manifest = {}
+        hiscoredathash = None
+
+        AMhiscores = inistore.INIStore(AMhiscorefilename)
+        createhiscorefile(inputargument, AMhiscores)
+        AMhiscores.flush()
+
+    if hi2txtzipfile is not None:
+        hi2txtzipfile.close()
 
     return 0
 
@@ -0,0 +1,96 @@
+#!/usr/bin/python -tt
+"""
+MAME support module to create low-resolution versions of artwork images (e.g. bezels):
+- Images are resized in-process with Pillow (https://python-pillow.org, install with: pip install Pillow):
+  the source image is decoded once, resized with a high-quality (Lanczos) filter so that its width or height - whichever
+  is largest - equals the requested resolution, and saved as .png.
+- If Pillow is not installed, Sips (standard installed on Mac OS X) is used instead.
+- The pixel dimensions of the original and of the resized image are returned, so that image coordinates can be rescaled.
+
+Usage:
+
+   if imageresize.method is not None: # 'pillow', 'sips' or None
+       oldwidth, oldheight, newwidth, newheight = imageresize.resize(sourcefile, destination, resolution) # sourcefile is a file object
+
+Author: Gordon Lim
+Last Edit: 18 Oct 2026
+"""
+
+import io
+import os
+import re
+import shutil
+import subprocess
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+if Image is not None:
+    method = 'pillow'
+elif os.path.isfile('/usr/bin/sips'):
+    method = 'sips'
+else:
+    method = None
+
+def newsize(width, height, resolution):
+
+    # Pixel dimensions of an image of which the width or height - whichever is largest - is scaled to resolution:
+
+    if (width > height):
+        return resolution, max(1, int(round(float(height)*resolution/width)))
+    else:
+        return max(1, int(round(float(width)*resolution/height))), resolution
+
+def resizepillow(sourcefile, destination, resolution):
+
+    image = Image.open(io.BytesIO(sourcefile.read())) # Zip file members can not seek, so the image is decoded from memory
+
+    oldwidth, oldheight = image.size
+    newwidth, newheight = newsize(oldwidth, oldheight, resolution)
+
+    if image.mode not in ['RGB', 'RGBA', 'L', 'LA']: # Palette images are converted first, so that they can be filtered
+        image = image.convert('RGBA')
+
+    image = image.resize((newwidth, newheight), getattr(Image, 'LANCZOS', getattr(Image, 'ANTIALIAS', None)))
+    image.save(destination + '.tmp', 'PNG')
+
+    os.rename(destination + '.tmp', destination)
+
+    return oldwidth, oldheight, newwidth, newheight
+
+def sipssize(filename):
+
+    output = subprocess.check_output(["sips", "-g", "pixelWidth", "-g", "pixelHeight", filename]).decode('utf-8', 'replace')
+    matchobject = re.search(r"pixelWidth:\s*(\d+)\s*\n\s*pixelHeight:\s*(\d+)", output)
+
+    return int(matchobject.group(1)), int(matchobject.group(2))
+
+def resizesips(sourcefile, destination, resolution):
+
+    destinationfile = open(destination, 'wb')
+    shutil.copyfileobj(sourcefile, destinationfile, 1 << 16)
+    destinationfile.close()
+
+    oldwidth, oldheight = sipssize(destination)
+
+    FNULL = open(os.devnull, 'w')
+    subprocess.check_call(["sips", "-Z", str(resolution), destination], stdout = FNULL)
+    FNULL.close()
+
+    newwidth, newheight = sipssize(destination)
+
+    return oldwidth, oldheight, newwidth, newheight
+
+def resize(sourcefile, destination, resolution):
+
+    # Save resized version of image in sourcefile (file object opened in binary mode) as destination .png file,
+    # return (original width, original height, new width, new height) in pixels:
+
+    if (method == 'pillow'):
+        return resizepillow(sourcefile, destination, int(resolution))
+    elif (method == 'sips'):
+        return resizesips(sourcefile, destination, int(resolution))
+    else:
+        raise RuntimeError("Neither Pillow nor Sips is installed on this system")
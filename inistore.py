@@ -0,0 +1,109 @@
+#!/usr/bin/python -tt
+"""
+MAME support module to read and update formatted ASCII files (AMhiscores.ini, AMbenchmarks.ini, etc.):
+- The .ini file is read once into an ordered map of sections, i.e. [romname] -> list of (key, value) pairs.
+- Sections are added/replaced in memory, keeping the position of existing sections in the file.
+- The .ini file is written once at the end of a batch of updates.
+
+Usage:
+
+   AMhiscores = inistore.INIStore(AMhiscorefilename)
+   AMhiscores.upsert(game, [('score', score), ('name', name)]) # For each game
+   AMhiscores.flush()
+
+Author: Gordon Lim
+Last Edit: 18 Oct 2026
+"""
+
+import collections
+import instrumentation
+import os
+
+class INIStore(object):
+
+    def __init__(self, filename):
+
+        self.filename = filename
+        self.sections = collections.OrderedDict()
+        self.modified = False
+
+        if os.path.isfile(filename):
+            self.read()
+
+    def read(self):
+
+        inifile = open(self.filename, 'r')
+
+        section = None
+
+        for line in inifile:
+            line = line.rstrip('\r\n')
+            if (line[0:1] == '[') and (line[-1:] == ']'):
+                section = line[1:-1]
+                self.sections[section] = []
+            elif (section is not None) and (line != ''):
+                key, separator, value = line.partition('=')
+                self.sections[section].append((key, value))
+
+        inifile.close()
+
+        instrumentation.fileread(self.filename)
+
+        return
+
+    def __contains__(self, section):
+
+        return section in self.sections
+
+    def __len__(self):
+
+        return len(self.sections)
+
+    def get(self, section):
+
+        # Return list of (key, value) pairs of section (or None if section does not exist):
+
+        return self.sections.get(section)
+
+    def upsert(self, section, items):
+
+        # Replace section, or add section at the end of the file if it does not exist yet:
+
+        items = [(key, str(value)) for key, value in items]
+
+        if (self.sections.get(section) != items):
+            self.sections[section] = items
+            self.modified = True
+
+        return
+
+    def remove(self, section):
+
+        if section in self.sections:
+            del self.sections[section]
+            self.modified = True
+
+        return
+
+    def flush(self):
+
+        # Write .ini file (only if sections have been changed) via a temporary file,
+        # so that an interrupted write never leaves a truncated .ini file:
+
+        if not self.modified:
+            return
+
+        inifile = open(self.filename + '.tmp', 'w')
+        for section, items in self.sections.items():
+            inifile.write("[{}]\n".format(section))
+            for key, value in items:
+                inifile.write("{}={}\n".format(key, value))
+        inifile.close()
+
+        os.rename(self.filename + '.tmp', self.filename)
+
+        instrumentation.filewritten(self.filename)
+
+        self.modified = False
+
+        return
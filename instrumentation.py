@@ -0,0 +1,219 @@
+#!/usr/bin/python -tt
+"""
+MAME support module to profile the MAME support programs:
+- Programs record the wall time of stages (e.g. romlist parse, .ini writes), of each game and of each subprocess
+  (e.g. hi2txt.jar, MAME), and the number of bytes read and written by each stage.
+- At exit, a trace file in Chrome trace-event format is saved (open it in chrome://tracing or https://ui.perfetto.dev),
+  and a summary table is printed.
+- Profiling is disabled by default. When it is disabled, stages are a no-op.
+
+Usage:
+
+1) Enable profiling by setting an environment variable before running a program, e.g.:
+   AMSUPPORT_TRACE=1 ./hiscoreanalysis.py all
+   The trace file is saved as {program}_trace.json in the current directory. To save the trace file elsewhere, set the variable
+   to a filename instead (e.g. AMSUPPORT_TRACE=/tmp/trace.json).
+OR add --trace to the input arguments of a program, e.g.:
+   ./hiscoreanalysis.py all --trace
+2) In a program:
+   instrumentation.init('hiscoreanalysis') # At the start of main(), removes --trace from sys.argv
+   with instrumentation.stage('read romlist'):
+       ...
+   with instrumentation.stage(romname, 'game'):
+       ...
+   with instrumentation.stage('hi2txt.jar', 'subprocess'):
+       ...
+   instrumentation.fileread(filename)    # Count bytes read/written by the current stage
+   instrumentation.filewritten(filename)
+
+Author: Gordon Lim
+Last Edit: 18 Oct 2026
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+enabled = False
+
+toolname = ''
+tracefilename = ''
+events = []
+starttime = 0
+threadstate = threading.local()
+
+class NullStage(object):
+
+    # Stage used when profiling is disabled:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptiontype, exception, traceback):
+        return False
+
+nullstage = NullStage()
+
+class Stage(object):
+
+    def __init__(self, name, category):
+
+        self.name = name
+        self.category = category
+        self.bytesread = 0
+        self.byteswritten = 0
+
+    def __enter__(self):
+
+        if not hasattr(threadstate, 'stages'):
+            threadstate.stages = []
+        threadstate.stages.append(self)
+
+        self.starttime = time.time()
+
+        return self
+
+    def __exit__(self, exceptiontype, exception, traceback):
+
+        duration = time.time() - self.starttime
+
+        threadstate.stages.pop()
+
+        events.append({'name': self.name,
+                       'cat' : self.category,
+                       'ph'  : 'X',
+                       'ts'  : int((self.starttime - starttime)*1e6),
+                       'dur' : int(duration*1e6),
+                       'pid' : os.getpid(),
+                       'tid' : threading.current_thread().ident,
+                       'args': {'bytesread': self.bytesread, 'byteswritten': self.byteswritten}})
+
+        return False
+
+def init(name):
+
+    # Enable profiling if requested by environment variable AMSUPPORT_TRACE or by --trace input argument:
+
+    global enabled
+    global toolname
+    global tracefilename
+    global starttime
+
+    tracevariable = os.environ.get('AMSUPPORT_TRACE', '')
+
+    if '--trace' in sys.argv:
+        sys.argv.remove('--trace')
+        tracevariable = tracevariable or '1'
+
+    if (tracevariable in ['', '0']):
+        return
+
+    enabled = True
+    toolname = name
+    starttime = time.time()
+
+    if (tracevariable == '1'):
+        tracefilename = name + '_trace.json'
+    else:
+        tracefilename = tracevariable
+
+    atexit.register(finish)
+
+    return
+
+def stage(name, category = 'stage'):
+
+    if not enabled:
+        return nullstage
+
+    return Stage(name, category)
+
+def currentstage():
+
+    stages = getattr(threadstate, 'stages', None)
+
+    if not stages:
+        return None
+
+    return stages[-1]
+
+def bytesread(numberofbytes):
+
+    if enabled and (currentstage() is not None):
+        currentstage().bytesread += numberofbytes
+
+    return
+
+def byteswritten(numberofbytes):
+
+    if enabled and (currentstage() is not None):
+        currentstage().byteswritten += numberofbytes
+
+    return
+
+def fileread(filename):
+
+    if enabled and os.path.isfile(filename):
+        bytesread(os.path.getsize(filename))
+
+    return
+
+def filewritten(filename):
+
+    if enabled and os.path.isfile(filename):
+        byteswritten(os.path.getsize(filename))
+
+    return
+
+def summary():
+
+    # Return summary table as list of lines: one row per stage and subprocess, and one row for all games together:
+
+    rows = {}
+
+    for event in events:
+        if (event['cat'] == 'game'):
+            key = ('game', '(all games)')
+        else:
+            key = (event['cat'], event['name'])
+        row = rows.setdefault(key, [0, 0, 0, 0, 0])
+        row[0] += 1
+        row[1] += event['dur']
+        row[2]  = max(row[2], event['dur'])
+        row[3] += event['args']['bytesread']
+        row[4] += event['args']['byteswritten']
+
+    lines = []
+    lines.append("{:<10} {:<32} {:>7} {:>10} {:>10} {:>10} {:>12} {:>12}".format(
+        'category', 'name', 'count', 'total (s)', 'mean (ms)', 'max (ms)', 'read (kB)', 'written (kB)'))
+
+    for key, row in sorted(rows.items(), key = lambda item: -item[1][1]):
+        lines.append("{:<10} {:<32} {:>7} {:>10.3f} {:>10.3f} {:>10.3f} {:>12.1f} {:>12.1f}".format(
+            key[0], key[1][:32], row[0], row[1]/1e6, row[1]/1e3/row[0], row[2]/1e3, row[3]/1024.0, row[4]/1024.0))
+
+    games = sorted([event for event in events if (event['cat'] == 'game')], key = lambda event: -event['dur'])
+
+    if (len(games) > 0):
+        lines.append("Slowest games: " + ', '.join("{} ({:.3f} s)".format(event['name'], event['dur']/1e6) for event in games[:10]))
+
+    return lines
+
+def finish():
+
+    # Save trace file and print summary table:
+
+    if not enabled:
+        return
+
+    tracefile = open(tracefilename, 'w')
+    json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'program': toolname}}, tracefile)
+    tracefile.close()
+
+    print("==> Profile of {} ({:.3f} s, trace saved in {}):".format(toolname, time.time() - starttime, tracefilename))
+    for line in summary():
+        print(line)
+
+    return
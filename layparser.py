@@ -0,0 +1,262 @@
+#!/usr/bin/python -tt
+"""
+MAME support module to parse MAME artwork layout files ({game}.lay) into a small layout model:
+- Analysis is based on the standard .lay file structure as defined here: http://wiki.mamedev.org/index.php/LAY_File_Basics_-_Part_I
+- The .lay file is parsed in one pass with an incremental (expat) XML parser, so parse time grows linearly with the file size,
+  independent of whitespace, line breaks and attribute order.
+- Layout model:
+  layout.artworktype: text after "Artwork type:" in a comment (e.g. "Bezel"), or '' if there is no such comment
+  layout.elements:    dictionary of elements (element name -> Element), where element.imagefiles is the list of image files
+  layout.views:       list of views (in file order), where view.name is the view name, view.bounds the bounds of the view (or None),
+                      view.screens the list of screen bounds, and view.items the list of artwork items in the view
+                      (item.tag, e.g. 'bezel', item.element the element name, item.bounds the bounds of the item)
+  layout.error:       XML error message if the .lay file is not well-formed (the model then contains everything up to the error)
+- Bounds are given as x, y, width, height, or as left, top, right, bottom (converted to x, y, width, height).
+
+Usage:
+
+   layout = layparser.parse(layfile) # layfile is a file object, or the contents of a .lay file
+
+Author: Gordon Lim
+Last Edit: 18 Oct 2026
+"""
+
+import re
+import xml.parsers.expat
+
+# Tags of artwork items in views ('element' is the generic artwork item of newer .lay files: <element ref="..."/>):
+
+itemtags = ['bezel', 'backdrop', 'overlay', 'cpanel', 'marquee', 'element']
+
+class Bounds(object):
+
+    __slots__ = ['x', 'y', 'width', 'height']
+
+    def __init__(self, x, y, width, height):
+
+        self.x      = x
+        self.y      = y
+        self.width  = width
+        self.height = height
+
+class Element(object):
+
+    __slots__ = ['name', 'imagefiles']
+
+    def __init__(self, name):
+
+        self.name       = name
+        self.imagefiles = []
+
+class ViewItem(object):
+
+    __slots__ = ['tag', 'element', 'boundsattributes']
+
+    def __init__(self, tag, element):
+
+        self.tag              = tag
+        self.element          = element
+        self.boundsattributes = None
+
+    @property
+    def bounds(self):
+
+        return parsebounds(self.boundsattributes)
+
+class View(object):
+
+    __slots__ = ['name', 'boundsattributes', 'screenattributes', 'items']
+
+    def __init__(self, name):
+
+        self.name             = name
+        self.boundsattributes = None
+        self.screenattributes = []
+        self.items            = []
+
+    @property
+    def bounds(self):
+
+        return parsebounds(self.boundsattributes)
+
+    @property
+    def screens(self):
+
+        return [parsebounds(attributes) for attributes in self.screenattributes]
+
+class Layout(object):
+
+    def __init__(self):
+
+        self.artworktype = ''
+        self.elements    = {}
+        self.views       = []
+        self.error       = None
+
+    def findview(self, viewpattern, elementpatterns, itemtags = ('bezel', 'element')):
+
+        # Return first view (and its item) of which the name matches viewpattern and that contains an item with a tag in itemtags
+        # whose element name matches an element pattern. Element patterns are tried in order (regex patterns must match
+        # the complete name). Returns (None, None) if no view matches:
+
+        for elementpattern in elementpatterns:
+            for view in self.views:
+                if not fullmatch(viewpattern, view.name):
+                    continue
+                for item in view.items:
+                    if (item.tag in itemtags) and fullmatch(elementpattern, item.element):
+                        return view, item
+
+        return None, None
+
+    def imagefile(self, elementname, extension = '.png'):
+
+        # Return first image file of an element with the given extension (or None):
+
+        element = self.elements.get(elementname)
+
+        if element is None:
+            return None
+
+        for imagefile in element.imagefiles:
+            if (imagefile[-len(extension):].lower() == extension):
+                return imagefile
+
+        return None
+
+def fullmatch(pattern, string):
+
+    return re.match('(?:' + pattern + r')\Z', string) is not None
+
+def parsefloat(string):
+
+    try:
+        return float(string)
+    except (TypeError, ValueError):
+        return None
+
+def parsebounds(attributes):
+
+    # Return Bounds of the attributes of a <bounds> element (or None if there are no bounds or the bounds are not valid):
+
+    if attributes is None:
+        return None
+
+    if ('left' in attributes) or ('right' in attributes) or ('top' in attributes) or ('bottom' in attributes):
+        left   = parsefloat(attributes.get('left',   '0'))
+        top    = parsefloat(attributes.get('top',    '0'))
+        right  = parsefloat(attributes.get('right',  '1'))
+        bottom = parsefloat(attributes.get('bottom', '1'))
+        if None in [left, top, right, bottom]:
+            return None
+        return Bounds(left, top, right - left, bottom - top)
+
+    x      = parsefloat(attributes.get('x',      '0'))
+    y      = parsefloat(attributes.get('y',      '0'))
+    width  = parsefloat(attributes.get('width',  '1'))
+    height = parsefloat(attributes.get('height', '1'))
+
+    if None in [x, y, width, height]:
+        return None
+
+    return Bounds(x, y, width, height)
+
+class LayoutBuilder(object):
+
+    # Expat handlers that build the layout model while the .lay file is parsed
+    # (bounds are saved as attributes and only converted to Bounds when they are used, see View and ViewItem):
+
+    def __init__(self):
+
+        self.layout  = Layout()
+        self.tags    = ['']  # Tags of open XML elements
+        self.element = None  # Open <element> definition
+        self.view    = None  # Open <view>
+        self.screen  = False # <screen> in view is open
+        self.item    = None  # Open artwork item in view
+
+    def start(self, tag, attributes):
+
+        tags = self.tags
+        parent = tags[-1]
+        tags.append(tag)
+
+        if (tag == 'bounds'):
+            if (parent == 'view') and (self.view is not None):
+                self.view.boundsattributes = attributes
+            elif (parent == 'screen') and self.screen:
+                self.view.screenattributes[-1] = attributes
+            elif (self.item is not None) and (parent in itemtags):
+                self.item.boundsattributes = attributes
+        elif (self.view is not None):
+            if (parent == 'view'):
+                if (tag == 'screen'):
+                    self.view.screenattributes.append(None)
+                    self.screen = True
+                elif (tag in itemtags) and ('element' in attributes or 'ref' in attributes):
+                    self.item = ViewItem(tag, attributes.get('element', attributes.get('ref')))
+                    self.view.items.append(self.item)
+        elif (self.element is not None):
+            if (tag == 'image') and ('file' in attributes):
+                self.element.imagefiles.append(attributes['file'])
+        elif (len(tags) == 3):
+            if (tag == 'element') and ('name' in attributes):
+                self.element = Element(attributes['name'])
+                self.layout.elements[self.element.name] = self.element
+            elif (tag == 'view'):
+                self.view = View(attributes.get('name', ''))
+                self.layout.views.append(self.view)
+
+        return
+
+    def end(self, tag):
+
+        tags = self.tags
+        tags.pop()
+
+        if (len(tags) == 2):
+            self.element = None
+            self.view = None
+        elif (tag == 'screen'):
+            self.screen = False
+        elif (self.item is not None) and (tags[-1] == 'view'):
+            self.item = None
+
+        return
+
+    def comment(self, text):
+
+        position = text.find('Artwork type:')
+
+        if (position >= 0) and (self.layout.artworktype == ''):
+            self.layout.artworktype = text[position + 13:].strip().split('\n')[0].strip()
+
+        return
+
+def parse(source, blocksize = 1 << 16):
+
+    # Return Layout of a .lay file (source is a file object opened in binary mode, or the contents of a .lay file):
+
+    builder = LayoutBuilder()
+
+    parser = xml.parsers.expat.ParserCreate()
+    if hasattr(parser, 'returns_unicode'): # Python 2: return str instead of unicode
+        parser.returns_unicode = False
+    parser.StartElementHandler = builder.start
+    parser.EndElementHandler   = builder.end
+    parser.CommentHandler      = builder.comment
+
+    try:
+        if hasattr(source, 'read'):
+            while True:
+                block = source.read(blocksize)
+                if not block:
+                    break
+                parser.Parse(block, False)
+        else:
+            parser.Parse(source, False)
+        parser.Parse(b'', True)
+    except xml.parsers.expat.ExpatError as error:
+        builder.layout.error = str(error)
+
+    return builder.layout
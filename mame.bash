@@ -18,10 +18,11 @@ AMSUPPORTDIR="${HOME}/Programming/attractmode_support/" # Your 'attractmode_supp
 # 4) Open a terminal and type: mame {game}
 #
 # Author: Gordon Lim
-# Last Edit: 29 Jan 2018 
+# Last Edit: 18 Oct 2026 
 
 cd "${MAMEDIR}"
 if [ "$#" == "1" ] && [ -f "${MAMEDIR}/roms/$1.zip" ]; then
+    ./mame64 -version > /Users/uci/Games/SDLMAME\ Config/benchmarks/$1_lastgame.version
     ./mame64 $1 > /Users/uci/Games/SDLMAME\ Config/benchmarks/$1_lastgame.log
     ${AMSUPPORTDIR}/hiscoreanalysis.py   $1
     ${AMSUPPORTDIR}/benchmarkanalysis.py $1
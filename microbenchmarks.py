@@ -0,0 +1,436 @@
+#!/usr/bin/python -tt
+"""
+MAME support program to benchmark the performance of the MAME support programs themselves (not MAME):
+- Synthetic input files are generated at realistic scale in a temporary directory: an Attract-Mode romlist,
+  AM*.ini files, AMtitles.txt, a controls.ini file, and bezel artwork with .lay files with many views.
+- Romlist parsing, the romlist field updaters of updateromlist.py, the .ini read/rewrite loops, reformatcontrols.py
+  and the .lay file analysis of bezelanalysis.py (with and without cached analysis results) are timed. Each benchmark is repeated and the best and median times are saved.
+- Results are saved in a JSON file, and can be compared with the results of a previous run to catch performance regressions.
+- No MAME or Attract-Mode installation is needed, and your own MAME/Attract-Mode files are not used or changed.
+
+Usage:
+
+1) Optionally adjust the size of the synthetic input files:
+"""
+
+romlistgames  = 40000 # Number of games in romlist
+inisections   = 5000  # Number of games in each AM*.ini file
+titlegames    = 2000  # Number of games in AMtitles.txt
+controlsgames = 8000  # Number of games in controls.ini
+bezelgames    = 300   # Number of games with bezel artwork
+layviews      = 40    # Number of views in each .lay file
+
+"""
+2) Optionally adjust the number of repeats of each benchmark, and the slowdown (in % of the best time of
+   the previous run) that is reported as a regression:
+"""
+
+repeats             = 5
+regressionthreshold = 10.0
+
+"""
+3) To run the benchmarks and save the results in microbenchmarks.json, type:
+   ./microbenchmarks.py
+OR to save the results in another file, type:
+   ./microbenchmarks.py {resultsfile}
+OR to compare the results with the results of a previous run, type:
+   ./microbenchmarks.py {resultsfile} {previousresultsfile}
+
+Author: Gordon Lim
+Last Edit: 18 Oct 2026
+"""
+
+import bezelanalysis
+import configsetup
+import inistore
+import json
+import os
+import platform
+import random
+import reformatcontrols
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+import updateromlist
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+words = ['Space', 'Dragon', 'Fighter', 'Street', 'Super', 'Pac', 'Galaxy', 'Ninja', 'Turbo', 'Star', 'Kombat', 'Raider',
+         'Tank', 'Castle', 'Blaster', 'Racer', 'Invaders', 'Hero', 'Quest', 'Force', 'Wars', 'Punch', 'Zone', 'Storm']
+
+# Synthetic input files:
+
+def romname(i):
+
+    return "game{:05d}".format(i)
+
+def createromlist(filename, rng):
+
+    romlistfile = open(filename, 'w')
+    romlistfile.write('#' + ';'.join(configsetup.romlistfields) + '\n')
+
+    for i in range(romlistgames):
+        title = ' '.join(rng.choice(words) for j in range(rng.randint(1, 4)))
+        if (rng.random() < 0.1):
+            title = 'The ' + title
+        if (rng.random() < 0.5):
+            title += ' (World, rev {})'.format(rng.randint(1, 9))
+        if (rng.random() < 0.2):
+            title += ' [bootleg]'
+        cloneof = ''
+        if (i > 0) and (rng.random() < 0.4):
+            cloneof = romname(rng.randint(0, i - 1))
+        fields = [romname(i), title, 'mame', cloneof, str(rng.randint(1978, 2005)), 'Synthetic', 'Shooter',
+                  str(rng.randint(1, 4)), rng.choice(['0', '90', '270']), 'joystick', 'good', '1', 'raster', '', '', '', '']
+        romlistfile.write(';'.join(fields) + '\n')
+
+    romlistfile.close()
+
+    return
+
+def createinifile(filename, rng, keys):
+
+    inifile = open(filename, 'w')
+    for i in sorted(rng.sample(range(romlistgames), inisections)):
+        inifile.write("[{}]\n".format(romname(i)))
+        for key in keys:
+            inifile.write("{}={}\n".format(key, rng.randint(0, 999999)))
+    inifile.close()
+
+    return
+
+def createtitles(filename, rng):
+
+    titlesfile = open(filename, 'w')
+    titlesfile.write("#romname;sortingtitle;seriestitle\n")
+    for i in sorted(rng.sample(range(romlistgames), titlegames)):
+        titlesfile.write("{};{};{}\n".format(romname(i), rng.choice(words), rng.choice(['', 'Part II', 'Turbo'])))
+    titlesfile.close()
+
+    return
+
+def createcontrols(filename, rng):
+
+    controlsfile = open(filename, 'w')
+    controlsfile.write(";;Controls.dat INI file Version=0.141.1\r\n\r\n")
+    for i in range(controlsgames):
+        controlsfile.write("[{}]\r\n".format(romname(i)))
+        controlsfile.write("gamename={}\r\n".format(rng.choice(words)))
+        controlsfile.write("numPlayers={}\r\n".format(rng.randint(1, 4)))
+        for key in ['alternating', 'mirrored', 'tilt', 'cocktail', 'usesService']:
+            controlsfile.write("{}={}\r\n".format(key, rng.randint(0, 1)))
+        controlsfile.write("miscDetails=\r\n")
+        controlsfile.write("P1NumButtons=3\r\n")
+        controlsfile.write("P1Controls=8-way Joystick+joy8way\r\n")
+        for button in range(1, 4):
+            controlsfile.write("P1_BUTTON{}={}\r\n".format(button, rng.choice(words)))
+        controlsfile.write("\r\n")
+    controlsfile.close()
+
+    return
+
+def createlayfile(filename, game, rng):
+
+    # .lay file with many views, of which only the last one is the upright bezel view:
+
+    lines = ['<?xml version="1.0"?>', '<!-- Artwork type: Bezel -->', '<mamelayout version="2">']
+
+    lines += ['\t<element name="bezel">', '\t\t<image file="{}_bezel.png" />'.format(game), '\t</element>']
+    lines += ['\t<element name="backdrop">', '\t\t<image file="{}_backdrop.png" />'.format(game), '\t</element>']
+
+    for view in range(layviews - 1):
+        lines += ['\t<view name="Screen_{}">'.format(view),
+                  '\t\t<screen index="0">',
+                  '\t\t\t<bounds x="{}" y="0" width="{}" height="{}" />'.format(view, rng.randint(200, 400), rng.randint(200, 400)),
+                  '\t\t</screen>',
+                  '\t\t<backdrop element="backdrop">',
+                  '\t\t\t<bounds x="0" y="0" width="640" height="480" />',
+                  '\t\t</backdrop>',
+                  '\t</view>']
+
+    lines += ['\t<view name="Upright_Artwork">',
+              '\t\t<bounds x="0" y="0" width="1920" height="1080" />',
+              '\t\t<screen index="0">',
+              '\t\t\t<bounds x="480" y="60" width="960" height="720" />',
+              '\t\t</screen>',
+              '\t\t<bezel element="bezel">',
+              '\t\t\t<bounds x="0" y="0" width="1920" height="1080" />',
+              '\t\t</bezel>',
+              '\t</view>',
+              '</mamelayout>']
+
+    layfile = open(filename, 'w')
+    layfile.write('\n'.join(lines) + '\n')
+    layfile.close()
+
+    return
+
+def createinputfiles(basedir):
+
+    # Create directory structure of configsetup.py in basedir, with synthetic input files:
+
+    rng = random.Random(0) # Same input files in every run
+
+    directories = {'AMsupportdir' : basedir + "/attractmode_support/",
+                   'MAMEconfigdir': basedir + "/mame/",
+                   'AMconfigdir'  : basedir + "/attract/",
+                   'MAMEexecdir'  : basedir + "/mameexec/",
+                   'AMexecdir'    : basedir + "/attractexec/"}
+
+    for directory in directories.values():
+        os.makedirs(directory)
+
+    os.makedirs(directories['AMsupportdir'] + "data/")
+    os.makedirs(directories['AMconfigdir'] + "romlists/")
+
+    createromlist(directories['AMconfigdir'] + "romlists/mame.txt", rng)
+
+    createinifile(directories['AMsupportdir'] + "data/AMhiscores.ini",   rng, ['score', 'name'])
+    createinifile(directories['AMsupportdir'] + "data/AMbenchmarks.ini", rng, ['speed', 'stars', 'time'])
+    createinifile(directories['AMsupportdir'] + "data/AMbezels.ini",     rng, ['screen_width', 'screen_height'])
+    createinifile(directories['AMsupportdir'] + "data/AMcontrols.ini",   rng, ['P1NumButtons', 'P1Controls'])
+
+    createtitles(directories['AMsupportdir'] + "data/AMtitles.txt", rng)
+    createcontrols(directories['AMsupportdir'] + "data/controls.ini", rng)
+
+    # Bezel artwork:
+
+    artworkdir = basedir + "/artwork/"
+    os.makedirs(basedir + "/AMbezels/")
+
+    for i in sorted(rng.sample(range(romlistgames), bezelgames)):
+        os.makedirs(artworkdir + romname(i))
+        createlayfile(artworkdir + romname(i) + "/default.lay", romname(i), rng)
+        open(artworkdir + romname(i) + "/" + romname(i) + "_bezel.png", 'w').close()
+
+    bezeldirectoriesfile = open(directories['AMsupportdir'] + "data/bezeldirectories.txt", 'w')
+    bezeldirectoriesfile.write("#Directories with bezel artwork\n")
+    bezeldirectoriesfile.write(artworkdir + "\n")
+    bezeldirectoriesfile.close()
+
+    # Point configsetup.py and bezelanalysis.py to synthetic input files:
+
+    configsetup.myAMsupportdir  = directories['AMsupportdir']
+    configsetup.myMAMEconfigdir = directories['MAMEconfigdir']
+    configsetup.myAMconfigdir   = directories['AMconfigdir']
+    configsetup.myMAMEexecdir   = directories['MAMEexecdir']
+    configsetup.myAMexecdir     = directories['AMexecdir']
+
+    bezelanalysis.myAMbezeldir = basedir + "/AMbezels/"
+
+    configsetup.init()
+
+    return
+
+# Benchmarks:
+
+def runquietly(function, userinput = ''):
+
+    # Run function with printed output discarded, and with userinput as answers to raw_input():
+
+    stdout, stdin = sys.stdout, sys.stdin
+    sys.stdout = open(os.devnull, 'w')
+    sys.stdin = StringIO(userinput)
+    try:
+        function()
+    finally:
+        sys.stdout.close()
+        sys.stdout, sys.stdin = stdout, stdin
+
+    return
+
+def createbenchmarks():
+
+    # Return list of (name, function, setup) tuples, where setup (or None) is called before each repeat of function, outside the timed region:
+
+    datadir = configsetup.AMsupportdir + "data/"
+
+    games, header = configsetup.create_list_of_games_from_romlist()
+
+    lines = [game.line() for game in games]
+
+    def resetgames():
+        # The romlist field updaters change games in place (e.g. a series title is prepended to AltTitle),
+        # so every repeat starts from fresh copies of the synthetic games:
+        games[:] = [configsetup.RomlistGame(line) for line in lines]
+
+    gamesets = [configsetup.create_set_of_games_from_ini(datadir + filename)
+                for filename in ['AMhiscores.ini', 'AMbenchmarks.ini', 'AMbezels.ini', 'AMcontrols.ini']]
+
+    titles = updateromlist.create_dict_of_titles(datadir + "AMtitles.txt", datadir + "AMexceptionaltitles.txt")
+
+    def create_list_of_games_from_romlist():
+        configsetup.create_list_of_games_from_romlist()
+
+    def update_AltTitle_field():
+        for game in games:
+            updateromlist.update_AltTitle_field(game)
+
+    def update_Extra_field():
+        for game in games:
+            updateromlist.update_Extra_field(game, gamesets)
+
+    def update_Buttons_and_AltTitle_fields():
+        for game in games:
+            title = titles.get(game.Name, {})
+            updateromlist.update_Buttons_and_AltTitle_fields(game, title)
+            updateromlist.update_exceptional_games(game, title)
+
+    def write_romlist():
+        romlistwriter = configsetup.RomlistWriter(configsetup.AMconfigdir + "romlists/mame_benchmark.txt", header)
+        for game in games:
+            romlistwriter.write(game)
+        romlistwriter.close()
+
+    def create_set_of_games_from_ini():
+        configsetup.create_set_of_games_from_ini(datadir + "AMhiscores.ini")
+
+    def inistore_batch():
+        AMbenchmarks = inistore.INIStore(datadir + "AMbenchmarks.ini")
+        for section in list(AMbenchmarks.sections):
+            AMbenchmarks.upsert(section, [('speed', '100.00'), ('stars', 5), ('time', 60)])
+        AMbenchmarks.modified = True # Rewrite even if nothing changed
+        AMbenchmarks.flush()
+
+    def inistore_pergame():
+        for section in sorted(gamesets[0])[:100]: # Read, update and write AMhiscores.ini per game, as after playing a single game
+            AMhiscores = inistore.INIStore(datadir + "AMhiscores.ini")
+            AMhiscores.upsert(section, [('score', 100), ('name', 'ABC')])
+            AMhiscores.flush()
+
+    def reformatcontrols_main():
+        runquietly(reformatcontrols.main)
+
+    def bezelanalysis_main():
+        shutil.rmtree(os.path.expandvars(bezelanalysis.myAMbezeldir) + "bezelcache/", True) # Analyze all .lay files again
+        runquietly(bezelanalysis.main, 'n\nn\nn\n') # Keep bezels, create symlinks, keep generic bezels
+
+    def bezelanalysis_main_cached():
+        runquietly(bezelanalysis.main, 'n\nn\nn\n') # Use analysis results cached by the previous run
+
+    return [('configsetup.create_list_of_games_from_romlist',    create_list_of_games_from_romlist,  None),
+            ('configsetup.RomlistWriter',                        write_romlist,                      resetgames),
+            ('configsetup.create_set_of_games_from_ini',         create_set_of_games_from_ini,       None),
+            ('updateromlist.update_AltTitle_field',              update_AltTitle_field,              resetgames),
+            ('updateromlist.update_Extra_field',                 update_Extra_field,                 resetgames),
+            ('updateromlist.update_Buttons_and_AltTitle_fields', update_Buttons_and_AltTitle_fields, resetgames),
+            ('inistore.INIStore (batch rewrite)',                inistore_batch,                     None),
+            ('inistore.INIStore (100 single-game rewrites)',    inistore_pergame,                   None),
+            ('reformatcontrols.main',                            reformatcontrols_main,              None),
+            ('bezelanalysis.main',                               bezelanalysis_main,                 None),
+            ('bezelanalysis.main (cached analysis)',             bezelanalysis_main_cached,          None)]
+
+def runbenchmark(function, setup = None):
+
+    times = []
+
+    for i in range(repeats):
+        if setup is not None:
+            setup()
+        starttime = timeit.default_timer()
+        function()
+        times.append(timeit.default_timer() - starttime)
+
+    times.sort()
+
+    return {'best': times[0], 'median': times[len(times)//2], 'repeats': repeats}
+
+# Results:
+
+def readresults(filename):
+
+    resultsfile = open(filename, 'r')
+    results = json.load(resultsfile)
+    resultsfile.close()
+
+    return results
+
+def compareresults(results, previousresults):
+
+    # Print comparison of best times, return number of regressions:
+
+    regressions = 0
+
+    print("==> Comparison with previous run ({}):".format(time.strftime('%d %b %Y %H:%M', time.localtime(previousresults['timestamp']))))
+
+    for name, result in sorted(results['benchmarks'].items()):
+        previousresult = previousresults['benchmarks'].get(name)
+        if (previousresult is None) or ('best' not in previousresult) or ('best' not in result):
+            print("--> {:<52} not compared".format(name))
+            continue
+        change = 100*(result['best'] - previousresult['best'])/previousresult['best']
+        flag = ''
+        if (change > regressionthreshold):
+            flag = '  <= REGRESSION'
+            regressions += 1
+        print("--> {:<52} {:9.4f} s -> {:9.4f} s ({:+7.1f}%){}".format(name, previousresult['best'], result['best'], change, flag))
+
+    print("==> {} regression(s)".format(regressions))
+
+    return regressions
+
+def main():
+
+    # Check input:
+
+    if (len(sys.argv) > 3):
+        print("Please provide a results filename and optionally a previous results filename as input arguments")
+        return 1
+
+    resultsfilename = 'microbenchmarks.json'
+    if (len(sys.argv) > 1):
+        resultsfilename = sys.argv[1]
+
+    previousresults = None
+    if (len(sys.argv) > 2):
+        previousresults = readresults(sys.argv[2])
+
+    # Create synthetic input files and run benchmarks:
+
+    basedir = tempfile.mkdtemp(prefix = 'microbenchmarks')
+
+    results = {'timestamp' : time.time(),
+               'python'    : platform.python_version(),
+               'platform'  : platform.platform(),
+               'parameters': {'romlistgames': romlistgames, 'inisections': inisections, 'titlegames': titlegames,
+                              'controlsgames': controlsgames, 'bezelgames': bezelgames, 'layviews': layviews},
+               'benchmarks': {}}
+
+    try:
+        print("Creating synthetic input files in {}...".format(basedir))
+        createinputfiles(basedir)
+
+        for name, function, setup in createbenchmarks():
+            try:
+                result = runbenchmark(function, setup)
+                print("--> {:<52} best = {:9.4f} s, median = {:9.4f} s".format(name, result['best'], result['median']))
+            except Exception as error:
+                result = {'error': repr(error)}
+                print("--> {:<52} FAILED ({})".format(name, repr(error)))
+            results['benchmarks'][name] = result
+    finally:
+        shutil.rmtree(basedir, ignore_errors = True)
+
+    # Save and compare results:
+
+    resultsfile = open(resultsfilename, 'w')
+    json.dump(results, resultsfile, indent = 1, sort_keys = True)
+    resultsfile.close()
+
+    print("==> Results saved in {}".format(resultsfilename))
+
+    if previousresults is not None:
+        if (previousresults.get('parameters') != results['parameters']):
+            print("Note: previous run used different input file sizes")
+        if (compareresults(results, previousresults) > 0):
+            return 2
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+#!/usr/bin/python -tt
+"""
+MAME support module to process a list of jobs (e.g. games) in a multi-stage pipeline:
+- Each stage is a function that takes a job and returns the (updated) job. Each stage has its own pool of worker threads,
+  so that I/O-bound stages (e.g. reading artwork, writing images) and CPU-bound stages of different jobs overlap.
+  Note: Only work that releases the GIL (file I/O, zlib, Pillow, subprocesses) runs on several cores at once. Stages that run
+  Python code (e.g. parsing .lay files with expat callbacks) use one core at a time, whatever the number of workers.
+- Stages are connected by bounded queues, and the number of jobs in the pipeline is limited, so that memory use does not grow
+  with the number of jobs.
+- Results are returned in input order, independent of the order in which the jobs finish.
+- If a stage raises an exception, the job skips the remaining stages and a StageError with the traceback of the exception in the
+  worker thread is raised when its result is returned (with one worker, jobs are processed without threads and the exception
+  itself is raised).
+- Worker threads print to the same output as the thread that runs the pipeline, also if sys.stdout collects the output of each thread
+  separately (see updateall.StageOutput).
+
+Usage:
+
+   for job in pipeline.run(jobs, [stage1, stage2, stage3], workers):
+       ...
+
+Author: Gordon Lim
+Last Edit: 18 Oct 2026
+"""
+
+import sys
+import threading
+import traceback
+
+try:
+    import queue           # Python 3
+except ImportError:
+    import Queue as queue  # Python 2
+
+finished = object() # Sentinel that tells a worker that there are no more jobs
+
+class StageError(Exception):
+
+    # Exception raised by a stage. The message contains the traceback of the worker thread, which a re-raised
+    # exception would lose in Python 2:
+
+    pass
+
+class Stage(object):
+
+    def __init__(self, function, workers, inputqueue, outputqueue, nextworkers):
+
+        self.function    = function
+        self.inputqueue  = inputqueue
+        self.outputqueue = outputqueue
+        self.nextworkers = nextworkers # Number of workers of the next stage (1 for the collector)
+        self.running     = workers
+        self.lock        = threading.Lock()
+
+    def work(self):
+
+        while True:
+            item = self.inputqueue.get()
+            if item is finished:
+                break
+            index, job, error = item
+            if error is None:
+                try:
+                    job = self.function(job)
+                except Exception:
+                    error = traceback.format_exc()
+            self.outputqueue.put((index, job, error))
+
+        # The last worker of this stage tells the workers of the next stage to finish:
+
+        with self.lock:
+            self.running -= 1
+            if (self.running == 0):
+                for i in range(self.nextworkers):
+                    self.outputqueue.put(finished)
+
+        return
+
+def feed(jobs, inputqueue, inflight, workers):
+
+    for index, job in enumerate(jobs):
+        inflight.acquire()
+        inputqueue.put((index, job, None))
+
+    for i in range(workers):
+        inputqueue.put(finished)
+
+    return
+
+def runthread(initializer, target, args):
+
+    if initializer is not None:
+        initializer()
+
+    return target(*args)
+
+def startthread(target, args):
+
+    # If sys.stdout collects the output of each thread separately, the new thread uses the output of the current thread:
+
+    inherit = getattr(sys.stdout, 'inherit', None)
+    initializer = inherit() if (inherit is not None) else None
+
+    thread = threading.Thread(target = runthread, args = (initializer, target, args))
+    thread.daemon = True
+    thread.start()
+
+    return thread
+
+def run(jobs, stages, workers, queuesize = None):
+
+    # Return generator of processed jobs in input order:
+
+    if (workers <= 1): # Process jobs one after another, without threads
+        for job in jobs:
+            for function in stages:
+                job = function(job)
+            yield job
+        return
+
+    queuesize = queuesize or 2*workers
+
+    queues = [queue.Queue(queuesize) for i in range(len(stages) + 1)]
+    inflight = threading.Semaphore(queuesize*(len(stages) + 1)) # Maximum number of jobs in the pipeline (including finished jobs waiting for their turn)
+
+    for stagenumber, function in enumerate(stages):
+        nextworkers = workers if (stagenumber < len(stages) - 1) else 1
+        stage = Stage(function, workers, queues[stagenumber], queues[stagenumber + 1], nextworkers)
+        for i in range(workers):
+            startthread(stage.work, ())
+
+    startthread(feed, (jobs, queues[0], inflight, workers))
+
+    # Collect processed jobs and return them in input order:
+
+    waiting = {}
+    nextindex = 0
+
+    while True:
+        try:
+            item = queues[-1].get(True, 1) # Get with timeout to keep Ctrl-C working
+        except queue.Empty:
+            continue
+        if item is finished:
+            break
+        waiting[item[0]] = item
+        while nextindex in waiting:
+            index, job, error = waiting.pop(nextindex)
+            nextindex += 1
+            inflight.release()
+            if error is not None:
+                raise StageError("Exception in pipeline stage of job {}:\n{}".format(index, error.rstrip('\n')))
+            yield job
+
+    return
@@ -10,13 +10,20 @@ Usage:
 
 1) Change configsetup.py according to your system setup.
 2) Download latest controls.ini file and replace the controls.ini file in the data folder, or use the provided version of this file (v0.141.1)
-3) In a terminal, type: ./reformatcontrols.py
+3) Optionally choose whether clones in your Attract-Mode MAME romlist that are missing from controls.ini inherit the controls of their parent game:
+'''
+
+inheritclonecontrols = False
+
+'''
+4) In a terminal, type: ./reformatcontrols.py
 
 Author: Gordon Lim
-Last Edit: 1 Feb 2018 
+Last Edit: 18 Oct 2026 
 '''
 
 import configsetup
+import instrumentation
 import os
 import re
 
@@ -24,8 +31,14 @@ def main():
 
     # Setup configuration:
     
+    instrumentation.init('reformatcontrols')
+
     configsetup.init()
 
+    return reformat()
+
+def reformat():
+
     filename = configsetup.AMsupportdir + 'data/controls.ini'
 
     if not os.path.isfile(filename):
@@ -34,32 +47,62 @@ def main():
 
     # Reformat:
     
-    file = open(filename, 'r')
+    with instrumentation.stage('read controls.ini'):
 
-    header = file.readline() # skip header
+        file = open(filename, 'r')
+
+        header = file.readline() # skip header
     
-    goodlines = []
+        goodlines = []
+
+        for line in file.readlines():
+            matchobject = re.search('\[.+\]\r', line)
+            if matchobject:
+                goodlines.append(line)
+            matchobject = re.search('.+=.+\r', line)
+            if matchobject:
+                goodlines.append(line)
 
-    for line in file.readlines():
-        matchobject = re.search('\[.+\]\r', line)
-        if matchobject:
-            goodlines.append(line)
-        matchobject = re.search('.+=.+\r', line)
-        if matchobject:
-            goodlines.append(line)
+        file.close()
 
-    file.close()
+        instrumentation.fileread(filename)
+
+    # Clones without controls data inherit the controls data of their parent game:
+
+    if inheritclonecontrols:
+
+        with instrumentation.stage('inherit clone controls'):
+
+            sections = {}
+            section = None
+
+            for goodline in goodlines:
+                if re.search('\[.+\]\r', goodline):
+                    section = goodline.strip()[1:-1]
+                    sections[section] = []
+                elif section is not None:
+                    sections[section].append(goodline)
+
+            cloneindex = configsetup.CloneIndex(configsetup.read_romlist())
+
+            for clone, parent in cloneindex.inherit(sections):
+                goodlines.append("[{}]\r\n".format(clone))
+                goodlines.extend(sections[parent])
 
     # Save:
     
     filename = configsetup.AMsupportdir + 'data/AMcontrols.ini'
     
-    file = open(filename, 'w')
+    with instrumentation.stage('write AMcontrols.ini'):
 
-    for goodline in goodlines:
-        file.write(goodline)
+        file = open(filename, 'w')
+
+        for goodline in goodlines:
+            file.write(goodline)
         
-    file.close()
+        file.close()
+
+        instrumentation.filewritten(filename)
     
     return 0
 
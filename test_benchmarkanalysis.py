@@ -0,0 +1,52 @@
+#!/usr/bin/python -tt
+"""
+Tests of the star rating of benchmarkanalysis.py at the default star levels (75, 90, 95, 97.5).
+
+Usage: In a terminal, type: python -m unittest test_benchmarkanalysis
+
+Author: Gordon Lim
+Last Edit: 18 Oct 2026
+"""
+
+import benchmarkanalysis
+import unittest
+
+class StarRatingTest(unittest.TestCase):
+
+    # (speed, stars): 0%, just below and at each star level:
+
+    cases = [(0, 1), (74.99, 1), (75, 2), (89.99, 2), (90, 3), (95, 4), (97.49, 4), (97.5, 5), (250, 5)]
+
+    def setUp(self):
+
+        self.starlevels = benchmarkanalysis.starlevels
+        benchmarkanalysis.starlevels = [75, 90, 95, 97.5]
+
+    def tearDown(self):
+
+        benchmarkanalysis.starlevels = self.starlevels
+
+    def test_calculatestarrating(self):
+
+        for speed, stars in self.cases:
+            self.assertEqual(benchmarkanalysis.calculatestarrating(speed), stars, "speed {}%".format(speed))
+
+    def test_calculatestarratings(self):
+
+        # Batch rating of 'all' mode (NumPy if it is installed) gives the same ratings:
+
+        speeds = [speed for speed, stars in self.cases]
+
+        self.assertEqual(benchmarkanalysis.calculatestarratings(speeds), [stars for speed, stars in self.cases])
+
+    def test_calculatestarratings_python(self):
+
+        numpy = benchmarkanalysis.numpy
+        benchmarkanalysis.numpy = None
+        try:
+            self.test_calculatestarratings()
+        finally:
+            benchmarkanalysis.numpy = numpy
+
+if __name__ == '__main__':
+    unittest.main()
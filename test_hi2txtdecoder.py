@@ -0,0 +1,158 @@
+#!/usr/bin/python -tt
+"""
+Tests of hi2txtdecoder.py: small hi2txt descriptors with binary hiscore data, and the RANK|SCORE|NAME table text that
+hi2txt.jar returns for them (with "-keep-field RANK -keep-field SCORE -keep-field NAME").
+
+Usage: In a terminal, type: python -m unittest test_hi2txtdecoder
+
+Author: Gordon Lim
+Last Edit: 18 Oct 2026
+"""
+
+import hi2txtdecoder
+import os
+import shutil
+import tempfile
+import unittest
+
+class DecoderTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    def decode(self, descriptor, data, nvramfile = None):
+
+        # Save binary data as {game}.hi file, or as file in nvram/{game}/, and return decoded table as hi2txt.jar text:
+
+        if nvramfile is None:
+            MAMEbinaryhiscorefile = os.path.join(self.directory, 'game.hi')
+            filename = MAMEbinaryhiscorefile
+        else:
+            MAMEbinaryhiscorefile = os.path.join(self.directory, 'game')
+            os.mkdir(MAMEbinaryhiscorefile)
+            filename = os.path.join(MAMEbinaryhiscorefile, nvramfile)
+
+        binaryfile = open(filename, 'wb')
+        binaryfile.write(bytearray(data))
+        binaryfile.close()
+
+        table = hi2txtdecoder.decode(descriptor, MAMEbinaryhiscorefile)
+
+        return ''.join("|".join(row) + "\n" for row in table)
+
+    def test_bcd_ascii(self):
+
+        descriptor = """<hi2txt>
+            <structure>
+                <loop count="3" index="rank">
+                    <elt id="score" size="3" decoder="BCD"/>
+                    <elt id="name" size="3" decoder="ASCII"/>
+                </loop>
+            </structure>
+            <output>
+                <table>
+                    <field id="RANK" src="rank"/>
+                    <field id="SCORE" src="score"/>
+                    <field id="NAME" src="name"/>
+                </table>
+            </output>
+        </hi2txt>"""
+
+        data = [0x01, 0x23, 0x45, 0x41, 0x42, 0x43,
+                0x00, 0x50, 0x00, 0x44, 0x45, 0x46,
+                0x00, 0x00, 0x00, 0x47, 0x48, 0x00]
+
+        self.assertEqual(self.decode(descriptor, data), "RANK|SCORE|NAME\n"
+                                                        "1|12345|ABC\n"
+                                                        "2|5000|DEF\n"
+                                                        "3|0|GH\n")
+
+    def test_little_endian_charset_nvram(self):
+
+        descriptor = """<hi2txt>
+            <charset id="letters">
+                <char src="0x00" dst=" "/>
+                <char src="0x01" dst="A"/>
+                <char src="0x02" dst="B"/>
+                <char src="0x1A" dst="Z"/>
+            </charset>
+            <structure file="hiscore">
+                <loop count="2" index="rank">
+                    <elt id="score" size="3" decoder="LITTLE_ENDIAN"/>
+                    <elt id="name" size="3" decoder="CHAR" charset="letters"/>
+                </loop>
+            </structure>
+            <output>
+                <table>
+                    <field id="RANK" src="rank"/>
+                    <field id="SCORE" src="score"/>
+                    <field id="NAME" src="name"/>
+                </table>
+            </output>
+        </hi2txt>"""
+
+        data = [0x40, 0xE2, 0x01, 0x01, 0x02, 0x1A,
+                0x10, 0x27, 0x00, 0x1A, 0x00, 0x03]
+
+        self.assertEqual(self.decode(descriptor, data, 'hiscore'), "RANK|SCORE|NAME\n"
+                                                                    "1|123456|ABZ\n"
+                                                                    "2|10000|Z ?\n")
+
+    def test_big_endian_skipped_and_dropped_fields(self):
+
+        # Elements without id are skipped, and fields other than RANK, SCORE and NAME are not kept:
+
+        descriptor = """<hi2txt>
+            <structure>
+                <elt size="2"/>
+                <loop count="2" index="rank">
+                    <elt id="score" size="2" decoder="BIG_ENDIAN"/>
+                    <elt id="level" size="1" decoder="BIG_ENDIAN"/>
+                    <elt id="name" size="2" decoder="ASCII"/>
+                </loop>
+            </structure>
+            <output>
+                <table>
+                    <field id="RANK" src="rank"/>
+                    <field id="SCORE" src="score"/>
+                    <field id="LEVEL" src="level"/>
+                    <field id="NAME" src="name"/>
+                </table>
+            </output>
+        </hi2txt>"""
+
+        data = [0xFF, 0xFF,
+                0x12, 0x34, 0x05, 0x4A, 0x4B,
+                0x00, 0x64, 0x01, 0x4C, 0x4D]
+
+        self.assertEqual(self.decode(descriptor, data), "RANK|SCORE|NAME\n"
+                                                        "1|4660|JK\n"
+                                                        "2|100|LM\n")
+
+    def test_unsupported_descriptor(self):
+
+        # Descriptors with other decoders are left to hi2txt.jar:
+
+        descriptor = """<hi2txt>
+            <structure>
+                <loop count="1" index="rank">
+                    <elt id="score" size="2" decoder="REVERSED_BCD"/>
+                </loop>
+            </structure>
+            <output>
+                <table>
+                    <field id="RANK" src="rank"/>
+                    <field id="SCORE" src="score"/>
+                </table>
+            </output>
+        </hi2txt>"""
+
+        self.assertRaises(hi2txtdecoder.UnsupportedDescriptor, self.decode, descriptor, [0x00, 0x01])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+#!/usr/bin/python -tt
+"""
+MAME support program to update all Attract-Mode MAME support data in one run, without any user input (e.g. in a nightly cron job):
+- The AM romlist is parsed once and shared in memory by all stages (see configsetup.share_romlist).
+- The independent stages run concurrently, each in its own thread:
+  hiscores (hiscoreanalysis.py all), benchmarks (benchmarkanalysis.py all), bezels (bezelanalysis.py) and controls (reformatcontrols.py).
+- The output of each stage is collected and printed per stage, in this fixed order.
+- When all stages have finished, the romlist is updated with the new .ini files (updateromlist.py). Only the games of which the input data
+  changed since the last run are updated, unless --full is given or the romlist backup (mame_original.txt) does not exist.
+- All answers that the separate programs ask for are given as options instead.
+
+Usage:
+
+1) Change configsetup.py according to your system setup, and set up each program as described in its own usage notes.
+2) In a terminal, type: ./updateall.py [options]
+   Options:
+   --build-romlist           Let Attract-Mode create a new MAME romlist first (see updateromlist.py)
+   --full                    Update all games in the romlist, instead of only the games of which the input data changed
+   --clear-hiscores          Remove all ASCII hiscore files first (see hiscoreanalysis.py)
+   --clear-bezels            Remove all .png files in the AM bezel directory first (see bezelanalysis.py)
+   --rescale [RESOLUTION]    Create low-resolution bezels with a maximum width or height of RESOLUTION pixels (default: 800 pixels),
+                             instead of symbolic links to the original bezel images
+   --exclude-generic-bezels  Exclude generic bezels
+   --clear-caches            Remove all caches and manifests first (bezel cache, hiscore manifest, hi2txt.zip index, MAME version cache
+                             and romlist manifest), so that all data are analyzed again
+   --skip STAGE              Skip a stage (hiscores, benchmarks, bezels or controls), can be given more than once
+   --trace                   Save a trace file (see instrumentation.py)
+   e.g.: ./updateall.py --rescale 800 --exclude-generic-bezels
+   The exit code is 0 if all stages succeeded, and 1 otherwise.
+
+Author: Gordon Lim
+Last Edit: 18 Oct 2026
+"""
+
+import argparse
+import benchmarkanalysis
+import bezelanalysis
+import configsetup
+import hiscoreanalysis
+import instrumentation
+import os
+import reformatcontrols
+import shutil
+import sys
+import threading
+import traceback
+import updateromlist
+
+stagenames = ['hiscores', 'benchmarks', 'bezels', 'controls']
+
+class StageOutput(object):
+
+    # Replacement of sys.stdout that collects the printed output of each stage thread in its own buffer. Worker threads started by a stage
+    # (see pipeline.startthread) print to the buffer of that stage, output of other threads is written to stdout directly:
+
+    def __init__(self, stdout):
+
+        self.stdout = stdout
+        self.threadstate = threading.local()
+
+    def write(self, text):
+
+        buffer = getattr(self.threadstate, 'buffer', None)
+
+        if buffer is None:
+            self.stdout.write(text)
+        else:
+            buffer.append(text)
+
+    def flush(self):
+
+        self.stdout.flush()
+
+    def inherit(self):
+
+        # Return function that lets a worker thread print to the buffer of the current thread (call it in the worker thread):
+
+        buffer = getattr(self.threadstate, 'buffer', None)
+
+        def initializer():
+            self.threadstate.buffer = buffer
+
+        return initializer
+
+class StageThread(threading.Thread):
+
+    def __init__(self, name, function, output):
+
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.stagename = name
+        self.function = function
+        self.output = output
+        self.buffer = []
+        self.returncode = None
+
+    def run(self):
+
+        self.output.threadstate.buffer = self.buffer
+
+        try:
+            with instrumentation.stage(self.stagename, 'tool'):
+                self.returncode = self.function()
+        except Exception:
+            self.buffer.append(traceback.format_exc())
+            self.returncode = 1
+
+        return
+
+def parsearguments():
+
+    parser = argparse.ArgumentParser(description = "Update all Attract-Mode MAME support data in one run, without any user input.")
+    parser.add_argument('--build-romlist', action = 'store_true', help = "let Attract-Mode create a new MAME romlist first")
+    parser.add_argument('--full', action = 'store_true', help = "update all games in the romlist")
+    parser.add_argument('--clear-hiscores', action = 'store_true', help = "remove all ASCII hiscore files first")
+    parser.add_argument('--clear-bezels', action = 'store_true', help = "remove all .png files in the AM bezel directory first")
+    parser.add_argument('--rescale', type = int, nargs = '?', const = 800, default = None, metavar = 'RESOLUTION',
+                        help = "create low-resolution bezels (default resolution: 800 pixels)")
+    parser.add_argument('--exclude-generic-bezels', action = 'store_true', help = "exclude generic bezels")
+    parser.add_argument('--clear-caches', action = 'store_true', help = "remove all caches and manifests first")
+    parser.add_argument('--skip', action = 'append', default = [], choices = stagenames, metavar = 'STAGE',
+                        help = "skip a stage ({})".format(', '.join(stagenames)))
+
+    arguments = parser.parse_args()
+
+    if (arguments.rescale is not None) and ((arguments.rescale <= 0) or (arguments.rescale > 2000)):
+        parser.error("RESOLUTION must be between 1 and 2000 pixels")
+
+    return arguments
+
+def clearcaches():
+
+    # Remove caches and manifests of all stages:
+
+    AMromlist, AMromlist_original, AMromlist_manifest = updateromlist.romlistfilenames()
+
+    for filename in [configsetup.MAMEconfigdir + "hi2txt/hi2txt_zip_index.json",
+                     configsetup.MAMEconfigdir + "hiscores/hiscores_manifest.json",
+                     configsetup.MAMEconfigdir + "benchmarks/mameversion.json",
+                     AMromlist_manifest]:
+        if os.path.isfile(filename):
+            os.remove(filename)
+
+    shutil.rmtree(os.path.expandvars(bezelanalysis.myAMbezeldir) + "bezelcache/", True)
+
+    return
+
+def yesno(flag):
+
+    return 'y' if flag else 'n'
+
+def main():
+
+    # Setup configuration:
+
+    instrumentation.init('updateall')
+
+    configsetup.init()
+
+    arguments = parsearguments()
+
+    if arguments.clear_caches:
+        print("Removing caches...")
+        clearcaches()
+
+    if arguments.build_romlist:
+        updateromlist.buildromlist()
+
+    # Parse AM romlist once for all stages:
+
+    AMromlist, AMromlist_original, AMromlist_manifest = updateromlist.romlistfilenames()
+
+    if not os.path.isfile(AMromlist):
+        print("{} does not exist - EXIT".format(AMromlist))
+        return 1
+
+    with instrumentation.stage('read romlist'):
+        configsetup.share_romlist()
+
+    # Run independent stages concurrently, and print their output in a fixed order:
+
+    rescale = yesno(arguments.rescale is not None)
+
+    functions = {'hiscores'  : lambda: hiscoreanalysis.analyze('all', yesno(arguments.clear_hiscores)),
+                 'benchmarks': lambda: benchmarkanalysis.analyze('all'),
+                 'bezels'    : lambda: bezelanalysis.analyze(yesno(arguments.clear_bezels), rescale, arguments.rescale or 0,
+                                                             yesno(arguments.exclude_generic_bezels)),
+                 'controls'  : reformatcontrols.reformat}
+
+    output = StageOutput(sys.stdout)
+
+    threads = [StageThread(name, functions[name], output) for name in stagenames if name not in arguments.skip]
+
+    sys.stdout = output
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(1) # Join with timeout to keep Ctrl-C working
+            output.stdout.write("==> {}:\n".format(thread.stagename))
+            output.stdout.write(''.join(thread.buffer))
+            output.stdout.flush()
+    finally:
+        sys.stdout = output.stdout
+        configsetup.unshare_romlist()
+
+    # Update romlist with the new .ini files:
+
+    print("==> romlist:")
+
+    incremental = (not arguments.full) and os.path.isfile(AMromlist_original)
+
+    with instrumentation.stage('romlist', 'tool'):
+        returncode = updateromlist.update(incremental)
+
+    # Summary:
+
+    returncodes = [(thread.stagename, thread.returncode) for thread in threads] + [('romlist', returncode)]
+
+    for name, stagereturncode in returncodes:
+        print("--> Return code of {} = {}".format(name, stagereturncode))
+
+    failed = [name for name, stagereturncode in returncodes if (stagereturncode != 0)]
+
+    if (len(failed) > 0):
+        print("==> FAILED: {}".format(', '.join(failed)))
+        return 1
+
+    print("==> All stages finished => SUCCESS")
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,6 +8,7 @@ Python program to update the Attract-Mode MAME romlist with additional game data
 Options:
 
 - AMtitles.txt: An example file is provided. Update AMtitles.txt in a text editor if you want to change the order of specific games in Attract-Mode (e.g. if you prefer umk3 to appear between mk3 and mk4). You can also explicitly add a display title tag to games that are part of a series (e.g. starwars, esb and jedi as part of the same 'Star Wars' series).
+- AMexceptionaltitles.txt: Title, display title and sorting title overrides for specific games whose romlist title is anomalous (e.g. bm1stmix, garou).
 - AMhiscores.ini generated by hiscoreanalysis.py
 - AMbenchmarks.ini generated by benchmarkanalysis.py
 - AMbezels.ini generated by bezelanalysis.py
@@ -22,21 +23,26 @@ Usage:
 4) In a terminal, cd to your Attract-Mode romlist directory and type: 
    ./updateromlist.py
 5) Type y/n if you want Attract-Mode to create a new romlist first (y), or process your old romlist (n).
+OR to only update the games for which the romlist backup (mame_original.txt), AMtitles.txt, AMexceptionaltitles.txt
+   or one of the .ini files changed since the last run, without any user input (e.g. in a cron job), type:
+   ./updateromlist.py incremental
 
 Author: Gordon Lim
-Last Edit: 1 Feb 2018 
+Last Edit: 18 Oct 2026 
 """
 
 import configsetup
-import re
-import subprocess
+import hashlib
+import instrumentation
 import os
+import subprocess
+import sys
 
 # Update 'AltTitle' field in romlist with new display title:
 
 def update_AltTitle_field(game):
 
-    alttitle = game[1]
+    alttitle = game.Title
     
     newalttitle = ''
 
@@ -57,84 +63,78 @@ def update_AltTitle_field(game):
         elif skip1c == 0 and skip2c == 0:
             newalttitle += i
 
-    game[14] = newalttitle.rstrip() # game[14] = AltTitle
+    game.AltTitle = newalttitle.rstrip()
             
     return
 
 # Update 'Extra' field in romlist with formatted string indicating
-# if hiscore, benchmark, bezel and controls data is available:
-
-def gameinfile(romname, filename):
-
-    file = open(filename, 'r')
-    text = file.read()
-    file.close()
+# if hiscore, benchmark, bezel and controls data is available
+# (gamesets contains the set of games in each .ini file, see configsetup.create_set_of_games_from_ini):
 
-    matchobject = re.search('\[{}\]'.format(romname), text)
-
-    if matchobject:
-        return 1
-    else:
-        return 0
-
-def update_Extra_field(game, files_available):
-    
-    romname = game[0]
-
-    tags = [0, 0, 0, 0]
+def update_Extra_field(game, gamesets):
     
-    if (files_available[0]):
-        tags[0] = gameinfile(romname, filename_hiscores)
-
-    if (files_available[1]):
-        tags[1] = gameinfile(romname, filename_benchmarks)
-
-    if (files_available[2]):
-        tags[2] = gameinfile(romname, filename_bezels)
+    romname = game.Name
 
-    if (files_available[3]):
-        tags[3] = gameinfile(romname, filename_controls)
+    tags = [int(romname in gameset) for gameset in gamesets]
 
     encodedtag = ["Hi" + str(tags[0]), \
                   "Bm" + str(tags[1]), \
                   "Be" + str(tags[2]), \
                   "Co" + str(tags[3])]
     
-    game[15] = "-".join(encodedtag)
+    game.Extra = "-".join(encodedtag)
     
     return
 
-# Update 'Buttons' field in romlist with new sorting title,
-# and update 'AltTitle' field with "series" display title (if available):
-
-def update_Buttons_and_AltTitle_fields(game):
-    
-    sortingtitle = game[1]
-    displaytitle = game[14]
+# Read title overrides from AMtitles.txt and AMexceptionaltitles.txt once,
+# into a lookup table keyed by romname:
 
-    # Read titles data from file:
+def create_dict_of_titles(filename_titles, filename_exceptionaltitles):
 
-    file_titles = open(filename_titles, 'r')
-    file_titles.readline() # skip first line
+    titles = {}
 
-    titles = []
+    # AMtitles.txt lines: romname;sortingtitle;seriestitle
+    
+    if os.path.isfile(filename_titles):
+        file_titles = open(filename_titles, 'r')
+        for line in file_titles:
+            fields = line.rstrip('\r\n').split(";")
+            if (line[0:1] == '#') or (len(fields) < 3):
+                continue
+            titles.setdefault(fields[0], {})
+            titles[fields[0]]['sortingtitle'] = fields[1]
+            titles[fields[0]]['seriestitle']  = fields[2]
+        file_titles.close()
+
+    # AMexceptionaltitles.txt lines: romname;title;alttitle;sortingtitle
+    
+    if os.path.isfile(filename_exceptionaltitles):
+        file_exceptionaltitles = open(filename_exceptionaltitles, 'r')
+        for line in file_exceptionaltitles:
+            fields = line.rstrip('\r\n').split(";")
+            if (line[0:1] == '#') or (len(fields) < 4):
+                continue
+            titles.setdefault(fields[0], {})
+            titles[fields[0]]['exceptionaltitles'] = fields[1:4]
+        file_exceptionaltitles.close()
+
+    return titles
 
-    for line in file_titles.readlines():
-        sortanddisplaytitle = [field for field in line.rstrip('\n').split(";")]
-        titles.append(sortanddisplaytitle)
+# Update 'Buttons' field in romlist with new sorting title,
+# and update 'AltTitle' field with "series" display title (if available)
+# (title is the entry of the game in the titles lookup table, see create_dict_of_titles):
 
-    file_titles.close()
+def update_Buttons_and_AltTitle_fields(game, title):
+    
+    sortingtitle = game.Title
+    displaytitle = game.AltTitle
 
     # Update sorting and display titles for special games:
     
-    for title in titles:    
-
-        if (title[0] == game[0]):
-            sortingtitle = title[1]
-            if (title[2] == ''):
-                displaytitle = game[14] 
-            else:
-                displaytitle = title[2] + ' ' + game[14]
+    if ('sortingtitle' in title):
+        sortingtitle = title['sortingtitle']
+        if (title['seriestitle'] != ''):
+            displaytitle = title['seriestitle'] + ' ' + game.AltTitle
                 
     # Remove "The" and "Vs." from sorting title:
            
@@ -145,80 +145,125 @@ def update_Buttons_and_AltTitle_fields(game):
 
     # Update romlist fields:
         
-    game[14] = displaytitle # AltTitle
-    game[16] = sortingtitle # Buttons
+    game.AltTitle = displaytitle
+    game.Buttons  = sortingtitle
  
     return
 
 # Update 'Title', 'Alttitle' and 'Buttons' fields in romlist for specific games:
 
-def update_exceptional_games(game):
+def update_exceptional_games(game, title):
 
-    if (game[0] == 'bm1stmix'):
-        game[1]  = 'Beatmania (ver JA-B)'
-        game[14] = 'Beatmania'
-        game[16] = 'Beatmania (ver JA-B)'
-        
-    if (game[0] == 'garou'):
-        game[1]  = 'Fatal Fury 9 / Garou - Mark of the Wolves (NGM-2530)'
-        game[14] = 'Fatal Fury 9 / Garou - Mark of the Wolves'
-        game[16] = 'Fatal Fury 9 / Garou - Mark of the Wolves (NGM-2530)'    
+    if ('exceptionaltitles' in title):
+        game.Title    = title['exceptionaltitles'][0]
+        game.AltTitle = title['exceptionaltitles'][1]
+        game.Buttons  = title['exceptionaltitles'][2]
 
     return
 
+# Hash a romlist line or a combination of romlist fields (shortened to keep the manifest compact):
+
+def hashfields(fields):
+
+    string = ";".join(fields)
+    if not isinstance(string, bytes):
+        string = string.encode('utf-8')
+
+    return hashlib.sha1(string).hexdigest()[:16]
+
+# Read manifest with fingerprints of the input files, the output romlist and
+# the derived fields of each game of the previous run (used in incremental mode):
+
+def readmanifest(filename):
+
+    manifest = configsetup.readjson(filename, ['inputs', 'output', 'rows'])
+
+    if manifest is None:
+        manifest = {'inputs': {}, 'output': None, 'rows': {}}
+
+    return manifest
+
 def main():
 
     # Setup configuration:
     
+    instrumentation.init('updateromlist')
+
     configsetup.init()
 
+    incremental = ((len(sys.argv) == 2) and (sys.argv[1] == 'incremental'))
+        
+    # Create new Attract-Mode MAME romlist or not:
+
+    if not incremental:
+        createnewromlist = raw_input('Create new romlist? Press "y" or "n" and press enter/return: ')
+
+        if (createnewromlist == 'y'):
+            buildromlist()
+        elif (createnewromlist != 'n'):
+            print("Next time please type 'y' or 'n'")
+            return 2
+
+    return update(incremental)
+
+def romlistfilenames():
+
+    # Return filenames of AM romlist, romlist backup and romlist manifest:
+
+    AMromlist = configsetup.AMconfigdir + "romlists/mame.txt"
+
+    return AMromlist, AMromlist[:-4] + "_original.txt", AMromlist[:-4] + "_manifest.json"
+
+def buildromlist():
+
+    # Let Attract-Mode create a new MAME romlist, and save a backup of it:
+
+    AMromlist, AMromlist_original, AMromlist_manifest = romlistfilenames()
+
+    if os.path.isfile(AMromlist): # Remove old romlist:
+        subprocess.call(["rm", AMromlist]) 
+    with instrumentation.stage('attract --build-romlist', 'subprocess'):
+        subprocess.call("./attract --build-romlist mame", cwd = configsetup.AMexecdir, shell = True) # Create new romlist
+    subprocess.call(["cp", AMromlist, AMromlist_original])                                       # Backup new romlist
+
+    return
+
+def update(incremental = False):
+
+    # Update all games in AM romlist, or only the games of which the input data changed since the last run (incremental):
+
     global filename_hiscores  
     global filename_benchmarks
     global filename_bezels    
     global filename_controls  
     global filename_titles    
+    global filename_exceptionaltitles
 
     filename_hiscores   = configsetup.AMsupportdir + "data/AMhiscores.ini"
     filename_benchmarks = configsetup.AMsupportdir + "data/AMbenchmarks.ini"
     filename_bezels     = configsetup.AMsupportdir + "data/AMbezels.ini"
     filename_controls   = configsetup.AMsupportdir + "data/AMcontrols.ini"
     filename_titles     = configsetup.AMsupportdir + "data/AMtitles.txt"
+    filename_exceptionaltitles = configsetup.AMsupportdir + "data/AMexceptionaltitles.txt"
 
     # Check if romlist exists:
 
-    AMromlist = configsetup.AMconfigdir + "romlists/mame.txt"
+    AMromlist, AMromlist_original, AMromlist_manifest = romlistfilenames()
 
-    romlistexists = False
-    if os.path.isfile(AMromlist):
-        romlistexists = True
-        
-    # Create new Attract-Mode MAME romlist or not:
-
-    createnewromlist = raw_input('Create new romlist? Press "y" or "n" and press enter/return: ')
-
-    if (createnewromlist == 'y'):
-        if romlistexists: # Remove old romlist:
-            subprocess.call(["rm", AMromlist]) 
-        subprocess.call("./attract --build-romlist mame", cwd = configsetup.AMexecdir, shell = True) # Create new romlist
-        subprocess.call(["cp", AMromlist, AMromlist[:-4] + "_original.txt"])                         # Backup new romlist
-    elif (createnewromlist == 'n'):
-        if not romlistexists:
-            print("Romlist does not exist in this directory - EXIT")
+    if incremental:
+        if not os.path.isfile(AMromlist_original):
+            print("{} does not exist - EXIT".format(AMromlist_original))
             return 1
-        if os.path.isfile(AMromlist + ".original"): # Use backup romlist: 
-            subprocess.call(["cp", AMromlist[:-4] + "_original.txt", AMromlist]) 
-    else:
-        print("Next time please type 'y' or 'n'")
-        return 2
-
-    # Transform AM romlist into list of games:
-
-    games, header = configsetup.create_list_of_games_from_romlist()
+    elif not os.path.isfile(AMromlist):
+        print("Romlist does not exist in this directory - EXIT")
+        return 1
 
-    if (len(games) == 0):
-        print("AM romlist is empty - EXIT")
-        return 3
+    # Use backup romlist as input (if available):
 
+    sourceromlist = AMromlist
+    if os.path.isfile(AMromlist_original):
+        sourceromlist = AMromlist_original
+        
     # Check if files exist:
 
     files_available = [0, 0, 0, 0, 0]
@@ -247,39 +292,144 @@ def main():
         files_available[4] = 1
     else:
         print("--- {} does not exist".format(filename_titles))
+
+    # Compare fingerprints of input files and output romlist with previous run:
+
+    manifest = readmanifest(AMromlist_manifest)
+
+    inputfiles = {'romlist'          : sourceromlist,
+                  'titles'           : filename_titles,
+                  'exceptionaltitles': filename_exceptionaltitles,
+                  'hiscores'         : filename_hiscores,
+                  'benchmarks'       : filename_benchmarks,
+                  'bezels'           : filename_bezels,
+                  'controls'         : filename_controls}
+
+    fingerprints = {}
+    changedinputs = set()
     
-    # Update fields in list of games:
+    with instrumentation.stage('fingerprint files'):
+        for key in inputfiles:
+            previousfingerprint = manifest['inputs'].get(key)
+            fingerprints[key] = configsetup.fingerprint(inputfiles[key], previousfingerprint)
+            if ((fingerprints[key] is None) != (previousfingerprint is None) or
+                (fingerprints[key] is not None and fingerprints[key]['sha1'] != previousfingerprint['sha1'])):
+                changedinputs.add(key)
+
+        outputfingerprint = configsetup.fingerprint(AMromlist, manifest['output'])
+    outputunchanged = (outputfingerprint is not None and manifest['output'] is not None and
+                       outputfingerprint['sha1'] == manifest['output']['sha1'])
+
+    if (incremental and outputunchanged and (len(changedinputs) == 0)):
+        print("Input files have not changed since the last update of {} - EXIT".format(AMromlist))
+        manifest['inputs'] = fingerprints
+        manifest['output'] = outputfingerprint
+        configsetup.writejson(AMromlist_manifest, manifest)
+        return 0
+
+    titleschanged = bool(changedinputs & set(['titles', 'exceptionaltitles']))
+    inischanged   = bool(changedinputs & set(['hiscores', 'benchmarks', 'bezels', 'controls']))
     
-    for game in games:
+    # In incremental mode, reuse the derived fields of the previous romlist for unchanged games:
 
-        # Update 'AltTitle' field in romlist:
-        update_AltTitle_field(game)
+    previousgames = {}
 
-        # Update 'Extra' field in romlist:
-        update_Extra_field(game, files_available[0:4])
-                    
-        # Update 'Buttons' and 'AltTitle' fields in romlist:
-        if (files_available[4]):
-            update_Buttons_and_AltTitle_fields(game)
+    if (incremental and outputunchanged):
+        with instrumentation.stage('read previous romlist'):
+            for game in configsetup.read_romlist(AMromlist):
+                previousgames[game.Name] = (game.Title, game.AltTitle, game.Extra, game.Buttons)
+    
+    # Index games in .ini files (once, instead of re-reading every file for every game):
 
-        # Update romlist for specific games:
-        update_exceptional_games(game)
-        
-    # Create updated romlist:
+    with instrumentation.stage('index .ini files'):
+        gamesets = [configsetup.create_set_of_games_from_ini(filename_hiscores),
+                    configsetup.create_set_of_games_from_ini(filename_benchmarks),
+                    configsetup.create_set_of_games_from_ini(filename_bezels),
+                    configsetup.create_set_of_games_from_ini(filename_controls)]
+    
+    # Read title overrides (once, instead of re-reading AMtitles.txt for every game):
+
+    with instrumentation.stage('read titles'):
+        titles = create_dict_of_titles(filename_titles, filename_exceptionaltitles)
+        instrumentation.fileread(filename_titles)
+        instrumentation.fileread(filename_exceptionaltitles)
+    
+    # Update fields of each game in romlist and create updated romlist:
+
+    header     = configsetup.read_romlist_header(sourceromlist)
+    outputfile = configsetup.RomlistWriter(AMromlist, header)
+
+    count = 0
+    updatedcount = 0
+    rows = {}
+    
+    with instrumentation.stage('update romlist'):
+
+        for game in configsetup.read_romlist(sourceromlist):
+
+            count += 1
+
+            # Remove anomalous 'series' entry
+            if (game.Name == 'series'):
+                continue
+
+            sourcehash   = hashfields([game.line()])
+            previousrow  = manifest['rows'].get(game.Name)
+            previousgame = previousgames.get(game.Name)
+            reuse        = (previousrow is not None) and (previousgame is not None) and (previousrow[0] == sourcehash)
+
+            if (reuse and not titleschanged):
+                game.Title    = previousgame[0]
+                game.AltTitle = previousgame[1]
+                game.Buttons  = previousgame[3]
+            else:
+                title = titles.get(game.Name, {})
+
+                # Update 'AltTitle' field in romlist:
+                update_AltTitle_field(game)
+
+                # Update 'Buttons' and 'AltTitle' fields in romlist:
+                if (files_available[4]):
+                    update_Buttons_and_AltTitle_fields(game, title)
 
-    outputfile = open(AMromlist, 'w')
-    outputfile.write(header)
+                # Update romlist for specific games:
+                update_exceptional_games(game, title)
 
-    for game in games:
+            if (reuse and not inischanged):
+                game.Extra = previousgame[2]
+            else:
+                # Update 'Extra' field in romlist:
+                update_Extra_field(game, gamesets)
 
-        # Remove anomalous 'series' entry
-        if (game[0] == 'series'):
-            continue
+            derivedhash = hashfields([game.Title, game.AltTitle, game.Extra, game.Buttons])
+            if (previousrow is None) or (previousrow[1] != derivedhash):
+                updatedcount += 1
+            rows[game.Name] = [sourcehash, derivedhash]
         
-        line = ";".join(game)
-        outputfile.write(line + '\n')
+            outputfile.write(game)
+
+    if (count == 0):
+        outputfile.discard()
+        print("AM romlist is empty - EXIT")
+        return 3
+
+    # Only replace romlist if games have been updated, added or removed:
+
+    if (incremental and outputunchanged and (updatedcount == 0) and (len(rows) == len(manifest['rows']))):
+        outputfile.discard()
+        print("--- Games in {} are up to date".format(AMromlist))
+    else:
+        with instrumentation.stage('write romlist'):
+            outputfile.close()
+        print("--- {} out of {} games in {} updated".format(updatedcount, len(rows), AMromlist))
+
+    # Save fingerprints for next (incremental) run:
 
-    outputfile.close()
+    manifest = {'inputs': fingerprints,
+                'output': configsetup.fingerprint(AMromlist),
+                'rows'  : rows}
+    
+    configsetup.writejson(AMromlist_manifest, manifest)
         
     return 0
 